@@ -22,6 +22,11 @@ def main() -> None:
         default=3,
         help="Retry count passed to sub-tools (default: %(default)s).",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ask the model again instead of replaying cached answers.",
+    )
     args = parser.parse_args()
 
     manifest = load_manifest()
@@ -58,6 +63,8 @@ def main() -> None:
                 "--end-gap-threshold",
                 "30000",
             ]
+            if args.no_cache:
+                command.append("--no-cache")
             subprocess.run(command, check=True)
 
             produced = Path(workdir) / "en.srt"
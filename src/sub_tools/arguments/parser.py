@@ -1,8 +1,9 @@
 import argparse
+import os
 from argparse import ArgumentParser, Namespace
 from importlib.metadata import version
 
-from ..config import SUPPORTED_PROVIDERS, apply_namespace, config
+from ..config import SUPPORTED_PROVIDERS, apply_namespace, config, split_route
 from .env_default import EnvDefault
 
 
@@ -15,6 +16,20 @@ def _resolve_version() -> str:
         return "0.0.0+local"
 
 
+def _absolute_path(value: str) -> str:
+    """Resolve a path against the directory the command was run from."""
+    return os.path.abspath(os.path.expanduser(value))
+
+
+def _route(value: str) -> str:
+    """Check a provider:model route, keeping it as given."""
+    try:
+        split_route(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return value
+
+
 def build_parser() -> ArgumentParser:
     parser = argparse.ArgumentParser(prog="sub-tools", description=None)
 
@@ -43,12 +58,33 @@ def build_parser() -> ArgumentParser:
         help="Filename for the downloaded video inside the output directory (default: %(default)s).",
     )
 
+    parser.add_argument(
+        "--keep-video",
+        action="store_true",
+        default=config.keep_video,
+        help=(
+            "With both the video and audio tasks, also save the video while downloading the "
+            "audio, instead of downloading only the audio."
+        ),
+    )
+
     parser.add_argument(
         "--audio-file",
         default=config.audio_file,
         help="Filename for the extracted audio inside the output directory (default: %(default)s).",
     )
 
+    parser.add_argument(
+        "--audio-profile",
+        choices=["full", "speech", "opus"],
+        default=config.audio_profile,
+        help=(
+            "How to encode the extracted audio (default: %(default)s). 'speech' is 16 kHz mono "
+            "MP3 at 32 kbit/s and 'opus' 16 kHz mono Opus, which needs --audio-file audio.ogg; "
+            "both make the requests that carry the audio several times smaller."
+        ),
+    )
+
     parser.add_argument(
         "--signature-file",
         default=config.signature_file,
@@ -93,6 +129,208 @@ def build_parser() -> ArgumentParser:
         help="Number of times to retry the tasks (default: %(default)s).",
     )
 
+    parser.add_argument(
+        "--chunk-seconds",
+        type=int,
+        default=config.chunk_seconds,
+        help=(
+            "Transcribe recordings longer than this many seconds in windows cut at pauses, "
+            "side by side, instead of in one request (default: %(default)s, which disables it)."
+        ),
+    )
+
+    parser.add_argument(
+        "--chunk-concurrency",
+        type=int,
+        default=config.chunk_concurrency,
+        help=(
+            "Number of transcription or translation windows requested at the same time "
+            "(default: %(default)s)."
+        ),
+    )
+
+    parser.add_argument(
+        "--trim-silence",
+        type=float,
+        default=config.trim_silence,
+        metavar="SECONDS",
+        help=(
+            "Shorten pauses at least this many seconds long in the audio sent for transcription, "
+            "found by the speech index, and move the subtitles back onto the original timing "
+            "(default: %(default)s, which sends the audio as it is)."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=config.max_requests,
+        help=(
+            "Most requests in flight to the provider at once, across all stages and, "
+            "with sub-tools-batch, all jobs (default: %(default)s; 0 removes the limit)."
+        ),
+    )
+
+    parser.add_argument(
+        "--http-connections",
+        type=int,
+        default=config.http_connections,
+        help=(
+            "Connections each provider client keeps open and reuses between requests "
+            "(default: %(default)s)."
+        ),
+    )
+
+    parser.add_argument(
+        "--requests-per-minute",
+        type=int,
+        default=config.requests_per_minute,
+        help=(
+            "Requests per minute each model may be sent, such as the provider's "
+            "published quota (default: %(default)s; 0 removes the limit)."
+        ),
+    )
+
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        default=config.tokens_per_minute,
+        help=(
+            "Tokens per minute each model may be sent, estimated before sending and "
+            "corrected from reported usage (default: %(default)s; 0 removes the limit)."
+        ),
+    )
+
+    parser.add_argument(
+        "--translation-window",
+        type=int,
+        default=config.translation_window,
+        help=(
+            "Translate subtitle files in windows of this many cues, side by side, instead "
+            "of in one request (default: %(default)s, which disables it)."
+        ),
+    )
+
+    parser.add_argument(
+        "--translation-context",
+        type=int,
+        default=config.translation_context,
+        help=(
+            "Number of neighbouring cues shown either side of each translation window "
+            "for context, without being translated (default: %(default)s)."
+        ),
+    )
+
+    parser.add_argument(
+        "--languages-per-request",
+        type=int,
+        default=config.languages_per_request,
+        help=(
+            "Ask for up to this many target languages in one request, sending the source "
+            "subtitles and audio once; languages that fail validation are translated "
+            "again on their own (default: %(default)s)."
+        ),
+    )
+
+    parser.add_argument(
+        "--no-stream",
+        dest="stream",
+        action="store_false",
+        default=config.stream,
+        help=(
+            "Wait for each answer in full instead of streaming it and abandoning it as "
+            "soon as its timestamps run backwards or it is in the wrong language."
+        ),
+    )
+
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=config.hedge_percentile,
+        help=(
+            "Send a second copy of a request that has not been answered within this "
+            "percentile of recent answer times, e.g. 95, and use whichever valid answer "
+            "comes first (default: %(default)s, which disables it)."
+        ),
+    )
+
+    parser.add_argument(
+        "--hedge-model",
+        default=config.hedge_model,
+        help=(
+            "Model of the same provider that answers the second copy of a hedged request "
+            "(default: the model itself)."
+        ),
+    )
+
+    parser.add_argument(
+        "--fallbacks",
+        nargs="+",
+        type=_route,
+        default=config.fallbacks,
+        metavar="PROVIDER:MODEL",
+        help=(
+            "Routes to fail over to, in order, while the model's provider is down or "
+            "overloaded, e.g. openrouter:google/gemini-2.5-flash openai:gpt-audio-1.5."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=_absolute_path,
+        default=config.cache_dir,
+        help=(
+            "Directory for cached model answers, so re-running the same request costs "
+            "nothing (default: sub-tools/responses in the user's cache directory)."
+        ),
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        default=config.cache,
+        help="Always ask the model, neither reading nor writing cached answers.",
+    )
+
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=config.cache_max_mb,
+        help="Size limit for cached answers, in MB; the least recently used go first (default: %(default)s).",
+    )
+
+    parser.add_argument(
+        "--no-context-cache",
+        dest="context_cache",
+        action="store_false",
+        default=config.context_cache,
+        help=(
+            "Send the source subtitles and audio in full with every translation instead "
+            "of caching them with the provider once for all target languages."
+        ),
+    )
+
+    parser.add_argument(
+        "--batch-submit",
+        action="store_true",
+        default=config.batch_submit,
+        help=(
+            "Send the model requests through the provider's batch API, which answers "
+            "within a day at a lower price, instead of waiting for them."
+        ),
+    )
+
+    parser.add_argument(
+        "--batch-collect",
+        action="store_true",
+        default=config.batch_collect,
+        help=(
+            "Fetch the answers of batches sent earlier, carry on with the job, and send "
+            "whatever it still needs as the next batch."
+        ),
+    )
+
     parser.add_argument(
         "--gemini-api-key",
         "--google-api-key",
@@ -127,6 +365,50 @@ def build_parser() -> ArgumentParser:
         help="OpenRouter API key. Falls back to the OPENROUTER_API_KEY environment variable.",
     )
 
+    parser.add_argument(
+        "--gemini-base-url",
+        action=EnvDefault,
+        env_name="GEMINI_BASE_URL",
+        required=False,
+        help=(
+            "Google/Gemini API endpoint, such as a proxy or a local sub-tools-mock. "
+            "Falls back to the GEMINI_BASE_URL environment variable."
+        ),
+    )
+
+    parser.add_argument(
+        "--openai-base-url",
+        action=EnvDefault,
+        env_name="OPENAI_BASE_URL",
+        required=False,
+        help=(
+            "OpenAI API endpoint, such as a proxy or a local sub-tools-mock. "
+            "Falls back to the OPENAI_BASE_URL environment variable."
+        ),
+    )
+
+    parser.add_argument(
+        "--anthropic-base-url",
+        action=EnvDefault,
+        env_name="ANTHROPIC_BASE_URL",
+        required=False,
+        help=(
+            "Anthropic API endpoint, such as a proxy or a local sub-tools-mock. "
+            "Falls back to the ANTHROPIC_BASE_URL environment variable."
+        ),
+    )
+
+    parser.add_argument(
+        "--openrouter-base-url",
+        action=EnvDefault,
+        env_name="OPENROUTER_BASE_URL",
+        required=False,
+        help=(
+            "OpenRouter API endpoint, such as a proxy or a local sub-tools-mock. "
+            "Falls back to the OPENROUTER_BASE_URL environment variable."
+        ),
+    )
+
     parser.add_argument(
         "--provider",
         choices=SUPPORTED_PROVIDERS,
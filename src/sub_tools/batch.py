@@ -0,0 +1,205 @@
+"""
+Run many jobs from one manifest, in one process.
+
+Starting ``sub-tools`` once per video pays for the interpreter and the provider
+SDK imports every time, and nothing stops a dozen such processes from sending
+far more requests between them than the provider's quota allows. A batch runs
+every job of a manifest in a single process instead, several at a time. Each
+job has its own configuration, so jobs with different models, languages or
+recordings run side by side; they share the process-wide request limit, the
+response cache and the answer-time history that hedging learns from.
+
+The manifest is a JSONL file, one object per job, or a CSV file with a header
+row. Keys are the names of ``sub-tools`` options as they are stored in the
+configuration, such as ``url``, ``audio_file``, ``languages`` or ``model``,
+plus ``output`` for the output directory, which every job needs and no two
+jobs may share. Anything a job does not set comes from the command line.
+Output directories are relative to the manifest; like on the command line, a
+job's file names are relative to its output directory.
+"""
+
+import copy
+import csv
+import json
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from typing import Any
+
+from .arguments.parser import build_parser, parse_args
+from .config import Config, current_config, use_config
+from .main import run_job
+from .system import console
+from .system.console import error, header, job_label, success
+
+# Manifest keys that name a configuration field differently, as on the command line.
+ALIASES = {"output": "output_directory"}
+
+# Keys that only make sense for the whole batch, not for one of its jobs.
+BATCH_ONLY = {
+    "max_requests",
+    "requests_per_minute",
+    "tokens_per_minute",
+    "cache_dir",
+    "cache_max_mb",
+}
+
+
+def read_manifest(path: str) -> list[dict[str, Any]]:
+    """
+    Read a JSONL or CSV manifest into one dict of settings per job.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = [
+                (number, {key: value for key, value in row.items() if value not in (None, "")})
+                for number, row in enumerate(csv.DictReader(f), start=2)
+            ]
+        else:
+            rows = []
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: not valid JSON: {e}") from None
+                if not isinstance(row, dict):
+                    raise ValueError(f"{path}:{number}: expected a JSON object")
+                rows.append((number, row))
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    outputs: dict[str, int] = {}
+    for number, row in rows:
+        settings = _job_settings(row, f"{path}:{number}")
+        output = os.path.normpath(os.path.join(base, settings["output_directory"]))
+        if output in outputs:
+            raise ValueError(
+                f"{path}:{number}: output directory {output} is also used on line "
+                f"{outputs[output]}"
+            )
+        outputs[output] = number
+        settings["output_directory"] = output
+        jobs.append(settings)
+    return jobs
+
+
+def job_config(base: Config, settings: dict[str, Any]) -> Config:
+    """
+    The configuration of one job: the command line's, with the job's settings on top.
+    """
+    job = copy.deepcopy(base)
+    for name, value in settings.items():
+        if name == "provider":
+            job.set_provider(value)
+        else:
+            setattr(job, name, value)
+    return job
+
+
+def run_batch(path: str, parallel_jobs: int = 1) -> int:
+    """
+    Run every job in the manifest, up to ``parallel_jobs`` at a time, and
+    return how many failed.
+
+    A failed job is reported and the batch goes on with the others.
+    """
+    jobs = [job_config(current_config(), settings) for settings in read_manifest(path)]
+    parallel_jobs = max(1, min(parallel_jobs, len(jobs)))
+
+    def run(index: int, job: Config) -> bool:
+        name = os.path.basename(job.output_directory)
+        with use_config(job), job_label(name):
+            header(f"Job {index}/{len(jobs)}: {job.output_directory}")
+            try:
+                run_job()
+            except Exception as e:
+                error(f"Failed: {e}")
+                return False
+        return True
+
+    # Each job runs in a thread of its own: its stages start their own event
+    # loops and wait on ffmpeg, and its settings live in that thread's context.
+    live = console.live
+    console.live = parallel_jobs == 1
+    try:
+        with ThreadPoolExecutor(max_workers=parallel_jobs) as pool:
+            results = list(pool.map(run, range(1, len(jobs) + 1), jobs))
+    finally:
+        console.live = live
+    failed = results.count(False)
+
+    if failed:
+        error(f"{failed} of {len(jobs)} jobs failed")
+    else:
+        success(f"All {len(jobs)} jobs finished")
+    return failed
+
+
+def main():
+    parser = build_parser()
+    parser.prog = "sub-tools-batch"
+    parser.description = (
+        "Run every job in a JSONL or CSV manifest in one process. "
+        "Options given here apply to every job that does not set its own."
+    )
+    parser.add_argument("manifest", help="JSONL or CSV file listing the jobs.")
+    parser.add_argument(
+        "--parallel-jobs",
+        "-j",
+        type=int,
+        default=4,
+        help=(
+            "Number of jobs run at the same time; their requests still share "
+            "--max-requests (default: %(default)s)."
+        ),
+    )
+    parsed = parse_args(parser)
+
+    try:
+        failed = run_batch(parsed.manifest, parsed.parallel_jobs)
+    except Exception as e:
+        error(f"Error: {str(e)}")
+        exit(1)
+    if failed:
+        exit(1)
+
+
+def _job_settings(row: dict[str, Any], where: str) -> dict[str, Any]:
+    types = typing.get_type_hints(Config)
+    names = {field.name for field in fields(Config) if not field.name.startswith("_")}
+    settings = {}
+    for key, value in row.items():
+        name = ALIASES.get(key, key).replace("-", "_")
+        if name not in names or name in BATCH_ONLY:
+            raise ValueError(f"{where}: {key!r} cannot be set per job")
+        try:
+            settings[name] = _coerce(types[name], value)
+        except ValueError:
+            raise ValueError(f"{where}: {key!r} has an unusable value {value!r}") from None
+    if not settings.get("output_directory"):
+        raise ValueError(f"{where}: every job needs an output directory")
+    return settings
+
+
+def _coerce(kind: Any, value: Any) -> Any:
+    """
+    Turn a manifest value, which is text in a CSV file, into the field's type.
+    """
+    if not isinstance(value, str):
+        return value
+    if kind == list[str]:
+        return value.replace(",", " ").split()
+    if kind is bool:
+        if value.strip().lower() in ("1", "true", "yes"):
+            return True
+        if value.strip().lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(value)
+    if kind is int:
+        return int(value)
+    if kind is float:
+        return float(value)
+    return value
@@ -1,7 +1,17 @@
 """
 Configuration for sub-tools.
+
+Modules read settings from ``config``, which stands in for the configuration of
+the job running in the current context. The command line has a single job and
+never sets one, so ``config`` is the process's default configuration. A batch
+runs several jobs at once, each inside ``use_config`` with its own Config. Each
+job's tasks, the threads they hand work to with ``asyncio.to_thread``, and the
+requests they make all see that job's settings.
 """
 
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field, fields
 from typing import Any
 
@@ -24,6 +34,19 @@ def normalize_provider(provider: str) -> str:
     return value
 
 
+def split_route(route: str) -> tuple[str, str]:
+    """
+    Split a ``provider:model`` route into its provider, normalized, and model.
+
+    Only the first colon separates them, so OpenRouter slugs such as
+    ``openrouter:google/gemini-2.5-flash:free`` keep theirs.
+    """
+    provider, separator, model = route.partition(":")
+    if not separator or not model.strip():
+        raise ValueError(f"Expected provider:model, got {route!r}")
+    return normalize_provider(provider), model.strip()
+
+
 def infer_provider(model: str) -> str:
     """Infer a provider for callers that do not explicitly select one."""
     name = model.strip().lower()
@@ -56,6 +79,8 @@ class Config:
     output_directory: str = "output"  # Destination for generated artifacts
     video_file: str = "video.mp4"
     audio_file: str = "audio.mp3"
+    keep_video: bool = False  # Also keep the video when one run downloads straight to audio
+    audio_profile: str = "full"  # How the audio is encoded: full, speech or opus
     signature_file: str = "message.shazamsignature"
     source_language: str = "en"
     languages: list[str] = field(default_factory=lambda: ["en"])
@@ -63,6 +88,46 @@ class Config:
     retry: int = 3
     debug: bool = False
 
+    # Chunked transcription
+    chunk_seconds: int = 0  # Target window length for long recordings; 0 sends the whole file
+    chunk_concurrency: int = 4  # Windows transcribed or translated at the same time
+    trim_silence: float = 0.0  # Pauses this long are shortened in the audio sent; 0 keeps them
+
+    # Chunked translation
+    translation_window: int = 0  # Cues translated per request; 0 sends the whole file
+    translation_context: int = 5  # Neighbouring cues shown either side of a window, untranslated
+    languages_per_request: int = 1  # Target languages asked for in one combined request
+
+    # Requests in flight to the provider across every stage and job in the process
+    max_requests: int = 8  # 0 removes the limit
+    http_connections: int = 16  # Connections each provider client keeps open for reuse
+
+    # Published per-model quotas, kept to before sending; 0 leaves them unchecked
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+    # Streaming
+    stream: bool = True  # Watch answers as they arrive and abandon hopeless ones early
+
+    # Hedged requests
+    hedge_percentile: float = 0  # Latency percentile that sends a duplicate; 0 disables
+    hedge_model: str | None = None  # Same-provider model for the duplicate, if not the model
+
+    # Provider failover: provider:model routes tried in order when the model's provider is down
+    fallbacks: list[str] = field(default_factory=list)
+
+    # Response cache
+    cache: bool = True
+    cache_dir: str | None = None  # Defaults to sub-tools/responses in the user's cache home
+    cache_max_mb: int = 1024  # Least recently used answers are evicted beyond this
+
+    # Provider-side caching of the prompt prefix that translations share
+    context_cache: bool = True
+
+    # Provider batch APIs: queue requests instead of sending them, then fetch the answers
+    batch_submit: bool = False
+    batch_collect: bool = False
+
     # Model / provider
     model: str = DEFAULT_MODEL
     provider: str | None = None
@@ -70,6 +135,11 @@ class Config:
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
     openrouter_api_key: str | None = None
+    # API endpoints, e.g. a proxy or a local stand-in; the SDK's own when unset
+    gemini_base_url: str | None = None
+    openai_base_url: str | None = None
+    anthropic_base_url: str | None = None
+    openrouter_base_url: str | None = None
     audio_model: str | None = None  # Provider default is used when unset
     tts_model: str | None = None  # Provider default is used when unset
     tts_voice: str | None = None  # Provider default is used when unset
@@ -136,14 +206,69 @@ class Config:
         }
         return keys[self.resolved_provider]
 
+    @property
+    def base_url(self) -> str | None:
+        """
+        The API endpoint for the selected provider, or None for the SDK's own.
+        """
+        urls = {
+            "google": self.gemini_base_url,
+            "gemini": self.gemini_base_url,
+            "openai": self.openai_base_url,
+            "anthropic": self.anthropic_base_url,
+            "openrouter": self.openrouter_base_url,
+        }
+        return urls[self.resolved_provider]
+
+
+_default = Config()
+_current: ContextVar[Config] = ContextVar("config")
+
+
+def current_config() -> Config:
+    """
+    The Config of the job running in the current context.
+    """
+    return _current.get(_default)
+
+
+@contextmanager
+def use_config(job: Config) -> Iterator[Config]:
+    """
+    Make ``job`` the configuration that ``config`` reads inside the block.
+    """
+    token = _current.set(job)
+    try:
+        yield job
+    finally:
+        _current.reset(token)
+
+
+class ConfigContext:
+    """
+    Reads and writes the attributes of the current job's Config.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(current_config(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(current_config(), name, value)
+
+    def __repr__(self) -> str:
+        return repr(current_config())
+
 
-# Global config instance
-config = Config()
+# The configuration of whichever job is running
+config: Config = ConfigContext()  # type: ignore[assignment]
 
 
 def apply_namespace(source: Any) -> Config:
     """
-    Copy matching attributes from an argparse.Namespace-like object into config.
+    Copy matching attributes from an argparse.Namespace-like object, or another
+    Config, into the current job's config.
     """
     for field_def in fields(Config):
         if field_def.name.startswith("_") or field_def.name == "provider":
@@ -152,5 +277,6 @@ def apply_namespace(source: Any) -> Config:
             setattr(config, field_def.name, getattr(source, field_def.name))
 
     requested_provider = getattr(source, "provider", None)
-    config.set_provider(requested_provider, explicit=requested_provider is not None)
-    return config
+    explicit = getattr(source, "_provider_explicit", requested_provider is not None)
+    config.set_provider(requested_provider, explicit=explicit)
+    return current_config()
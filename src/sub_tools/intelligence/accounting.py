@@ -0,0 +1,171 @@
+"""
+Usage and timing of single requests.
+
+Each provider keeps running totals per model in its ``usage`` dict, all with
+the same ``USAGE_KEYS``. Some callers need what one request used on its own,
+such as the response cache, which stores it next to the answer. Counts go
+through ``record`` so that, while captures are open in the current task, they
+are added to each of them as well. Captures nest: the manifest captures a
+whole stage while the cache and the quota each capture one request inside it.
+
+Every request to a provider is also kept as a ``Call``: which model it went
+to, how long it took, how long until the first byte of the answer came back,
+how many attempts it needed and what it used. The pipeline opens a call
+around each request it makes, and ``model_slot`` counts every attempt inside
+it; the shared HTTP clients mark when each answer starts to arrive. Calls are
+collected, like counts, by every ``calls`` block open in the current task,
+from which the run report works out where the time and tokens went.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Every count a provider records, so that all of them report the same keys.
+USAGE_KEYS = (
+    "requests",
+    "input_tokens",
+    "audio_input_tokens",
+    "cached_input_tokens",
+    "cache_write_tokens",
+    "output_tokens",
+    "tts_characters",
+    "tts_output_tokens",
+    "transcribe_seconds",
+)
+
+
+@dataclass
+class Call:
+    """
+    One request to a provider model, across all of its attempts.
+
+    ``seconds`` is the whole time from the first attempt until the end,
+    backoffs included; ``latency`` and ``first_byte`` are those of the last
+    attempt alone, from when it was sent.
+    """
+
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    started: float = field(default_factory=time.monotonic)
+    seconds: float = 0.0
+    latency: Optional[float] = None
+    first_byte: Optional[float] = None
+    attempts: int = 0
+    audio_seconds: float = 0.0
+    error: Optional[str] = None
+    counts: dict = field(default_factory=dict)
+    _sent: Optional[float] = field(default=None, repr=False)
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+
+_captured: ContextVar[tuple[dict, ...]] = ContextVar("captured_usage", default=())
+_collected: ContextVar[tuple[list, ...]] = ContextVar("collected_calls", default=())
+_call: ContextVar[Optional[Call]] = ContextVar("call", default=None)
+
+
+def usage_bucket(usage: dict[str, dict], model: str) -> dict:
+    """
+    A provider's usage bucket for ``model``, made with every key on first use.
+    """
+    return usage.setdefault(model, dict.fromkeys(USAGE_KEYS, 0))
+
+
+@contextmanager
+def capture() -> Iterator[dict]:
+    """
+    Collect the counts recorded by requests made inside the block.
+    """
+    counts: dict = {}
+    token = _captured.set(_captured.get() + (counts,))
+    try:
+        yield counts
+    finally:
+        _captured.reset(token)
+
+
+def record(bucket: dict, **counts: float) -> None:
+    """
+    Add counts to a provider's usage bucket, and to every open capture.
+    """
+    captures = _captured.get()
+    for name, value in counts.items():
+        bucket[name] += value
+        for captured in captures:
+            captured[name] = captured.get(name, 0) + value
+
+
+@contextmanager
+def calls() -> Iterator[list[Call]]:
+    """
+    Collect the calls made inside the block, once each has ended.
+    """
+    collected: list[Call] = []
+    token = _collected.set(_collected.get() + (collected,))
+    try:
+        yield collected
+    finally:
+        _collected.reset(token)
+
+
+@contextmanager
+def call(provider: Optional[str] = None, model: Optional[str] = None) -> Iterator[Call]:
+    """
+    Keep the request made inside the block as one call; attempts made inside
+    it count towards it rather than becoming calls of their own, and name its
+    provider and model when the caller does not know them.
+    """
+    current = Call(provider, model)
+    token = _call.set(current)
+    try:
+        with capture() as counts:
+            yield current
+    except BaseException as error:
+        current.error = type(error).__name__
+        raise
+    finally:
+        _call.reset(token)
+        current.seconds = time.monotonic() - current.started
+        current.counts = counts
+        for collected in _collected.get():
+            collected.append(current)
+
+
+@contextmanager
+def attempt(provider: str, model: str, audio_seconds: float = 0.0) -> Iterator[None]:
+    """
+    Count one attempt at a request, sent inside the block, towards its call;
+    one made outside any call is a call of its own.
+    """
+    current = _call.get()
+    if current is None:
+        with call(provider, model):
+            with attempt(provider, model, audio_seconds):
+                yield
+        return
+    current.provider = current.provider or provider
+    current.model = current.model or model
+    current.attempts += 1
+    current.audio_seconds = max(current.audio_seconds, audio_seconds)
+    current.first_byte = None
+    current.latency = None
+    current._sent = time.monotonic()
+    try:
+        yield
+    finally:
+        current.latency = time.monotonic() - current._sent
+
+
+async def responded(response) -> None:
+    """
+    Note that an answer has started to arrive, as an HTTP client event hook.
+    """
+    current = _call.get()
+    if current is not None and current._sent is not None and current.first_byte is None:
+        current.first_byte = time.monotonic() - current._sent
@@ -7,20 +7,23 @@ want Claude's reasoning with audio should select an equivalent Claude model
 through OpenRouter instead.
 """
 
-import asyncio
+from typing import Callable
 
 import anthropic
-from anthropic import AsyncAnthropic
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 
 from ..config import config
-from .retry import backoff
+from ..subtitles.stream import StreamAborted
+from . import accounting, clients
+from .accounting import capture, record, usage_bucket
+from .limits import model_slot, pause
 
 MAX_OUTPUT_TOKENS = 16_384
 
 usage: dict[str, dict] = {}
 
 
-def accepts_audio() -> bool:
+def accepts_audio(model: str | None = None) -> bool:
     """Anthropic's native Messages API is text/image input, not audio input."""
     return False
 
@@ -30,7 +33,7 @@ def can_transcribe_audio() -> bool:
     return False
 
 
-def prepare_audio() -> None:
+def prepare_audio(path: str | None = None) -> None:
     """Keep the provider interface uniform; no audio upload is needed."""
     return
 
@@ -39,25 +42,42 @@ async def generate(
     system_instruction: str,
     text: str | None = None,
     with_audio: bool = True,
+    audio_file: str | None = None,
+    model: str | None = None,
+    watch: Callable[[], Callable[[str], None]] | None = None,
+    context: str | None = None,
 ) -> str | None:
-    """Ask Claude for one text-only subtitle response."""
+    """
+    Ask Claude, or ``model`` if given, for one text-only subtitle response.
+
+    With ``watch``, the answer is streamed: each try calls it for a function
+    that is handed the answer piece by piece and may raise to abandon it.
+    ``context`` is text that many requests share, sent before ``text``; with
+    ``config.context_cache`` it ends in a cache breakpoint, so the system
+    instruction and context are read from Anthropic's prompt cache after the
+    first request.
+    """
     if with_audio:
         raise RuntimeError(
             "Anthropic models do not accept audio input; use an audio-capable "
             "provider for transcription."
         )
 
-    prompt = text or ""
+    model = model or config.model
+    content = _user_content(text or "", context)
+    client = _client()
     for attempt in range(max(1, config.retry)):
         try:
-            async with AsyncAnthropic(api_key=config.api_key) as client:
+            async with model_slot(model, system_instruction + (context or "") + (text or "")):
+                if watch is not None:
+                    return await _stream(client, model, system_instruction, content, watch())
                 response = await client.messages.create(
-                    model=config.model,
+                    model=model,
                     max_tokens=MAX_OUTPUT_TOKENS,
                     system=system_instruction,
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=[{"role": "user", "content": content}],
                 )
-            _record_usage(response)
+                _record_usage(model, response)
             return "".join(
                 block.text
                 for block in response.content
@@ -65,13 +85,114 @@ async def generate(
             )
         except _RETRYABLE_ERRORS as error:
             if attempt < config.retry - 1:
-                await asyncio.sleep(backoff(attempt))
+                await pause(error, attempt)
                 continue
             raise error
 
     return None
 
 
+def batch_request(
+    system_instruction: str,
+    text: str | None = None,
+    with_audio: bool = True,
+    audio_file: str | None = None,
+    model: str | None = None,
+    context: str | None = None,
+) -> tuple[str, dict] | None:
+    """
+    The model and parameters of a request for the Message Batches API, or
+    None for one with audio, which ``generate`` refuses.
+    """
+    if with_audio:
+        return None
+    model = model or config.model
+    return model, {
+        "model": model,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "system": system_instruction,
+        "messages": [{"role": "user", "content": _user_content(text or "", context)}],
+    }
+
+
+async def submit_batch(model: str, requests: dict[str, dict]) -> str:
+    """
+    Send requests, by custom ID, as one message batch and return its ID.
+    """
+    batch = await _client().messages.batches.create(
+        requests=[{"custom_id": key, "params": params} for key, params in requests.items()]
+    )
+    return batch.id
+
+
+async def collect_batch(
+    model: str, batch_id: str, keys: list[str]
+) -> dict[str, tuple[str | None, dict]] | None:
+    """
+    The answers of a finished batch, with their usage, by custom ID; None
+    while it is still running.
+    """
+    client = _client()
+    batch = await client.messages.batches.retrieve(batch_id)
+    if batch.processing_status != "ended":
+        return None
+    answers: dict[str, tuple[str | None, dict]] = {}
+    async for entry in await client.messages.batches.results(batch_id):
+        if entry.result.type != "succeeded":
+            continue
+        message = entry.result.message
+        with capture() as counts:
+            _record_usage(model, message)
+        text = "".join(
+            block.text for block in message.content if getattr(block, "type", None) == "text"
+        )
+        answers[entry.custom_id] = (text, counts)
+    return answers
+
+
+def _user_content(text: str, context: str | None) -> str | list[dict]:
+    """
+    The user turn: the shared context first, then the request's own text.
+    """
+    if not context:
+        return text
+    if not config.context_cache:
+        return f"{context}\n\n{text}" if text else context
+    blocks: list[dict] = [
+        {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}}
+    ]
+    if text:
+        blocks.append({"type": "text", "text": text})
+    return blocks
+
+
+async def _stream(
+    client: AsyncAnthropic,
+    model: str,
+    system_instruction: str,
+    content: str | list[dict],
+    feed,
+) -> str:
+    """Stream one answer through ``feed``, returning the whole of it."""
+    pieces: list[str] = []
+    try:
+        async with client.messages.stream(
+            model=model,
+            max_tokens=MAX_OUTPUT_TOKENS,
+            system=system_instruction,
+            messages=[{"role": "user", "content": content}],
+        ) as stream:
+            async for piece in stream.text_stream:
+                pieces.append(piece)
+                feed(piece)
+            response = await stream.get_final_message()
+    except StreamAborted:
+        record(_bucket(model), requests=1)
+        raise
+    _record_usage(model, response)
+    return "".join(pieces)
+
+
 async def speak(text: str, language: str) -> bytes:
     """Anthropic has no native text-to-speech endpoint."""
     raise RuntimeError(
@@ -80,26 +201,48 @@ async def speak(text: str, language: str) -> bytes:
     )
 
 
-def _bucket(model: str) -> dict:
-    return usage.setdefault(
-        model,
-        {
-            "requests": 0,
-            "input_tokens": 0,
-            "audio_input_tokens": 0,
-            "output_tokens": 0,
-            "tts_characters": 0,
-        },
+def _client() -> AsyncAnthropic:
+    return clients.shared("anthropic", _new_client, _close_client, base_url=config.base_url)
+
+
+def _new_client() -> AsyncAnthropic:
+    # Retries are left to generate, so every refusal reaches the adaptive limit.
+    return AsyncAnthropic(
+        api_key=config.api_key,
+        base_url=config.base_url,
+        max_retries=0,
+        # The SDK's own kind of HTTP client, noting when each answer starts to arrive.
+        http_client=DefaultAsyncHttpxClient(
+            limits=clients.pool_limits(),
+            event_hooks={"response": [accounting.responded]},
+        ),
     )
 
 
-def _record_usage(response) -> None:
-    bucket = _bucket(config.model)
-    bucket["requests"] += 1
+async def _close_client(client: AsyncAnthropic) -> None:
+    await client.close()
+
+
+def _bucket(model: str) -> dict:
+    return usage_bucket(usage, model)
+
+
+def _record_usage(model: str, response) -> None:
+    bucket = _bucket(model)
+    record(bucket, requests=1)
     response_usage = getattr(response, "usage", None)
     if response_usage:
-        bucket["input_tokens"] += getattr(response_usage, "input_tokens", 0) or 0
-        bucket["output_tokens"] += getattr(response_usage, "output_tokens", 0) or 0
+        # Anthropic counts cached tokens apart from input_tokens; they are
+        # added back so input_tokens means the whole prompt, as elsewhere.
+        read = getattr(response_usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(response_usage, "cache_creation_input_tokens", 0) or 0
+        record(
+            bucket,
+            input_tokens=(getattr(response_usage, "input_tokens", 0) or 0) + read + written,
+            output_tokens=getattr(response_usage, "output_tokens", 0) or 0,
+            cached_input_tokens=read,
+            cache_write_tokens=written,
+        )
 
 
 _RETRYABLE_ERRORS = (
@@ -0,0 +1,151 @@
+"""
+Provider batch APIs, for runs that can wait for their answers.
+
+OpenAI, Anthropic and Gemini each take a file of requests and answer them all
+within a day, at about half the price and without counting against the
+interactive rate limits. A run with ``config.batch_submit`` does not send its
+requests one by one: each request the response cache has no answer for is
+queued instead, the stage stops there, and at the end of the job the queued
+requests go out as one batch per provider model. The batches are recorded in
+``.sub-tools/batches.json`` in the output directory.
+
+A later run with ``config.batch_collect`` fetches the answers of every batch
+that has finished and stores them in the response cache under the keys of the
+requests they answer. The job then runs as usual: the stages find their
+answers in the cache and put them through the same repair and validation as
+answers asked for directly. Whatever is still missing, such as a retry for a
+rejected answer or the requests of the next stage, is queued and sent as the
+next batch, so a job is finished by collecting until nothing is left to send.
+
+Requests a provider cannot batch, such as OpenAI's transcription endpoint or
+anything sent to OpenRouter, are made directly as usual.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+
+from ..config import config
+from ..system.console import info, warning
+from ..system.file import job_path
+from ..system.manifest import JOB_DIRECTORY
+from . import cache
+
+BATCH_FILE = os.path.join(JOB_DIRECTORY, "batches.json")
+
+
+class BatchPending(Exception):
+    """
+    A request was queued for a batch, so the stage cannot go on until it is answered.
+    """
+
+
+_lock = threading.Lock()
+
+# Requests queued in this run, by the absolute path of the job's batch file,
+# then by (provider, model) and cache key.
+_queued: dict[str, dict[tuple[str, str], dict[str, Any]]] = {}
+
+
+def enabled() -> bool:
+    """
+    Whether requests of this job go to batches rather than straight to the provider.
+    """
+    return config.batch_submit or config.batch_collect
+
+
+def defer(key: str, provider: str, model: str, request: Any) -> None:
+    """
+    Queue a request under its response cache ``key`` and stop the stage.
+
+    A request already sent in a batch that has not been collected yet is not
+    queued again.
+    """
+    with _lock:
+        waiting = any(key in batch["keys"] for batch in _load())
+        if not waiting:
+            queue = _queued.setdefault(_path(), {})
+            queue.setdefault((provider, model), {})[key] = request
+    raise BatchPending(key)
+
+
+async def submit(provider_module) -> int:
+    """
+    Send every request this job queued, one batch per provider model, and
+    return how many were sent.
+
+    ``provider_module`` maps a provider name to its module.
+    """
+    with _lock:
+        queue = _queued.pop(_path(), {})
+    sent = 0
+    for (provider, model), requests in queue.items():
+        batch_id = await provider_module(provider).submit_batch(model, requests)
+        with _lock:
+            batches = _load()
+            batches.append(
+                {
+                    "provider": provider,
+                    "model": model,
+                    "id": batch_id,
+                    "keys": list(requests),
+                    "submitted": time.time(),
+                }
+            )
+            _save(batches)
+        info(f"Sent {len(requests)} request(s) to {model} in batch {batch_id}")
+        sent += len(requests)
+    return sent
+
+
+async def collect(provider_module) -> int:
+    """
+    Store the answers of every finished batch in the response cache, and
+    return how many batches are still running.
+    """
+    with _lock:
+        batches = _load()
+    running = 0
+    for batch in batches:
+        provider = provider_module(batch["provider"])
+        answers = await provider.collect_batch(batch["model"], batch["id"], batch["keys"])
+        if answers is None:
+            info(f"Batch {batch['id']} is still running")
+            running += 1
+            continue
+        for key, (reply, usage) in answers.items():
+            if reply:
+                cache.store(key, batch["model"], reply, usage)
+        missing = len(batch["keys"]) - sum(1 for reply, _ in answers.values() if reply)
+        info(f"Batch {batch['id']}: {len(batch['keys']) - missing} answer(s) collected")
+        if missing:
+            warning(f"Batch {batch['id']}: {missing} request(s) had no answer; they are sent again")
+        with _lock:
+            remaining = [other for other in _load() if other["id"] != batch["id"]]
+            _save(remaining)
+    return running
+
+
+def _path() -> str:
+    return os.path.abspath(job_path(BATCH_FILE))
+
+
+def _load() -> list[dict]:
+    try:
+        with open(_path(), "r", encoding="utf-8") as f:
+            batches = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return batches if isinstance(batches, list) else []
+
+
+def _save(batches: list[dict]) -> None:
+    path = _path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(batches, f, indent=2)
+    os.replace(temporary, path)
@@ -0,0 +1,171 @@
+"""
+On-disk cache of model answers.
+
+Running the same audio through the same model and prompt again, after a crash,
+for another evaluation run or with different validation thresholds, should not
+pay for the transcription a second time. Each answer is stored with the usage
+it cost, under a hash of everything that shaped it: the provider, the models,
+the system instruction, the request text and the audio's contents.
+
+The attempt number is part of the key too. A cached answer that validation
+rejects is therefore not handed back on the retry; the retry gets the second
+answer the model gave, which is asked for and stored if there was none. A
+re-run with relaxed thresholds replays the same answers in the same order.
+
+The directory is bounded in size; the entries used least recently are removed
+first. Its size is measured once per process and then kept up to date as
+answers are stored, so the directory is only walked again once it has grown
+past the limit. Entries other processes store meanwhile are counted then.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from ..config import config
+
+# Usage an answer cost when it was first paid for, per model, for answers
+# served from the cache since.
+saved: dict[str, dict] = {}
+
+# Bytes in each cache directory as far as this process knows, by directory.
+_sizes: dict[str, int] = {}
+_sizes_lock = threading.Lock()
+
+
+def cache_home() -> str:
+    """
+    sub-tools' directory in the user's cache home.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sub-tools")
+
+
+def cache_dir() -> str:
+    """
+    The configured cache directory, or one under the user's cache home.
+    """
+    if config.cache_dir:
+        return config.cache_dir
+    return os.path.join(cache_home(), "responses")
+
+
+def request_key(
+    provider: str,
+    model: str,
+    system_instruction: str,
+    text: str | None,
+    audio_hash: str | None,
+    attempt: int,
+    context: str | None = None,
+) -> str:
+    """
+    The cache key for one request, as a hex digest.
+    """
+    fields = {
+        "provider": provider,
+        "model": model,
+        "audio_model": config.audio_model,
+        "system_instruction": system_instruction,
+        "text": text,
+        "audio": audio_hash,
+        "attempt": attempt,
+    }
+    # Only requests split into a shared context and their own text have one;
+    # leaving it out otherwise keeps the keys of earlier answers valid.
+    if context is not None:
+        fields["context"] = context
+    # Answers from another endpoint, such as a local stand-in, are kept apart.
+    if config.base_url is not None:
+        fields["base_url"] = config.base_url
+    encoded = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load(key: str) -> str | None:
+    """
+    Return the stored answer for a key, or None when there is none.
+    """
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # The modification time doubles as the last use, for eviction.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    bucket = saved.setdefault(entry.get("model", ""), {})
+    for name, value in (entry.get("usage") or {}).items():
+        bucket[name] = bucket.get(name, 0) + value
+    return entry.get("reply")
+
+
+def store(key: str, model: str, reply: str, usage: dict) -> None:
+    """
+    Save an answer and its usage, then trim the cache back under its size limit.
+    """
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {"model": model, "reply": reply, "usage": usage, "created": time.time()}
+    try:
+        replaced = os.path.getsize(path)
+    except OSError:
+        replaced = 0
+
+    # Written beside the entry and renamed into place, so a concurrent reader
+    # or a crash never sees half an answer.
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+    max_bytes = config.cache_max_mb * 1024 * 1024
+    directory = cache_dir()
+    with _sizes_lock:
+        if directory in _sizes:
+            _sizes[directory] += os.path.getsize(path) - replaced
+            if _sizes[directory] <= max_bytes:
+                return
+        _sizes[directory] = evict(max_bytes)
+
+
+def evict(max_bytes: int) -> int:
+    """
+    Remove the least recently used entries until the cache fits in ``max_bytes``,
+    and return how many bytes it holds then.
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(cache_dir()):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    return total
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(cache_dir(), key[:2], f"{key}.json")
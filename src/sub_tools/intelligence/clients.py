@@ -0,0 +1,120 @@
+"""
+Long-lived provider clients.
+
+Building an SDK client per call means a new connection, and a new TLS
+handshake, for every request; dubbing makes one request per subtitle cue, so
+most of its time went on connecting. Instead each provider module asks here for
+its client, and gets the same one back for as long as the provider, API key and
+base URL are the same. Its connections are kept alive between requests, up to
+``config.http_connections`` of them.
+
+An async HTTP client belongs to the event loop it was first used on, and every
+stage runs its own loop with ``run``. So clients are also kept per loop, and
+``run`` closes the ones its loop made before the loop goes away. Clients made
+outside any loop, for synchronous calls such as uploads, last as long as the
+process.
+"""
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, Optional, TypeVar
+
+import httpx
+
+from ..config import config
+from . import accounting
+
+T = TypeVar("T")
+
+# How long an idle connection is kept open, in seconds. Requests for the same
+# stage follow each other closely, so this only needs to bridge short gaps.
+KEEPALIVE_SECONDS = 30
+
+# Answers to long recordings take minutes; the SDKs' own clients allow as long.
+TIMEOUT_SECONDS = 600
+
+_lock = threading.Lock()
+_clients: dict[tuple, tuple[Any, Callable[[Any], Awaitable[None]]]] = {}
+
+
+def shared(
+    provider: str,
+    make: Callable[[], T],
+    close: Callable[[T], Awaitable[None]],
+    base_url: Optional[str] = None,
+) -> T:
+    """
+    The client for ``provider`` with the current API key and ``base_url``.
+
+    ``make`` builds it on first use in the running event loop, and ``close``
+    shuts it down when that loop's ``run`` ends.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    key = (loop, provider, config.api_key, base_url)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = (make(), close)
+        return _clients[key][0]
+
+
+def http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    A keep-alive async HTTP client with the configured pool size, sending
+    through ``transport`` when given.
+    """
+    return httpx.AsyncClient(
+        limits=pool_limits(),
+        timeout=httpx.Timeout(TIMEOUT_SECONDS),
+        follow_redirects=True,
+        transport=transport,
+        event_hooks={"response": [accounting.responded]},
+    )
+
+
+def pool_limits() -> httpx.Limits:
+    """
+    Connection limits for one client.
+    """
+    connections = max(1, config.http_connections)
+    return httpx.Limits(
+        max_connections=connections,
+        max_keepalive_connections=connections,
+        keepalive_expiry=KEEPALIVE_SECONDS,
+    )
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """
+    ``asyncio.run`` that closes the clients made during the run before the loop ends.
+    """
+
+    async def wrapped() -> T:
+        try:
+            return await main
+        finally:
+            await close_clients()
+
+    return asyncio.run(wrapped())
+
+
+async def close_clients() -> None:
+    """
+    Close every client made in the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        closing = [
+            (key, client, close) for key, (client, close) in _clients.items() if key[0] is loop
+        ]
+        for key, _, _ in closing:
+            del _clients[key]
+    for _, client, close in closing:
+        try:
+            await close(client)
+        except Exception:
+            # A client that cannot close cleanly has nothing left to lose.
+            pass
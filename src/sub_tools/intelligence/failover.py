@@ -0,0 +1,266 @@
+"""
+Failing over to other providers while one is down.
+
+A provider in trouble answers 503 "high demand" for minutes at a time, and a
+request used to sleep through all of its retries and then fail the job. With
+``config.fallbacks``, an ordered chain of ``provider:model`` routes follows the
+configured model, such as the same model through OpenRouter and then an OpenAI
+model. A request that fails because its provider is down or overloaded goes
+on to the next route at once, instead of waiting out its backoff first; only
+the last route retries as usual.
+
+Every route keeps a health score: a moving average of how often its requests
+fail, and moving averages of how long they take, a quick one and a slow one
+for what is usual. A route is degraded once its error rate passes
+``ERROR_THRESHOLD`` or its recent latency reaches ``SLOW_FACTOR`` times the
+usual, and new requests skip it for the next healthy route. After
+``PROBE_SECONDS`` one request is let through to probe it. If that succeeds,
+the route is healthy again; if not, the next probe waits twice as long.
+Health is kept for the whole process, so every job of a batch gains from what
+the others have seen.
+"""
+
+import dataclasses
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from ..config import config, current_config, split_route, use_config
+from .limits import is_throttled
+
+# Weight of the newest request in the error rate and the quick latency average.
+ERROR_WEIGHT = 0.3
+LATENCY_WEIGHT = 0.3
+
+# Weight of the newest request in the usual latency, which moves slowly.
+USUAL_WEIGHT = 0.05
+
+# Error rate beyond which a route is degraded: two failures in a row from healthy.
+ERROR_THRESHOLD = 0.5
+
+# Recent latency, as a multiple of the usual one, at which a route is degraded.
+SLOW_FACTOR = 3.0
+
+# Requests of a kind seen before latency says anything about a route.
+MIN_SAMPLES = 5
+
+# Seconds before a degraded route is probed, doubling after each failed probe.
+PROBE_SECONDS = 30
+MAX_PROBE_SECONDS = 600
+
+# Exception class names that mean the provider failed rather than the request.
+OUTAGE_ERRORS = (
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "ServerError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "OverloadedError",
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    One provider and model a request can be sent to.
+    """
+
+    provider: str
+    model: str
+
+    def __str__(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class Health:
+    """
+    How well a route has been answering lately.
+    """
+
+    def __init__(self):
+        self.errors = 0.0
+        self.latency: dict[bool, tuple[float, float, int]] = {}
+        self.probe_at: Optional[float] = None
+        self.probe_interval = PROBE_SECONDS
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Whether new requests should go elsewhere.
+        """
+        return self.probe_at is not None
+
+    def admit(self) -> bool:
+        """
+        Whether a new request may go to this route: it is healthy, or it is
+        due a probe and none is out yet, in which case this request is it.
+        """
+        with self._lock:
+            if self.probe_at is None:
+                return True
+            if self.probing or time.monotonic() < self.probe_at:
+                return False
+            self.probing = True
+            return True
+
+    def would_admit(self) -> bool:
+        """
+        Whether ``admit`` would let a new request through now, without claiming a probe.
+        """
+        with self._lock:
+            if self.probe_at is None:
+                return True
+            return not self.probing and time.monotonic() >= self.probe_at
+
+    def succeeded(self, with_audio: bool, seconds: float) -> None:
+        """
+        Count an answered request that took ``seconds``.
+        """
+        with self._lock:
+            recent, usual, samples = self.latency.get(with_audio, (seconds, seconds, 0))
+            recent += LATENCY_WEIGHT * (seconds - recent)
+            usual += USUAL_WEIGHT * (seconds - usual)
+            samples += 1
+            self.errors *= 1 - ERROR_WEIGHT
+            if self.probing:
+                # A good probe ends the outage; judge the route afresh from here.
+                self.probing = False
+                self.probe_at = None
+                self.probe_interval = PROBE_SECONDS
+                self.errors = 0.0
+                recent = min(recent, seconds)
+            elif samples >= MIN_SAMPLES and recent >= SLOW_FACTOR * usual:
+                self._degrade()
+            self.latency[with_audio] = (recent, usual, samples)
+
+    def failed(self) -> None:
+        """
+        Count a request the provider failed.
+        """
+        with self._lock:
+            self.errors += ERROR_WEIGHT * (1 - self.errors)
+            if self.probing:
+                self.probing = False
+                self.probe_interval = min(MAX_PROBE_SECONDS, self.probe_interval * 2)
+                self.probe_at = time.monotonic() + self.probe_interval
+            elif self.errors >= ERROR_THRESHOLD:
+                self._degrade()
+
+    def released(self) -> None:
+        """
+        Let another request probe the route, when this one ended neither way.
+        """
+        with self._lock:
+            self.probing = False
+
+    def _degrade(self) -> None:
+        if self.probe_at is None:
+            self.probe_at = time.monotonic() + self.probe_interval
+
+
+_lock = threading.Lock()
+_health: dict[Route, Health] = {}
+
+
+def health(route: Route) -> Health:
+    """
+    The health of a route, made on first use.
+    """
+    with _lock:
+        if route not in _health:
+            _health[route] = Health()
+        return _health[route]
+
+
+def chain(model: Optional[str] = None) -> list[Route]:
+    """
+    The routes for a request to ``model``, or the configured model, in order:
+    that model with the configured provider, then each fallback.
+    """
+    routes = [Route(config.resolved_provider, model or config.model)]
+    for fallback in config.fallbacks:
+        route = Route(*split_route(fallback))
+        if route not in routes:
+            routes.append(route)
+    return routes
+
+
+def attempts(routes: list[Route]) -> Iterator[tuple[Route, bool]]:
+    """
+    The routes a request tries, in order, as it gets to them: each one that
+    will take it now, or every route when none will, so that an outage
+    everywhere is still tried rather than given up on. Each comes with whether
+    it is the last the request will get to, which keeps its retries.
+
+    A degraded route due a probe is only claimed for it once the request gets
+    that far down the chain.
+    """
+    taken = False
+    for at, route in enumerate(routes):
+        if health(route).admit():
+            taken = True
+            yield route, not any(health(later).would_admit() for later in routes[at + 1 :])
+    if not taken:
+        for at, route in enumerate(routes):
+            yield route, at == len(routes) - 1
+
+
+@contextmanager
+def attempt(route: Route, with_audio: bool) -> Iterator[None]:
+    """
+    Count the request made inside the block towards the health of ``route``.
+    """
+    state = health(route)
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException as error:
+        if is_outage(error):
+            state.failed()
+        else:
+            state.released()
+        raise
+    state.succeeded(with_audio, time.monotonic() - started)
+
+
+def is_outage(error: BaseException) -> bool:
+    """
+    Whether an error means the provider failed, so another one should be tried.
+    """
+    if is_throttled(error) or type(error).__name__ in OUTAGE_ERRORS:
+        return True
+    if isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    for name in ("status_code", "code", "status"):
+        status = getattr(error, name, None)
+        if isinstance(status, int) and 500 <= status < 600:
+            return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 500 <= status < 600
+
+
+@contextmanager
+def use_route(route: Route, retry: Optional[int] = None) -> Iterator[None]:
+    """
+    Send the requests made inside the block to ``route``, with ``retry`` tries
+    each if given, under a copy of the job's configuration.
+    """
+    if route.provider == config.resolved_provider and retry is None:
+        yield
+        return
+    settings = dataclasses.replace(
+        current_config(),
+        provider=route.provider,
+        model=route.model,
+        retry=config.retry if retry is None else retry,
+    )
+    with use_config(settings):
+        yield
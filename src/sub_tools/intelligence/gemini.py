@@ -6,16 +6,24 @@ only talks to the API.
 """
 
 import asyncio
+import hashlib
 import io
+import time
 import wave
-from typing import Optional
+from contextlib import aclosing
+from typing import Callable, Optional
 
 from google import genai
 from google.api_core import exceptions as google_exceptions
+from google.genai import errors as genai_errors
 from google.genai import types
 
 from ..config import config
-from .retry import backoff
+from ..subtitles.stream import StreamAborted
+from ..system.file import content_hash, job_path
+from . import clients, uploads
+from .accounting import capture, record, usage_bucket
+from .limits import is_throttled, model_slot, pause
 
 DEFAULT_TTS_MODEL = "gemini-2.5-flash-preview-tts"
 DEFAULT_TTS_VOICE = "Sadaltager"
@@ -27,12 +35,39 @@ TTS_SAMPLE_RATE = 24_000
 # are tracked because that is what pricing quotes.
 usage: dict[str, dict] = {}
 
-_uploaded_files: dict[str, types.File] = {}
+# How long Gemini keeps an uploaded file, for uploads that do not say.
+FILE_LIFETIME_SECONDS = 48 * 3600
 
+# Uploads this close to expiring are made again, so a long run does not lose
+# its file part way through.
+UPLOAD_EXPIRY_MARGIN = 3600
 
-def accepts_audio() -> bool:
+# States of a batch job that will not change any more.
+BATCH_ENDED = (
+    types.JobState.JOB_STATE_SUCCEEDED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+    types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED,
+    types.JobState.JOB_STATE_EXPIRED,
+)
+
+# How long a cached context is kept by Gemini. Translations into every target
+# language start together, so it only has to outlast one stage.
+CONTEXT_CACHE_SECONDS = 1800
+
+# Uploads by API key and content hash; jobs with different keys cannot see
+# each other's files.
+_uploaded_files: dict[tuple[str | None, str], types.File] = {}
+
+# Cached contents by API key, model and a digest of what they hold, with when
+# they expire; None for contexts Gemini would not cache, such as short ones.
+_cached_contexts: dict[tuple, tuple[str, float] | None] = {}
+_context_locks: dict[tuple, asyncio.Lock] = {}
+
+
+def accepts_audio(model: Optional[str] = None) -> bool:
     """
-    Gemini generation models hear audio natively.
+    Gemini generation models, ``model`` among them, hear audio natively.
     """
     return True
 
@@ -42,127 +77,372 @@ def can_transcribe_audio() -> bool:
     return True
 
 
-def prepare_audio() -> types.File:
+def prepare_audio(path: Optional[str] = None) -> types.File:
     """
-    Upload the configured audio file once and reuse it across requests.
+    Upload an audio file, the configured one by default, once and reuse it
+    across requests and, while Gemini still has it, across runs.
     """
-    path = config.audio_file
-    if path not in _uploaded_files:
-        client = genai.Client(api_key=config.api_key)
-        _uploaded_files[path] = client.files.upload(file=path)
-    return _uploaded_files[path]
+    path = path or job_path(config.audio_file)
+    digest = content_hash(path)
+    key = (config.api_key, digest)
+    file = _uploaded_files.get(key)
+    if file is None or _expires_soon(file):
+        file = _recorded_upload(digest) or _upload(path, digest)
+        _uploaded_files[key] = file
+    return file
+
+
+def _recorded_upload(digest: str) -> Optional[types.File]:
+    """
+    The file an earlier run uploaded with these contents, if Gemini still has it.
+    """
+    key = uploads.upload_key("gemini", config.api_key, digest)
+    entry = uploads.lookup(key, margin=UPLOAD_EXPIRY_MARGIN)
+    if entry is None:
+        return None
+    try:
+        file = _client().files.get(name=entry["name"])
+    except genai_errors.APIError:
+        uploads.forget(key)
+        return None
+    if file.state == types.FileState.FAILED or _expires_soon(file):
+        uploads.forget(key)
+        return None
+    return file
+
+
+def _upload(path: str, digest: str) -> types.File:
+    file = _client().files.upload(file=path)
+    if file.expiration_time:
+        expires = file.expiration_time.timestamp()
+    else:
+        expires = time.time() + FILE_LIFETIME_SECONDS
+    uploads.remember(
+        uploads.upload_key("gemini", config.api_key, digest),
+        {
+            "name": file.name,
+            "uri": file.uri,
+            "mime_type": file.mime_type,
+            "expires": expires,
+        },
+    )
+    return file
+
+
+def _expires_soon(file: types.File) -> bool:
+    if not file.expiration_time:
+        return False
+    return file.expiration_time.timestamp() <= time.time() + UPLOAD_EXPIRY_MARGIN
 
 
 async def generate(
     system_instruction: str,
     text: Optional[str] = None,
     with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    model: Optional[str] = None,
+    watch: Optional[Callable[[], Callable[[str], None]]] = None,
+    context: Optional[str] = None,
 ) -> Optional[str]:
     """
     Ask Gemini once for subtitles, retrying only transient server-side failures.
-    """
-    client = genai.Client(api_key=config.api_key)
 
-    parts = [prepare_audio()] if with_audio else []
-    if text:
-        parts.append(types.Part.from_text(text=text))
+    ``audio_file`` replaces the configured recording, e.g. with one window of it,
+    and ``model`` the configured model. With ``watch``, the answer is streamed:
+    each try calls it for a function that is handed the answer piece by piece
+    and may raise to abandon it.
 
-    tools = [
-        types.Tool(google_search=types.GoogleSearch()),
-    ]
+    ``context`` is text that many requests share, sent after the audio and
+    before ``text``. With ``config.context_cache`` the system instruction, audio
+    and context are stored once as cached contents and later requests refer to
+    them, paying for only ``text`` in full.
+    """
+    model = model or config.model
+    client = _client()
+
+    audio_path = (audio_file or job_path(config.audio_file)) if with_audio else None
+    parts = [prepare_audio(audio_path)] if with_audio else []
+    if context:
+        parts.append(types.Part.from_text(text=context))
+
+    tools = _tools()
+    thinking_config = _thinking_config()
+
+    cached = None
+    if context and text and config.context_cache:
+        cached = await _cached_context(client, model, system_instruction, parts, tools)
+    if cached:
+        parts = [types.Part.from_text(text=text)]
+        request_config = types.GenerateContentConfig(
+            cached_content=cached,
+            thinking_config=thinking_config,
+        )
+    else:
+        if text:
+            parts.append(types.Part.from_text(text=text))
+        request_config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            thinking_config=thinking_config,
+            tools=tools,
+        )
 
     for attempt in range(config.retry):
         try:
-            response = await client.aio.models.generate_content(
-                model=config.model,
-                contents=parts,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    thinking_config=types.ThinkingConfig(
-                        include_thoughts=True,
-                        thinking_level=types.ThinkingLevel.HIGH,
-                    ),
-                    tools=tools,
-                ),
-            )
-            _record_usage(response)
+            prompt = system_instruction + (context or "") + (text or "")
+            async with model_slot(model, prompt, audio_path):
+                if watch is not None:
+                    return await _stream(client, model, parts, request_config, watch())
+
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=parts,
+                    config=request_config,
+                )
+                _record_usage(model, response)
             return response.text
 
+        except StreamAborted:
+            raise
         except (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable) as e:
             if attempt < config.retry - 1:
-                await asyncio.sleep(backoff(attempt))
+                await pause(e, attempt)
                 continue
             raise e
         except Exception as e:
-            message = str(e)
             # The SDK surfaces 429/503 as generic errors depending on transport.
-            if ("429" in message or "503" in message) and attempt < config.retry - 1:
-                await asyncio.sleep(backoff(attempt))
+            if is_throttled(e) and attempt < config.retry - 1:
+                await pause(e, attempt)
                 continue
             raise e
 
     return None
 
 
+def batch_request(
+    system_instruction: str,
+    text: Optional[str] = None,
+    with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    model: Optional[str] = None,
+    context: Optional[str] = None,
+) -> tuple[str, types.InlinedRequest]:
+    """
+    The model and the request for a batch job. The audio is uploaded now and
+    referred to by the request, as in ``generate``.
+    """
+    model = model or config.model
+    parts = [prepare_audio(audio_file or job_path(config.audio_file))] if with_audio else []
+    for piece in (context, text):
+        if piece:
+            parts.append(types.Part.from_text(text=piece))
+    request = types.InlinedRequest(
+        contents=[types.Content(role="user", parts=_as_parts(parts))],
+        config=types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            thinking_config=_thinking_config(),
+            tools=_tools(),
+        ),
+    )
+    return model, request
+
+
+async def submit_batch(model: str, requests: dict[str, types.InlinedRequest]) -> str:
+    """
+    Send requests, by key, as one batch job and return its name.
+    """
+    job = await _client().aio.batches.create(
+        model=model,
+        src=[
+            request.model_copy(update={"metadata": {"key": key}})
+            for key, request in requests.items()
+        ],
+    )
+    return job.name
+
+
+async def collect_batch(
+    model: str, batch_id: str, keys: list[str]
+) -> Optional[dict[str, tuple[Optional[str], dict]]]:
+    """
+    The answers of a finished batch job, with their usage, by key; None while
+    it is still running.
+    """
+    job = await _client().aio.batches.get(name=batch_id)
+    if job.state not in BATCH_ENDED:
+        return None
+    answers: dict[str, tuple[Optional[str], dict]] = {}
+    responses = (job.dest.inlined_responses if job.dest else None) or []
+    for index, item in enumerate(responses):
+        # Answers come back in the order asked; the key is only a check.
+        key = (item.metadata or {}).get("key") or (keys[index] if index < len(keys) else None)
+        if key is None or item.response is None:
+            continue
+        with capture() as counts:
+            _record_usage(model, item.response)
+        answers[key] = (item.response.text, counts)
+    return answers
+
+
+def _tools() -> list[types.Tool]:
+    return [types.Tool(google_search=types.GoogleSearch())]
+
+
+def _thinking_config() -> types.ThinkingConfig:
+    return types.ThinkingConfig(include_thoughts=True, thinking_level=types.ThinkingLevel.HIGH)
+
+
+async def _cached_context(
+    client, model: str, system_instruction: str, parts: list, tools: list
+) -> Optional[str]:
+    """
+    The name of cached contents holding the system instruction and ``parts``,
+    made on first use, or None when Gemini will not cache them.
+
+    Requests for every target language arrive at once; the first makes the
+    cache while the others wait for it rather than each making their own.
+    """
+    digest = hashlib.sha256(system_instruction.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update((part.uri if isinstance(part, types.File) else part.text or "").encode())
+    key = (config.api_key, model, digest.hexdigest())
+    lock_key = (asyncio.get_running_loop(), key)
+    lock = _context_locks.setdefault(lock_key, asyncio.Lock())
+
+    async with lock:
+        if key in _cached_contexts:
+            entry = _cached_contexts[key]
+            if entry is None:
+                return None
+            name, expires = entry
+            # A minute's margin, so the cache does not lapse under a request.
+            if expires > time.time() + 60:
+                return name
+        try:
+            cached = await client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role="user", parts=_as_parts(parts))],
+                    system_instruction=system_instruction,
+                    tools=tools,
+                    ttl=f"{CONTEXT_CACHE_SECONDS}s",
+                ),
+            )
+        except genai_errors.ClientError as e:
+            # Too short to cache, or a model without caching. Overload is not
+            # remembered, so a later request can still make the cache.
+            if not is_throttled(e):
+                _cached_contexts[key] = None
+            return None
+        except genai_errors.APIError:
+            return None
+        _cached_contexts[key] = (cached.name, time.time() + CONTEXT_CACHE_SECONDS)
+        return cached.name
+
+
+def _as_parts(parts: list) -> list[types.Part]:
+    return [
+        types.Part.from_uri(file_uri=part.uri, mime_type=part.mime_type)
+        if isinstance(part, types.File)
+        else part
+        for part in parts
+    ]
+
+
+async def _stream(client, model: str, parts: list, request_config, feed) -> str:
+    """
+    Stream one answer through ``feed``, returning the whole of it.
+    """
+    pieces: list[str] = []
+    last = None
+    stream = await client.aio.models.generate_content_stream(
+        model=model, contents=parts, config=request_config
+    )
+    try:
+        async with aclosing(stream):
+            async for chunk in stream:
+                last = chunk
+                if chunk.text:
+                    pieces.append(chunk.text)
+                    feed(chunk.text)
+    except StreamAborted:
+        record(_bucket(model), requests=1)
+        raise
+    # Every chunk carries the usage so far; the last one has the totals.
+    if last is not None:
+        _record_usage(model, last)
+    return "".join(pieces)
+
+
 async def speak(text: str, language: str) -> bytes:
     """
     Turn one piece of text into speech, returned as WAV bytes.
     """
-    client = genai.Client(api_key=config.api_key)
+    client = _client()
 
+    model = config.tts_model or DEFAULT_TTS_MODEL
     voice = config.tts_voice or DEFAULT_TTS_VOICE
-    response = await client.aio.models.generate_content(
-        model=config.tts_model or DEFAULT_TTS_MODEL,
-        contents=text,
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice),
+    async with model_slot(model, text):
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=text,
+            config=types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=types.SpeechConfig(
+                    voice_config=types.VoiceConfig(
+                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice),
+                    ),
                 ),
             ),
-        ),
-    )
+        )
 
-    model = config.tts_model or DEFAULT_TTS_MODEL
     bucket = _bucket(model)
-    bucket["requests"] += 1
-    bucket["tts_characters"] += len(text)
+    record(bucket, requests=1, tts_characters=len(text))
     meta = getattr(response, "usage_metadata", None)
     if meta and meta.candidates_token_count:
-        bucket["tts_output_tokens"] += meta.candidates_token_count
+        record(bucket, tts_output_tokens=meta.candidates_token_count)
 
     pcm = response.candidates[0].content.parts[0].inline_data.data
     return _pcm_to_wav(pcm)
 
 
-def _bucket(model: str) -> dict:
-    return usage.setdefault(
-        model,
-        {
-            "requests": 0,
-            "input_tokens": 0,
-            "audio_input_tokens": 0,
-            "output_tokens": 0,
-            "tts_characters": 0,
-            "tts_output_tokens": 0,
-        },
+def _client() -> genai.Client:
+    return clients.shared("gemini", _new_client, _close_client, base_url=config.base_url)
+
+
+def _new_client() -> genai.Client:
+    return genai.Client(
+        api_key=config.api_key,
+        http_options=types.HttpOptions(
+            base_url=config.base_url, httpx_async_client=clients.http_client()
+        ),
     )
 
 
-def _record_usage(response) -> None:
+async def _close_client(client: genai.Client) -> None:
+    await client.aio.aclose()
+    client.close()
+
+
+def _bucket(model: str) -> dict:
+    return usage_bucket(usage, model)
+
+
+def _record_usage(model: str, response) -> None:
     meta = getattr(response, "usage_metadata", None)
     if not meta:
         return
-    bucket = _bucket(config.model)
-    bucket["requests"] += 1
-    bucket["input_tokens"] += meta.prompt_token_count or 0
-    bucket["output_tokens"] += (meta.candidates_token_count or 0) + (
-        meta.thoughts_token_count or 0
+    bucket = _bucket(model)
+    record(
+        bucket,
+        requests=1,
+        input_tokens=meta.prompt_token_count or 0,
+        output_tokens=(meta.candidates_token_count or 0) + (meta.thoughts_token_count or 0),
+        cached_input_tokens=meta.cached_content_token_count or 0,
     )
     for detail in meta.prompt_tokens_details or []:
         if detail.modality == types.MediaModality.AUDIO:
-            bucket["audio_input_tokens"] += detail.token_count or 0
+            record(bucket, audio_input_tokens=detail.token_count or 0)
 
 
 def _pcm_to_wav(pcm: bytes) -> bytes:
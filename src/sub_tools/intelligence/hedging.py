@@ -0,0 +1,92 @@
+"""
+Hedged requests.
+
+Most answers to similar requests arrive in about the same time, but now and
+then one stalls for minutes while the rest of the run waits on it. Once a
+request has taken longer than a chosen percentile of recent ones, a second copy
+goes out, to a fallback model if one is configured. Whichever answer is
+accepted first is used and the other request is cancelled, so the duplicate
+only costs anything in the slow tail.
+
+Latencies are remembered per model and per kind of request, since a request
+with audio takes far longer than a text-only one to the same model.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Optional
+
+from ..config import config
+
+# Recent latencies kept per model and kind of request.
+HISTORY = 50
+
+# With fewer latencies than this the percentile says little, so no request
+# is hedged until enough have been seen.
+MIN_SAMPLES = 5
+
+_latencies: dict[tuple[str, bool], deque[float]] = {}
+
+
+def observe(model: str, with_audio: bool, seconds: float) -> None:
+    """
+    Remember how long a request that was answered took.
+    """
+    _latencies.setdefault((model, with_audio), deque(maxlen=HISTORY)).append(seconds)
+
+
+def hedge_delay(model: str, with_audio: bool) -> Optional[float]:
+    """
+    Seconds to wait before hedging a request, or None to never hedge it.
+    """
+    if not config.hedge_percentile:
+        return None
+    history = _latencies.get((model, with_audio))
+    if not history or len(history) < MIN_SAMPLES:
+        return None
+    ordered = sorted(history)
+    rank = min(len(ordered) - 1, int(len(ordered) * config.hedge_percentile / 100))
+    return ordered[rank]
+
+
+async def race(
+    primary: Callable[[], Awaitable[Optional[str]]],
+    backup: Callable[[], Awaitable[Optional[str]]],
+    delay: float,
+    accept: Callable[[Optional[str]], bool],
+    hedged: Callable[[], None] = lambda: None,
+) -> Optional[str]:
+    """
+    Start ``primary``, and ``backup`` as well if no answer came within ``delay``.
+
+    Returns the first answer ``accept`` approves and cancels the other
+    request. When neither is approved, the first answer to arrive is returned
+    for the caller to reject as usual; when both failed, the primary's error
+    is raised.
+    """
+    first = asyncio.create_task(primary())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    hedged()
+    second = asyncio.create_task(backup())
+    pending = {first, second}
+    answers: list[Optional[str]] = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                if accept(task.result()):
+                    return task.result()
+                answers.append(task.result())
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if answers:
+        return answers[0]
+    raise first.exception()
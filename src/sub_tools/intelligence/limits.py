@@ -0,0 +1,323 @@
+"""
+Limits on provider requests in flight.
+
+Two limits apply to every request. The first is a fixed one for the whole
+process. Each stage bounds its own concurrency, but a batch of jobs runs many
+stages at once, and together they would send as many requests as they like. So
+every request takes a slot here first, and the process never has more than
+``config.max_requests`` in flight, however many jobs, languages or windows are
+waiting.
+
+The second adapts to the provider, separately for each model. It starts small
+and lets one more request in for every round of requests that succeed. When the
+provider says it is overloaded (a 429, a 503 or ResourceExhausted), the limit
+halves, and a Retry-After the provider sends holds back every request to that
+model until the time it names. This keeps runs close to the provider's quota
+ceiling without all the throttled requests retrying at the same moment.
+Retries also wait a randomised share of their backoff so they spread out.
+When the provider's published quota is known, ``quota`` keeps requests under
+it before the adaptive limit is even asked.
+
+Stages run their own event loops, one after another and, in a batch, side by
+side in threads. So the limits are kept with a lock rather than with asyncio
+semaphores, which belong to a single loop.
+"""
+
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from ..config import config
+from . import accounting, quota
+from .retry import backoff
+
+# Requests to a model let through at once before any have succeeded.
+INITIAL_WINDOW = 4
+
+# Ceiling for the adaptive limit when the process-wide one is switched off.
+MAX_WINDOW = 64
+
+# Retry-After values beyond this are treated as this, so a bad header cannot
+# stall a run for hours.
+MAX_RETRY_AFTER = 300
+
+# HTTP statuses that mean the provider is overloaded rather than the request bad.
+THROTTLE_STATUSES = (429, 503)
+
+# Exception class names that mean the same, for SDKs that raise them without a status.
+THROTTLE_ERRORS = ("RateLimitError", "ResourceExhausted", "ServiceUnavailable")
+THROTTLE_MESSAGE = re.compile(r"\b(429|503)\b")
+
+
+class RequestLimit:
+    """
+    A counting limit that coroutines on any event loop, in any thread, can wait on.
+
+    Waiters are served first come, first served. A freed slot is handed straight
+    to the next waiter, so a newcomer cannot take it in between. The size can
+    change at any time; slots already taken beyond a smaller size are not
+    revoked, but none are handed out until enough come back.
+    """
+
+    def __init__(self, size: int = 1):
+        self.size = size
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def active(self) -> int:
+        """
+        Slots currently taken.
+        """
+        return self._active
+
+    def resize(self, size: int) -> None:
+        """
+        Change how many slots there are, letting waiters in if it grew.
+        """
+        with self._lock:
+            self.size = size
+            self._admit()
+
+    async def acquire(self) -> None:
+        """
+        Wait until a slot is free, then take it.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.size and not self._waiters:
+                self._active += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        future = waiter[1]
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over before the cancellation arrived. A
+            # cancelled future gives it back in _hand_over; otherwise it is ours
+            # to give back.
+            if not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """
+        Give a slot back, to the longest waiting coroutine if there is room.
+        """
+        with self._lock:
+            self._active -= 1
+            self._admit()
+
+    def _admit(self) -> None:
+        while self._waiters and self._active < self.size:
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._hand_over, future)
+            except RuntimeError:
+                continue  # Its event loop has already closed.
+            self._active += 1
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class AdaptiveLimit:
+    """
+    An additive-increase, multiplicative-decrease limit for one provider model.
+    """
+
+    def __init__(self, ceiling: int):
+        self.ceiling = ceiling
+        self.window = float(min(INITIAL_WINDOW, ceiling))
+        self.paused_until = 0.0
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._slots = RequestLimit(int(self.window))
+
+    @property
+    def active(self) -> int:
+        """
+        Requests to the model currently in flight.
+        """
+        return self._slots.active
+
+    async def acquire(self) -> int:
+        """
+        Wait out any pause the provider asked for, then take a slot.
+
+        Returns the number of decreases so far, for ``throttled``.
+        """
+        while (wait := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(wait)
+        await self._slots.acquire()
+        return self._epoch
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def succeeded(self) -> None:
+        """
+        Let one more request in for every window's worth of successes.
+        """
+        with self._lock:
+            self.window = min(float(self.ceiling), self.window + 1 / self.window)
+            self._slots.resize(int(self.window))
+
+    def throttled(self, epoch: int, retry_after: Optional[float] = None) -> None:
+        """
+        Halve the limit after the provider refused a request for load.
+
+        Requests already in flight when the limit last halved were sent under
+        the old limit, so their refusals do not halve it again. ``epoch`` is
+        what ``acquire`` returned for the refused request.
+        """
+        with self._lock:
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if epoch != self._epoch:
+                return
+            self._epoch += 1
+            self.window = max(1.0, self.window / 2)
+            self._slots.resize(int(self.window))
+
+
+_limit = RequestLimit(config.max_requests)
+_adaptive: dict[tuple[str, str], AdaptiveLimit] = {}
+_adaptive_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def request_slot() -> AsyncIterator[None]:
+    """
+    Hold one of the process's request slots for the duration of the block.
+    """
+    if config.max_requests <= 0:
+        yield
+        return
+    if _limit.size != config.max_requests:
+        _limit.resize(config.max_requests)
+    await _limit.acquire()
+    try:
+        yield
+    finally:
+        _limit.release()
+
+
+@asynccontextmanager
+async def model_slot(
+    model: str, prompt: str = "", audio_file: Optional[str] = None
+) -> AsyncIterator[None]:
+    """
+    Hold a slot under the adaptive limit of the selected provider's ``model``.
+
+    The request first waits for the model's per-minute quota, if one is set,
+    with ``prompt`` and ``audio_file`` giving the size of the request. A block
+    that ends in an overload error shrinks the limit and one that ends
+    normally grows it; other errors leave it as it was.
+    """
+    audio_seconds = await asyncio.to_thread(quota.audio_seconds, audio_file) if audio_file else 0
+    async with quota.reserve(model, prompt, audio_file):
+        limit = adaptive_limit(config.resolved_provider, model)
+        epoch = await limit.acquire()
+        try:
+            with accounting.attempt(config.resolved_provider, model, audio_seconds):
+                yield
+        except Exception as error:
+            if is_throttled(error):
+                limit.throttled(epoch, retry_after(error))
+            raise
+        else:
+            limit.succeeded()
+        finally:
+            limit.release()
+
+
+def adaptive_limit(provider: str, model: str) -> AdaptiveLimit:
+    """
+    The adaptive limit for one provider model, made on first use.
+    """
+    with _adaptive_lock:
+        key = (provider, model)
+        if key not in _adaptive:
+            _adaptive[key] = AdaptiveLimit(config.max_requests or MAX_WINDOW)
+        return _adaptive[key]
+
+
+async def pause(error: Exception, attempt: int) -> None:
+    """
+    Wait before retrying a request that failed with ``error``.
+    """
+    await asyncio.sleep(retry_delay(error, attempt))
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before a retry: the provider's Retry-After if it sent one,
+    otherwise a random share of the backoff, so retries do not all line up.
+    """
+    after = retry_after(error)
+    if after is not None:
+        return after + random.uniform(0, max(1.0, after / 4))
+    wait = backoff(attempt)
+    return random.uniform(wait / 2, wait)
+
+
+def is_throttled(error: BaseException) -> bool:
+    """
+    Whether an error means the provider is overloaded rather than the request bad.
+    """
+    if type(error).__name__ in THROTTLE_ERRORS:
+        return True
+    for name in ("status_code", "code", "status"):
+        if getattr(error, name, None) in THROTTLE_STATUSES:
+            return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in THROTTLE_STATUSES:
+        return True
+    # Some SDKs surface overload only in the message, depending on transport.
+    return THROTTLE_MESSAGE.search(str(error)) is not None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    The wait an error's Retry-After header asks for, in seconds, if it has one.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds:
+            return min(MAX_RETRY_AFTER, max(0.0, float(milliseconds) / 1000))
+        value = headers.get("retry-after")
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = when.timestamp() - time.time()
+    return min(MAX_RETRY_AFTER, max(0.0, seconds))
@@ -8,22 +8,29 @@ keeps the text-only work, such as translation.
 
 The audio is inlined into each request as base64 rather than uploaded, so
 recordings that would blow the request cap are first re-encoded at a speech
-bitrate; that keeps roughly an hour of audio within one call.
+bitrate; that keeps roughly an hour of audio within one call. The base64 is
+encoded from the file as the request is sent (see ``payloads``), never held.
 """
 
-import asyncio
-import base64
+import hashlib
+import json
 import os
 import subprocess
 import tempfile
-from typing import Optional
+from typing import Callable, Optional
 
 import openai
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 
 from ..config import config
+from ..media.converter import audio_profile
+from ..subtitles.stream import StreamAborted
 from ..system.console import info
-from .retry import backoff
+from ..system.file import job_path
+from . import clients, payloads
+from .accounting import capture, record, usage_bucket
+from .limits import model_slot, pause
 
 DEFAULT_AUDIO_MODEL = "whisper-1"
 DEFAULT_TTS_MODEL = "gpt-4o-mini-tts"
@@ -48,23 +55,35 @@ TRANSCRIPTION_API_PREFIXES = ("whisper", "gpt-4o-transcribe", "gpt-4o-mini-trans
 # file itself must stay under this for the request to fit.
 MAX_FILE_BYTES = 15 * 1024 * 1024
 
+# The formats chat models take audio in.
+INPUT_AUDIO_FORMATS = ("mp3", "wav")
+
+# The formats the transcription endpoint takes, by file extension. Opus files
+# are Ogg inside and go up under that name.
+TRANSCRIPTION_FORMATS = (
+    "flac", "m4a", "mp3", "mp4", "mpeg", "mpga", "oga", "ogg", "opus", "wav", "webm",
+)
+
 # Mono speech at this rate stays intelligible to the model and fits about an
 # hour of audio under the cap (32 kbit/s ≈ 14.4 MB/hour).
 COMPRESS_BITRATE = "32k"
 COMPRESS_SAMPLE_RATE = 16_000
 
+# The Batch API endpoint chat requests go to, and the states of a batch that
+# will not change any more.
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_ENDED = ("completed", "failed", "expired", "cancelled")
+
 # Token and character counts per model, for cost accounting. TTS is billed by
 # input character, not by returned audio.
 usage: dict[str, dict] = {}
 
-_audio_cache: dict[str, tuple[str, str]] = {}
 
-
-def accepts_audio() -> bool:
+def accepts_audio(model: Optional[str] = None) -> bool:
     """
-    Whether the selected model can hear audio itself.
+    Whether the selected model, or ``model``, can hear audio itself.
     """
-    return config.model.lower().startswith(AUDIO_MODEL_PREFIXES)
+    return (model or config.model).lower().startswith(AUDIO_MODEL_PREFIXES)
 
 
 def can_transcribe_audio() -> bool:
@@ -79,54 +98,69 @@ def uses_transcription_api(model: str) -> bool:
     return model.lower().startswith(TRANSCRIPTION_API_PREFIXES)
 
 
-def generation_model(with_audio: bool) -> str:
+def generation_model(with_audio: bool, model: Optional[str] = None) -> str:
     """
     The model a request should go to: audio requests from a text-only model
     are routed to the audio model.
     """
-    if with_audio and uses_transcription_api(config.model):
-        return config.model
-    if with_audio and not accepts_audio():
+    model = model or config.model
+    if with_audio and uses_transcription_api(model):
+        return model
+    if with_audio and not accepts_audio(model):
         return config.audio_model or DEFAULT_AUDIO_MODEL
-    return config.model
+    return model
 
 
-_send_files: dict[str, tuple[str, str]] = {}
+_send_files: dict[tuple[str, tuple[str, ...]], tuple[str, str]] = {}
 
 
-def _send_file() -> tuple[str, str]:
+def _send_file(
+    path: Optional[str] = None, formats: tuple[str, ...] = INPUT_AUDIO_FORMATS
+) -> tuple[str, str]:
     """
     The file to actually send, as (path, format).
 
-    Files too large to send are re-encoded for speech first; only a file that
-    stays oversized after that is refused.
+    Files too large to send, or in none of ``formats``, are re-encoded for
+    speech first, unless the job's audio profile already encoded them for it;
+    only a file that stays oversized after that is refused.
     """
-    path = config.audio_file
-    if path not in _send_files:
+    path = path or job_path(config.audio_file)
+    if (path, formats) not in _send_files:
         send_path, extension = path, _extension(path)
-        if os.path.getsize(path) > MAX_FILE_BYTES:
+        oversized = os.path.getsize(path) > MAX_FILE_BYTES
+        reencoded = (oversized and audio_profile() == "full") or extension not in formats
+        if reencoded:
             send_path, extension = _compress(path), "mp3"
-            if os.path.getsize(send_path) > MAX_FILE_BYTES:
-                raise RuntimeError(
-                    f"{path} is still too large for OpenAI audio input after "
-                    f"re-encoding at {COMPRESS_BITRATE}bit/s; the cap allows about "
-                    f"an hour of speech. Use a Gemini model for this file."
-                )
-        _send_files[path] = (send_path, extension)
-    return _send_files[path]
-
-
-def prepare_audio() -> tuple[str, str]:
+        if os.path.getsize(send_path) > MAX_FILE_BYTES:
+            how = (
+                f"after re-encoding at {COMPRESS_BITRATE}bit/s"
+                if reencoded
+                else f"in its {audio_profile()} audio profile"
+            )
+            raise RuntimeError(
+                f"{path} is still too large for OpenAI audio input {how}; the cap "
+                f"allows about an hour of speech. Use a Gemini model for this file."
+            )
+        _send_files[path, formats] = (send_path, extension)
+    return _send_files[path, formats]
+
+
+def prepare_audio(path: Optional[str] = None) -> tuple[str, str]:
     """
-    Read and base64-encode the configured audio file once, returning (data, format).
+    An audio file, the configured one by default, as (data, format) for a
+    request.
+
+    The data is a placeholder that the client fills in with the base64 of the
+    file as it sends the request. The file is made ready in the formats of the
+    endpoint the configured model's audio goes to.
     """
-    path = config.audio_file
-    if path not in _audio_cache:
-        send_path, extension = _send_file()
-        with open(send_path, "rb") as f:
-            data = base64.b64encode(f.read()).decode("ascii")
-        _audio_cache[path] = (data, extension)
-    return _audio_cache[path]
+    formats = (
+        TRANSCRIPTION_FORMATS
+        if uses_transcription_api(generation_model(True))
+        else INPUT_AUDIO_FORMATS
+    )
+    send_path, extension = _send_file(path, formats)
+    return payloads.placeholder(send_path), extension
 
 
 def _extension(path: str) -> str:
@@ -162,56 +196,195 @@ async def generate(
     system_instruction: str,
     text: Optional[str] = None,
     with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    model: Optional[str] = None,
+    watch: Optional[Callable[[], Callable[[str], None]]] = None,
+    context: Optional[str] = None,
 ) -> Optional[str]:
     """
     Ask the model once for subtitles, retrying only transient failures.
+
+    ``audio_file`` replaces the configured recording, e.g. with one window of it,
+    and ``model`` the configured model. With ``watch``, the answer is streamed:
+    each try calls it for a function that is handed the answer piece by piece
+    and may raise to abandon it. The transcription endpoint is never streamed.
+
+    ``context`` is text that many requests share. OpenAI caches long prompt
+    prefixes by itself, so it is sent right after the system instruction and
+    audio, before ``text``, and requests sharing it are given the same cache key.
     """
-    model = generation_model(with_audio)
-    if with_audio and model != config.model:
-        info(f"{config.model} cannot hear audio; listening with {model}")
+    requested = model or config.model
+    model = generation_model(with_audio, requested)
+    if with_audio and model != requested:
+        info(f"{requested} cannot hear audio; listening with {model}")
 
     if with_audio and uses_transcription_api(model):
-        return await _transcribe_via_api(model)
+        return await _transcribe_via_api(model, audio_file)
 
-    content: list[dict] = []
-    if with_audio:
-        data, audio_format = prepare_audio()
-        content.append(
-            {"type": "input_audio", "input_audio": {"data": data, "format": audio_format}}
-        )
-    if text:
-        content.append({"type": "text", "text": text})
+    audio_path = (audio_file or job_path(config.audio_file)) if with_audio else None
+    messages, kwargs = _chat_request(system_instruction, text, audio_path, context)
 
-    kwargs = {"modalities": ["text"]} if with_audio else {}
+    client = _client()
+    for attempt in range(config.retry):
+        try:
+            prompt = system_instruction + (context or "") + (text or "")
+            async with model_slot(model, prompt, audio_path):
+                if watch is not None:
+                    return await _stream(client, model, messages, kwargs, watch())
 
-    async with AsyncOpenAI(api_key=config.api_key) as client:
-        for attempt in range(config.retry):
-            try:
                 response = await client.chat.completions.create(
                     model=model,
-                    messages=[
-                        {"role": "system", "content": system_instruction},
-                        {"role": "user", "content": content},
-                    ],
+                    messages=messages,
                     **kwargs,
                 )
                 _record_usage(model, response.usage)
-                return response.choices[0].message.content
-
-            except (
-                openai.RateLimitError,
-                openai.InternalServerError,
-                openai.APIConnectionError,
-            ) as e:
-                if attempt < config.retry - 1:
-                    await asyncio.sleep(backoff(attempt))
-                    continue
-                raise e
+            return response.choices[0].message.content
+
+        except (
+            openai.RateLimitError,
+            openai.InternalServerError,
+            openai.APIConnectionError,
+        ) as e:
+            if attempt < config.retry - 1:
+                await pause(e, attempt)
+                continue
+            raise e
 
     return None
 
 
-async def _transcribe_via_api(model: str) -> Optional[str]:
+def _chat_request(
+    system_instruction: str,
+    text: Optional[str],
+    audio_path: Optional[str],
+    context: Optional[str],
+) -> tuple[list[dict], dict]:
+    """
+    The messages of a chat request and its other arguments besides the model.
+    """
+    content: list[dict] = []
+    if audio_path:
+        send_path, audio_format = _send_file(audio_path)
+        data = payloads.placeholder(send_path)
+        content.append(
+            {"type": "input_audio", "input_audio": {"data": data, "format": audio_format}}
+        )
+    if context:
+        content.append({"type": "text", "text": context})
+    if text:
+        content.append({"type": "text", "text": text})
+
+    kwargs: dict = {"modalities": ["text"]} if audio_path else {}
+    if context and config.context_cache:
+        prefix = f"{system_instruction}\0{context}".encode("utf-8")
+        kwargs["prompt_cache_key"] = hashlib.sha256(prefix).hexdigest()[:32]
+
+    messages = [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": content},
+    ]
+    return messages, kwargs
+
+
+def batch_request(
+    system_instruction: str,
+    text: Optional[str] = None,
+    with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    model: Optional[str] = None,
+    context: Optional[str] = None,
+) -> Optional[tuple[str, dict]]:
+    """
+    The model and body of a chat request for the Batch API, or None for a
+    request that has to go to the transcription endpoint directly.
+    """
+    model = generation_model(with_audio, model or config.model)
+    if with_audio and uses_transcription_api(model):
+        return None
+    audio_path = (audio_file or job_path(config.audio_file)) if with_audio else None
+    messages, kwargs = _chat_request(system_instruction, text, audio_path, context)
+    return model, {"model": model, "messages": messages, **kwargs}
+
+
+async def submit_batch(model: str, requests: dict[str, dict]) -> str:
+    """
+    Send chat requests, by custom ID, as one batch and return its ID.
+    """
+    client = _client()
+    # Audio is filled in as the file is written, and the file uploaded from disk.
+    with tempfile.TemporaryFile(suffix=".jsonl") as f:
+        for key, body in requests.items():
+            line = {"custom_id": key, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            payloads.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n", f)
+        f.seek(0)
+        batch_file = await client.files.create(file=("requests.jsonl", f), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    return batch.id
+
+
+async def collect_batch(
+    model: str, batch_id: str, keys: list[str]
+) -> Optional[dict[str, tuple[Optional[str], dict]]]:
+    """
+    The answers of a finished batch, with their usage, by custom ID; None
+    while it is still running.
+    """
+    client = _client()
+    batch = await client.batches.retrieve(batch_id)
+    if batch.status not in BATCH_ENDED:
+        return None
+    answers: dict[str, tuple[Optional[str], dict]] = {}
+    if not batch.output_file_id:
+        return answers
+    output = await client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        completion = ChatCompletion.model_validate(response["body"])
+        with capture() as counts:
+            _record_usage(model, completion.usage)
+        answers[item["custom_id"]] = (completion.choices[0].message.content, counts)
+    return answers
+
+
+async def _stream(client: AsyncOpenAI, model: str, messages: list, kwargs: dict, feed) -> str:
+    """
+    Stream one answer through ``feed``, returning the whole of it.
+    """
+    pieces: list[str] = []
+    response_usage = None
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+    try:
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage:
+                    response_usage = chunk.usage
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    pieces.append(piece)
+                    feed(piece)
+    except StreamAborted:
+        record(_bucket(model), requests=1)
+        raise
+    _record_usage(model, response_usage)
+    return "".join(pieces)
+
+
+async def _transcribe_via_api(model: str, audio_file: Optional[str] = None) -> Optional[str]:
     """
     Transcribe through the dedicated endpoint, which answers in SRT directly.
 
@@ -220,32 +393,36 @@ async def _transcribe_via_api(model: str) -> Optional[str]:
     """
     from ..media.converter import audio_duration
 
-    send_path, _ = _send_file()
-
-    async with AsyncOpenAI(api_key=config.api_key) as client:
-        for attempt in range(config.retry):
-            try:
-                with open(send_path, "rb") as f:
+    path = audio_file or job_path(config.audio_file)
+    send_path, extension = _send_file(path, TRANSCRIPTION_FORMATS)
+    # The endpoint tells formats apart by the file name alone.
+    stem = os.path.splitext(os.path.basename(send_path))[0]
+    name = f"{stem}.{'ogg' if extension == 'opus' else extension}"
+
+    client = _client()
+    for attempt in range(config.retry):
+        try:
+            with open(send_path, "rb") as f:
+                async with model_slot(model, audio_file=path):
                     result = await client.audio.transcriptions.create(
                         model=model,
-                        file=f,
+                        file=(name, f),
                         response_format="srt",
                         language=config.source_language,
                     )
-                bucket = _bucket(model)
-                bucket["requests"] += 1
-                bucket["transcribe_seconds"] += audio_duration(config.audio_file) or 0
-                return result if isinstance(result, str) else getattr(result, "text", None)
-
-            except (
-                openai.RateLimitError,
-                openai.InternalServerError,
-                openai.APIConnectionError,
-            ) as e:
-                if attempt < config.retry - 1:
-                    await asyncio.sleep(backoff(attempt))
-                    continue
-                raise e
+            bucket = _bucket(model)
+            record(bucket, requests=1, transcribe_seconds=audio_duration(path) or 0)
+            return result if isinstance(result, str) else getattr(result, "text", None)
+
+        except (
+            openai.RateLimitError,
+            openai.InternalServerError,
+            openai.APIConnectionError,
+        ) as e:
+            if attempt < config.retry - 1:
+                await pause(e, attempt)
+                continue
+            raise e
 
     return None
 
@@ -256,43 +433,57 @@ async def speak(text: str, language: str) -> bytes:
     """
     model = config.tts_model or DEFAULT_TTS_MODEL
 
-    async with AsyncOpenAI(api_key=config.api_key) as client:
-        response = await client.audio.speech.create(
+    async with model_slot(model, text):
+        response = await _client().audio.speech.create(
             model=model,
             voice=config.tts_voice or DEFAULT_TTS_VOICE,
             input=text,
             instructions=f"Speak naturally in {language}, matching the pace of subtitles.",
             response_format="wav",
         )
-        data = response.read()
+    data = response.read()
 
     bucket = _bucket(model)
-    bucket["requests"] += 1
-    bucket["tts_characters"] += len(text)
+    record(bucket, requests=1, tts_characters=len(text))
     return data
 
 
-def _bucket(model: str) -> dict:
-    return usage.setdefault(
-        model,
-        {
-            "requests": 0,
-            "input_tokens": 0,
-            "audio_input_tokens": 0,
-            "output_tokens": 0,
-            "tts_characters": 0,
-            "transcribe_seconds": 0,
-        },
+def _client() -> AsyncOpenAI:
+    return clients.shared("openai", _new_client, _close_client, base_url=config.base_url)
+
+
+def _new_client() -> AsyncOpenAI:
+    # Retries are left to generate, so every refusal reaches the adaptive limit.
+    return AsyncOpenAI(
+        api_key=config.api_key,
+        base_url=config.base_url,
+        max_retries=0,
+        # A plain httpx client: the SDK's own may be built on another HTTP
+        # library, which the inlining transport cannot sit under.
+        http_client=clients.http_client(transport=payloads.transport()),
     )
 
 
+async def _close_client(client: AsyncOpenAI) -> None:
+    await client.close()
+
+
+def _bucket(model: str) -> dict:
+    return usage_bucket(usage, model)
+
+
 def _record_usage(model: str, response_usage) -> None:
     if not response_usage:
         return
     bucket = _bucket(model)
-    bucket["requests"] += 1
-    bucket["input_tokens"] += response_usage.prompt_tokens or 0
-    bucket["output_tokens"] += response_usage.completion_tokens or 0
+    record(
+        bucket,
+        requests=1,
+        input_tokens=response_usage.prompt_tokens or 0,
+        output_tokens=response_usage.completion_tokens or 0,
+    )
     details = getattr(response_usage, "prompt_tokens_details", None)
     if details and getattr(details, "audio_tokens", None):
-        bucket["audio_input_tokens"] += details.audio_tokens
+        record(bucket, audio_input_tokens=details.audio_tokens)
+    if details and getattr(details, "cached_tokens", None):
+        record(bucket, cached_input_tokens=details.cached_tokens)
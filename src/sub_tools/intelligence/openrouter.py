@@ -7,16 +7,21 @@ directly; dedicated speech-to-text models are also supported when their response
 includes timestamped segments.
 """
 
-import base64
 import os
 import subprocess
 import tempfile
-from typing import Any
+from typing import Any, Callable
 
 from openrouter import OpenRouter
 
 from ..config import config
+from ..media.converter import audio_profile
+from ..subtitles.stream import StreamAborted
 from ..system.console import info
+from ..system.file import job_path
+from . import clients, payloads
+from .accounting import record, usage_bucket
+from .limits import model_slot
 
 DEFAULT_AUDIO_MODEL = "google/gemini-2.5-flash"
 DEFAULT_TTS_MODEL = "openai/gpt-4o-mini-tts"
@@ -45,21 +50,21 @@ TRANSCRIPTION_MODEL_HINTS = (
 )
 
 # Keep requests reasonably sized for providers behind OpenRouter. Audio input
-# is base64-encoded, so a 15 MB source remains a safe size for most contexts.
+# is base64-encoded as the request is sent, so a 15 MB source remains a safe
+# size for most contexts.
 MAX_FILE_BYTES = 15 * 1024 * 1024
 COMPRESS_BITRATE = "32k"
 COMPRESS_SAMPLE_RATE = 16_000
 
 usage: dict[str, dict] = {}
 _send_files: dict[str, tuple[str, str]] = {}
-_audio_cache: dict[str, tuple[str, str]] = {}
 
 
-def accepts_audio() -> bool:
-    """Whether the selected model is likely to accept chat audio input."""
-    model = _model_leaf(config.model)
-    return _has_hint(model, AUDIO_MODEL_HINTS) and not uses_transcription_api(
-        config.model
+def accepts_audio(model: str | None = None) -> bool:
+    """Whether the selected model, or ``model``, is likely to accept chat audio input."""
+    model = model or config.model
+    return _has_hint(_model_leaf(model), AUDIO_MODEL_HINTS) and not uses_transcription_api(
+        model
     )
 
 
@@ -73,80 +78,132 @@ def uses_transcription_api(model: str) -> bool:
     return _has_hint(_model_leaf(model), TRANSCRIPTION_MODEL_HINTS)
 
 
-def generation_model(with_audio: bool) -> str:
-    """Choose the configured model or an audio model for an audio request."""
-    if with_audio and uses_transcription_api(config.model):
-        return config.model
-    if with_audio and not accepts_audio():
+def generation_model(with_audio: bool, model: str | None = None) -> str:
+    """Choose the configured model, or ``model``, or an audio model for an audio request."""
+    model = model or config.model
+    if with_audio and uses_transcription_api(model):
+        return model
+    if with_audio and not accepts_audio(model):
         return config.audio_model or DEFAULT_AUDIO_MODEL
-    return config.model
+    return model
+
 
+def prepare_audio(path: str | None = None) -> tuple[str, str]:
+    """
+    An audio file, the configured one by default, as (data, format) for a request.
 
-def prepare_audio() -> tuple[str, str]:
-    """Read and base64-encode the configured audio file once."""
-    path = config.audio_file
-    if path not in _audio_cache:
-        send_path, extension = _send_file()
-        with open(send_path, "rb") as audio:
-            data = base64.b64encode(audio.read()).decode("ascii")
-        _audio_cache[path] = (data, extension)
-    return _audio_cache[path]
+    The data is a placeholder that the client fills in with the base64 of the
+    file as it sends the request.
+    """
+    send_path, extension = _send_file(path)
+    return payloads.placeholder(send_path), extension
 
 
 async def generate(
     system_instruction: str,
     text: str | None = None,
     with_audio: bool = True,
+    audio_file: str | None = None,
+    model: str | None = None,
+    watch: Callable[[], Callable[[str], None]] | None = None,
+    context: str | None = None,
 ) -> str | None:
-    """Ask one OpenRouter model for subtitles using the SDK retry policy."""
-    model = generation_model(with_audio)
-    if with_audio and model != config.model:
-        info(f"{config.model} cannot hear audio; listening with {model}")
+    """
+    Ask one OpenRouter model for subtitles using the SDK retry policy.
+
+    With ``watch``, a chat answer is streamed to the function it returns, which
+    may raise to abandon it. ``context`` is text that many requests share, sent
+    before ``text``; with ``config.context_cache`` it carries a cache breakpoint,
+    which OpenRouter passes on to providers that need one and others ignore.
+    """
+    requested = model or config.model
+    model = generation_model(with_audio, requested)
+    if with_audio and model != requested:
+        info(f"{requested} cannot hear audio; listening with {model}")
 
     if with_audio and uses_transcription_api(model):
-        return await _transcribe_via_api(model)
+        return await _transcribe_via_api(model, audio_file)
 
     content: str | list[dict[str, Any]]
-    if with_audio:
-        data, audio_format = prepare_audio()
-        content = [
-            {
-                "type": "input_audio",
-                "input_audio": {"data": data, "format_": audio_format},
-            }
-        ]
+    if with_audio or context:
+        content = []
+        if with_audio:
+            data, audio_format = prepare_audio(audio_file)
+            content.append(
+                {
+                    "type": "input_audio",
+                    "input_audio": {"data": data, "format_": audio_format},
+                }
+            )
+        if context:
+            part: dict[str, Any] = {"type": "text", "text": context}
+            if config.context_cache:
+                part["cache_control"] = {"type": "ephemeral"}
+            content.append(part)
         if text:
             content.append({"type": "text", "text": text})
     else:
         content = text or ""
 
-    async with _client() as client:
+    messages = [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": content},
+    ]
+    client = _client()
+    audio_path = (audio_file or job_path(config.audio_file)) if with_audio else None
+    prompt = system_instruction + (context or "") + (text or "")
+    async with model_slot(model, prompt, audio_path):
+        if watch is not None:
+            return await _stream(client, model, messages, watch())
         response = await client.chat.send_async(
             model=model,
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": content},
-            ],
+            messages=messages,
             stream=False,
         )
-    _record_usage(model, response.usage)
+        _record_usage(model, response.usage)
     return _message_text(response.choices[0].message)
 
 
-async def _transcribe_via_api(model: str) -> str | None:
+async def _stream(client: OpenRouter, model: str, messages: list, feed) -> str:
+    """Stream one chat answer through ``feed``, returning the whole of it."""
+    pieces: list[str] = []
+    response_usage = None
+    stream = await client.chat.send_async(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    try:
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage:
+                    response_usage = chunk.usage
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if isinstance(piece, str) and piece:
+                    pieces.append(piece)
+                    feed(piece)
+    except StreamAborted:
+        record(_bucket(model), requests=1)
+        raise
+    _record_usage(model, response_usage)
+    return "".join(pieces)
+
+
+async def _transcribe_via_api(model: str, audio_file: str | None = None) -> str | None:
     """Use OpenRouter's SDK STT endpoint and preserve returned segments."""
-    send_path, _ = _send_file()
-    async with _client() as client:
-        with open(send_path, "rb") as audio:
-            result = await client.stt.create_transcription_multipart_async(
+    send_path, _ = _send_file(audio_file)
+    with open(send_path, "rb") as audio:
+        async with model_slot(model, audio_file=audio_file or job_path(config.audio_file)):
+            result = await _client().stt.create_transcription_multipart_async(
                 file={"file_name": os.path.basename(send_path), "content": audio},
                 model=model,
                 language=config.source_language,
                 response_format="verbose_json",
                 timestamp_granularities=["segment"],
             )
+            _record_transcription_usage(model, result.usage)
 
-    _record_transcription_usage(model, result.usage)
     if result.segments:
         return _segments_to_srt(result.segments)
     # Non-OpenAI-compatible STT providers may return text only. Returning it
@@ -158,30 +215,41 @@ async def _transcribe_via_api(model: str) -> str | None:
 async def speak(text: str, language: str) -> bytes:
     """Generate speech through OpenRouter's TTS endpoint."""
     model = config.tts_model or DEFAULT_TTS_MODEL
-    async with _client() as client:
-        response = await client.tts.create_speech_async(
+    async with model_slot(model, text):
+        response = await _client().tts.create_speech_async(
             model=model,
             input=text,
             voice=config.tts_voice or DEFAULT_TTS_VOICE,
             response_format="mp3",
         )
         await response.aread()
-        data = response.content
+    data = response.content
 
     bucket = _bucket(model)
-    bucket["requests"] += 1
-    bucket["tts_characters"] += len(text)
+    record(bucket, requests=1, tts_characters=len(text))
     return data
 
 
 def _client() -> OpenRouter:
+    return clients.shared("openrouter", _new_client, _close_client, base_url=config.base_url)
+
+
+def _new_client() -> OpenRouter:
     return OpenRouter(
         api_key=config.api_key,
+        server_url=config.base_url,
         http_referer="https://github.com/dohyeondk/sub-tools",
         x_open_router_title="sub-tools",
+        async_client=clients.http_client(transport=payloads.transport()),
     )
 
 
+async def _close_client(client: OpenRouter) -> None:
+    # The SDK leaves clients it was handed open, so they are closed here.
+    await client.sdk_configuration.async_client.aclose()
+    client.sdk_configuration.client.close()
+
+
 def _model_leaf(model: str) -> str:
     return model.rsplit("/", 1)[-1].lower()
 
@@ -190,18 +258,22 @@ def _has_hint(model: str, hints: tuple[str, ...]) -> bool:
     return any(hint in model for hint in hints)
 
 
-def _send_file() -> tuple[str, str]:
-    path = config.audio_file
+def _send_file(path: str | None = None) -> tuple[str, str]:
+    path = path or job_path(config.audio_file)
     if path not in _send_files:
         send_path, extension = path, _extension(path)
-        if os.path.getsize(path) > MAX_FILE_BYTES:
+        # Audio already in a speech profile would come out of _compress the same.
+        reencoded = os.path.getsize(path) > MAX_FILE_BYTES and audio_profile() == "full"
+        if reencoded:
             send_path = _compress(path)
             extension = "mp3"
-            if os.path.getsize(send_path) > MAX_FILE_BYTES:
-                raise RuntimeError(
-                    f"{path} is still too large for OpenRouter audio input after "
-                    f"re-encoding at {COMPRESS_BITRATE}bit/s"
-                )
+        if os.path.getsize(send_path) > MAX_FILE_BYTES:
+            how = (
+                f"after re-encoding at {COMPRESS_BITRATE}bit/s"
+                if reencoded
+                else f"in its {audio_profile()} audio profile"
+            )
+            raise RuntimeError(f"{path} is still too large for OpenRouter audio input {how}")
         _send_files[path] = (send_path, extension)
     return _send_files[path]
 
@@ -273,41 +345,39 @@ def _timestamp(seconds: float) -> str:
 
 
 def _bucket(model: str) -> dict:
-    return usage.setdefault(
-        model,
-        {
-            "requests": 0,
-            "input_tokens": 0,
-            "audio_input_tokens": 0,
-            "output_tokens": 0,
-            "tts_characters": 0,
-            "transcribe_seconds": 0,
-        },
-    )
+    return usage_bucket(usage, model)
 
 
 def _record_usage(model: str, response_usage) -> None:
     if not response_usage:
         return
     bucket = _bucket(model)
-    bucket["requests"] += 1
-    bucket["input_tokens"] += getattr(response_usage, "prompt_tokens", 0) or getattr(
-        response_usage, "input_tokens", 0
-    ) or 0
-    bucket["output_tokens"] += (
-        getattr(response_usage, "completion_tokens", 0)
+    record(
+        bucket,
+        requests=1,
+        input_tokens=getattr(response_usage, "prompt_tokens", 0)
+        or getattr(response_usage, "input_tokens", 0)
+        or 0,
+        output_tokens=getattr(response_usage, "completion_tokens", 0)
         or getattr(response_usage, "output_tokens", 0)
-        or 0
+        or 0,
     )
     details = getattr(response_usage, "prompt_tokens_details", None)
     if details and getattr(details, "audio_tokens", None):
-        bucket["audio_input_tokens"] += details.audio_tokens
+        record(bucket, audio_input_tokens=details.audio_tokens)
+    if details and getattr(details, "cached_tokens", None):
+        record(bucket, cached_input_tokens=details.cached_tokens)
+    if details and getattr(details, "cache_write_tokens", None):
+        record(bucket, cache_write_tokens=details.cache_write_tokens)
 
 
 def _record_transcription_usage(model: str, response_usage: Any) -> None:
     bucket = _bucket(model)
-    bucket["requests"] += 1
+    record(bucket, requests=1)
     if response_usage:
-        bucket["input_tokens"] += _field(response_usage, "input_tokens", 0) or 0
-        bucket["output_tokens"] += _field(response_usage, "output_tokens", 0) or 0
-        bucket["transcribe_seconds"] += _field(response_usage, "seconds", 0) or 0
+        record(
+            bucket,
+            input_tokens=_field(response_usage, "input_tokens", 0) or 0,
+            output_tokens=_field(response_usage, "output_tokens", 0) or 0,
+            transcribe_seconds=_field(response_usage, "seconds", 0) or 0,
+        )
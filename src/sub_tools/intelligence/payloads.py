@@ -0,0 +1,182 @@
+"""
+Audio inlined into request bodies without holding it in memory.
+
+OpenAI and OpenRouter take audio as base64 inside the JSON of a request. Each
+file used to be read whole, encoded into a string a third larger, and kept for
+the life of the process, so a worker going through many recordings held about
+2.3 times the size of every one of them.
+
+Instead a request is built with a short placeholder where the audio goes, and
+the SDK serializes it as usual. The HTTP clients of those providers send
+through ``InliningTransport``, which finds the placeholder in the body and sends
+the body as a stream: the JSON around it as it is, and the audio base64-encoded
+a chunk at a time straight from a memory-mapped file. The length of the encoded
+audio is known from the file's size, so the body still goes with a
+Content-Length. Nothing of the audio outlives the request, and a retry encodes
+it again from the file.
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections.abc import AsyncIterator, Iterator
+from typing import BinaryIO, Optional, Union
+
+import httpx
+
+from . import clients
+
+# Bytes of audio encoded at a time: a multiple of 3, so the pieces of base64
+# join without padding in between. Each piece is 1 MiB once encoded.
+CHUNK_BYTES = 3 * 256 * 1024
+
+PLACEHOLDER_PREFIX = b"sub-tools-audio:"
+_PLACEHOLDER = re.compile(re.escape(PLACEHOLDER_PREFIX) + rb"([0-9a-f]{32})")
+
+_lock = threading.Lock()
+
+# Files that placeholders stand for, by the token in the placeholder.
+_files: dict[str, str] = {}
+
+Piece = Union[bytes, str]
+
+
+def placeholder(path: str) -> str:
+    """
+    A stand-in for the base64 of a file, filled in as the request is sent.
+    """
+    path = os.path.abspath(path)
+    token = hashlib.sha256(path.encode("utf-8")).hexdigest()[:32]
+    with _lock:
+        _files[token] = path
+    return (PLACEHOLDER_PREFIX + token.encode("ascii")).decode("ascii")
+
+
+def encoded_length(size: int) -> int:
+    """
+    The length of the base64 of ``size`` bytes.
+    """
+    return 4 * ((size + 2) // 3)
+
+
+def encode(path: str) -> Iterator[bytes]:
+    """
+    The base64 of a file, a chunk at a time, read from a memory map.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), CHUNK_BYTES):
+                with memoryview(mapped)[start : start + CHUNK_BYTES] as chunk:
+                    piece = base64.b64encode(chunk)
+                yield piece
+
+
+def split(body: bytes) -> list[Piece] | None:
+    """
+    A body cut into its bytes and the paths of the files its placeholders
+    stand for, or None when it has no placeholder.
+    """
+    if PLACEHOLDER_PREFIX not in body:
+        return None
+    pieces: list[Piece] = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(body):
+        with _lock:
+            path = _files.get(match[1].decode("ascii"))
+        if path is None:
+            continue
+        pieces.append(body[position : match.start()])
+        pieces.append(path)
+        position = match.end()
+    if not pieces:
+        return None
+    pieces.append(body[position:])
+    return pieces
+
+
+def write(body: bytes, out: BinaryIO) -> None:
+    """
+    Write a body to ``out`` with its placeholders filled in.
+    """
+    for piece in split(body) or [body]:
+        if isinstance(piece, bytes):
+            out.write(piece)
+        else:
+            for chunk in encode(piece):
+                out.write(chunk)
+
+
+class InlinedBody:
+    """
+    A request body whose audio is encoded as it is sent.
+    """
+
+    def __init__(self, pieces: list[Piece]):
+        self.pieces = pieces
+        self.length = sum(
+            len(piece) if isinstance(piece, bytes) else encoded_length(os.path.getsize(piece))
+            for piece in pieces
+        )
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for piece in self.pieces:
+            if isinstance(piece, bytes):
+                yield piece
+            else:
+                for chunk in encode(piece):
+                    yield chunk
+
+
+class InliningTransport(httpx.AsyncBaseTransport):
+    """
+    An HTTP transport that fills in audio placeholders as requests are sent.
+
+    Requests go on through ``transport``, or a new HTTP transport built with
+    ``kwargs``.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        self._transport = transport or httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(inline(request))
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def inline(request: httpx.Request) -> httpx.Request:
+    """
+    The request with its body streamed and its placeholders filled in, or the
+    request itself when it has none.
+    """
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        # Streamed bodies, such as file uploads, are never built with placeholders.
+        return request
+    pieces = split(body)
+    if pieces is None:
+        return request
+    content = InlinedBody(pieces)
+    headers = request.headers.copy()
+    headers["Content-Length"] = str(content.length)
+    return httpx.Request(
+        request.method,
+        request.url,
+        headers=headers,
+        content=content,
+        extensions=request.extensions,
+    )
+
+
+def transport() -> InliningTransport:
+    """
+    A transport for one client, with the configured pool size.
+    """
+    return InliningTransport(limits=clients.pool_limits())
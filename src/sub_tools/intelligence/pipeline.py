@@ -7,27 +7,54 @@ explicitly in config, with model-name inference retained for compatibility.
 """
 
 import asyncio
+import dataclasses
+import json
+import os
+import tempfile
+import time
 from types import ModuleType
 from typing import Callable, Optional
 
-from rich.progress import Progress
-
-from sub_tools.system.console import info, warning
-from sub_tools.system.file import should_skip
+from sub_tools.system.console import info, progress_bar, warning
+from sub_tools.system.file import content_hash, job_path, should_skip
 from sub_tools.system.language import get_language_name
+from sub_tools.system.manifest import file_inputs, record_output
 
-from ..config import config
-from ..media.converter import audio_duration
+from ..config import Config, config, current_config
+from ..media.converter import AUDIO_PROFILES, audio_duration, audio_profile
+from ..media import trim, vad
+from ..media.splitter import SILENCE_SECONDS, Window, cut, detect_silences, plan_windows
 from ..subtitles.repair import repair_subtitles
-from ..subtitles.validator import SubtitleValidationError, find_problems
+from ..subtitles.splice import (
+    cue_text,
+    cue_windows,
+    excerpt,
+    failed_spans,
+    merge_translation,
+    render,
+    stitch,
+    untranslated_runs,
+)
+from ..subtitles.stream import StreamAborted, StreamCheck
+from ..subtitles.validator import SubtitleValidationError, find_problems, parse_strict
+from . import accounting, batches, cache, clients, failover
+from .accounting import capture
+from .batches import BatchPending
+from .hedging import hedge_delay, observe, race
+from .limits import request_slot
 
 
 def get_provider() -> ModuleType:
     """
     Return the configured provider module.
     """
-    provider_name = config.resolved_provider
+    return provider_module(config.resolved_provider)
+
 
+def provider_module(provider_name: str) -> ModuleType:
+    """
+    Return the module of the provider with this name.
+    """
     if provider_name == "openai":
         from . import openai
 
@@ -52,10 +79,11 @@ def transcribe() -> None:
     """
     Transcribe the audio into subtitles using the configured model.
     """
-    if should_skip(f"{config.source_language}.srt"):
+    language_code = config.source_language
+    if should_skip(f"{language_code}.srt", _subtitle_inputs(language_code)):
         return
 
-    asyncio.run(_transcribe())
+    clients.run(_transcribe())
 
 
 async def _transcribe() -> None:
@@ -93,12 +121,165 @@ async def _transcribe() -> None:
 
     Reply with the SRT text now.
     """
+    text = f"Transcribe this {language} audio into an SRT subtitle file."
+
+    windows = _transcription_windows()
+    if len(windows) > 1 or config.trim_silence:
+        await _transcribe_windows(
+            windows=windows,
+            language_code=language_code,
+            system_instruction=system_instruction,
+            text=text,
+        )
+        return
 
     provider.prepare_audio()
     await _generate_subtitles(
         output_file=f"{language_code}.srt",
         system_instruction=system_instruction,
-        text=f"Transcribe this {language} audio into an SRT subtitle file.",
+        text=text,
+        language=language_code,
+        rules=_window_rules(windows[0]),
+    )
+
+
+def _transcription_windows() -> list[Window]:
+    """
+    Plan the windows to transcribe; a single window means the whole file at once.
+
+    With a speech index, the windows are cut in its pauses, and the stretches
+    without speech at either edge of each window are known.
+    """
+    duration = audio_duration(job_path(config.audio_file))
+    index = vad.speech_index() if config.trim_silence else vad.load()
+    if not config.chunk_seconds or not duration or duration <= config.chunk_seconds:
+        windows = [Window(0.0, duration or 0.0)]
+    else:
+        if index is not None:
+            silences = index.silences(SILENCE_SECONDS)
+        else:
+            silences = detect_silences(job_path(config.audio_file))
+        windows = plan_windows(duration, silences, config.chunk_seconds)
+    if index is None:
+        return windows
+    return [_unspoken_edges(window, index) for window in windows]
+
+
+def _unspoken_edges(window: Window, index: vad.SpeechIndex) -> Window:
+    """
+    The window with its lead and trail grown to the silence the index found there.
+    """
+    first = index.first_speech(window.start, window.end)
+    last = index.last_speech(window.start, window.end)
+    return dataclasses.replace(
+        window,
+        lead=max(window.lead, (window.end if first is None else first) - window.start),
+        trail=max(window.trail, window.end - (window.start if last is None else last)),
+    )
+
+
+async def _transcribe_windows(
+    windows: list[Window],
+    language_code: str,
+    system_instruction: str,
+    text: str,
+) -> None:
+    """
+    Transcribe each window side by side, then stitch the windows into one file.
+
+    Every window goes through the repair/validate loop on its own, so a bad
+    answer costs one window rather than the whole recording. The stitched file
+    is then checked against the full recording like any other answer.
+
+    With ``config.trim_silence``, the long pauses in each window are left out
+    of the audio sent, and its accepted answer is moved back onto the window's
+    own timing before stitching.
+    """
+    provider = get_provider()
+    semaphore = asyncio.Semaphore(max(1, config.chunk_concurrency))
+    if len(windows) > 1:
+        info(f"Splitting {config.audio_file} into {len(windows)} windows")
+
+    profile = AUDIO_PROFILES[audio_profile()]
+    tables = _trim_tables(windows)
+
+    with tempfile.TemporaryDirectory() as tmpdir, progress_bar() as progress:
+        progress_task = progress.add_task("Transcription", total=len(windows))
+
+        async def transcribe_window(index: int, window: Window) -> tuple[float, str]:
+            table = tables[index - 1]
+            async with semaphore:
+                path = os.path.join(tmpdir, f"part{index:03d}.{profile.extensions[0]}")
+                source = job_path(config.audio_file)
+                if table is None:
+                    await asyncio.to_thread(
+                        cut, source, window.start, window.end, path, profile.codec
+                    )
+                else:
+                    await asyncio.to_thread(trim.condense, source, table, path, profile.codec)
+                await asyncio.to_thread(provider.prepare_audio, path)
+                content, _, _ = await _request_subtitles(
+                    output_file=f"{language_code}.part{index:03d}.srt",
+                    system_instruction=system_instruction,
+                    text=text,
+                    duration=window.duration if table is None else table.duration,
+                    audio_file=path,
+                    # Trimming only shortens the silence at the window's edges.
+                    rules=_window_rules(window),
+                    language=language_code,
+                )
+                if table is not None:
+                    content = trim.restore(content, table)
+            progress.update(progress_task, advance=1)
+            return window.start, content
+
+        parts = await _gather(
+            *(transcribe_window(index, window) for index, window in enumerate(windows, start=1))
+        )
+
+    output_file = f"{language_code}.srt"
+    duration = audio_duration(job_path(config.audio_file))
+    repaired, notes = repair_subtitles(stitch(parts), duration=duration)
+    whole = Window(0.0, duration or 0.0, lead=windows[0].lead, trail=windows[-1].trail)
+    errors, warnings = find_problems(repaired, duration=duration, config=_window_rules(whole))
+    if errors:
+        raise SubtitleValidationError(
+            f"Could not produce valid subtitles for {output_file} "
+            f"from {len(windows)} windows: {'; '.join(errors)}"
+        )
+    _write_subtitles(output_file, repaired, notes, warnings)
+
+
+def _trim_tables(windows: list[Window]) -> list[Optional[trim.OffsetTable]]:
+    """
+    What to keep of each window with ``config.trim_silence``, or None where
+    the window is sent as it is.
+    """
+    if not config.trim_silence:
+        return [None] * len(windows)
+    index = vad.speech_index()
+    tables = []
+    for window in windows:
+        table = trim.plan(index, window.start, window.end, config.trim_silence)
+        tables.append(table if trim.worth_it(table) else None)
+    removed = sum(table.removed for table in tables if table is not None)
+    if removed:
+        info(f"Leaving {removed / 60:.1f} minutes of silence out of the audio sent")
+    return tables
+
+
+def _window_rules(window: Window) -> Config:
+    """
+    Validation settings for one window.
+
+    A window cut in the middle of a pause starts and ends in silence that its
+    subtitles cannot cover, so the allowed gaps grow by exactly that much; so
+    does a recording the speech index found silent at its start or end.
+    """
+    return dataclasses.replace(
+        current_config(),
+        begin_gap_threshold=config.begin_gap_threshold + int(window.lead * 1000),
+        end_gap_threshold=config.end_gap_threshold + int(window.trail * 1000),
     )
 
 
@@ -106,20 +287,21 @@ def translate() -> None:
     """
     Translate the source subtitles into each target language using the configured model.
     """
-    asyncio.run(_translate())
+    clients.run(_translate())
 
 
 async def _translate() -> None:
     source_language_code = config.source_language
     source_file = f"{source_language_code}.srt"
 
-    with open(source_file, "r", encoding="utf-8") as f:
+    with open(job_path(source_file), "r", encoding="utf-8") as f:
         srt_content = f.read()
 
     target_language_codes = [
         language
         for language in config.languages
-        if language != source_language_code and not should_skip(f"{language}.srt")
+        if language != source_language_code
+        and not should_skip(f"{language}.srt", _subtitle_inputs(language))
     ]
 
     if not target_language_codes:
@@ -129,7 +311,7 @@ async def _translate() -> None:
 
     tasks = []
 
-    with Progress() as progress:
+    with progress_bar() as progress:
         progress_task = progress.add_task("Translation", total=len(target_language_codes))
 
         # Prepare the audio once, before the concurrent tasks race to do it.
@@ -138,18 +320,179 @@ async def _translate() -> None:
         if provider.accepts_audio():
             provider.prepare_audio()
 
-        for language_code in target_language_codes:
-            task = asyncio.create_task(
-                _translate_language(
+        # Translation windows of every language share one limit, so more target
+        # languages do not mean more windows in flight.
+        semaphore = asyncio.Semaphore(max(1, config.chunk_concurrency))
+
+        for group in _language_groups(target_language_codes, srt_content):
+            if len(group) > 1:
+                translation = _translate_together(
+                    srt_content=srt_content,
+                    source_language_code=source_language_code,
+                    target_language_codes=group,
+                    completion=lambda: progress.update(progress_task, advance=1),
+                    semaphore=semaphore,
+                )
+            else:
+                translation = _translate_language(
                     srt_content=srt_content,
                     source_language_code=source_language_code,
-                    target_language_code=language_code,
+                    target_language_code=group[0],
                     completion=lambda: progress.update(progress_task, advance=1),
+                    semaphore=semaphore,
                 )
+            tasks.append(asyncio.create_task(translation))
+
+        await _gather(*tasks)
+
+
+def _language_groups(target_language_codes: list[str], srt_content: str) -> list[list[str]]:
+    """
+    Group the target languages that are asked for in one request.
+
+    A source long enough to be translated in windows is translated one
+    language at a time; its windows already keep each answer short.
+    """
+    size = max(1, config.languages_per_request)
+    source, _ = parse_strict(srt_content)
+    if size == 1 or len(cue_windows(len(source), config.translation_window)) > 1:
+        return [[code] for code in target_language_codes]
+    return [
+        target_language_codes[start : start + size]
+        for start in range(0, len(target_language_codes), size)
+    ]
+
+
+async def _translate_together(
+    srt_content: str,
+    source_language_code: str,
+    target_language_codes: list[str],
+    completion: Callable[[], None],
+    semaphore: asyncio.Semaphore,
+) -> None:
+    """
+    Ask for several target languages in one request, then accept them one by one.
+
+    The source subtitles and the audio are sent once instead of once per
+    language. Each language in the reply goes through the usual repair and
+    validation; any that fail, or are missing, are translated on their own.
+    """
+    source_language = get_language_name(source_language_code)
+    targets = {code: get_language_name(code) for code in target_language_codes}
+    listed = ", ".join(f"{name} ({code})" for code, name in targets.items())
+    keys = ", ".join(f'"{code}"' for code in targets)
+
+    with_audio = get_provider().accepts_audio()
+    received = (
+        f"an {source_language} SRT subtitle file and the corresponding audio file"
+        if with_audio
+        else f"an {source_language} SRT subtitle file"
+    )
+    context_step = (
+        "2. Listen to the audio to understand context and tone"
+        if with_audio
+        else "2. Use the surrounding subtitles to understand context and tone"
+    )
+
+    system_instruction = f"""
+    You are a professional translator specializing in subtitle translation.
+    You will receive {received}.
+
+    Your task is to:
+    1. Translate the {source_language} subtitles into each of these languages: {listed}
+    {context_step}
+    3. Keep the exact same timing (timestamps) as the input SRT
+    4. Ensure every translation is natural and culturally appropriate for its language
+
+    CRITICAL REQUIREMENTS:
+    1. Output ONLY a JSON object with the keys {keys}. The value for each key is the
+       complete translated SRT text in that language, as a string. No code blocks, no explanations.
+    2. Keep ALL timestamps exactly as they are in the input SRT
+    3. Every translation must have exactly the same number of cues as the input, in the same order
+    4. Preserve the SRT format perfectly (number, timestamp, text, blank line)
+    5. Only translate the text content, not the structure or timing
+    6. All subtitle text in a translation must be in that translation's language
+
+    Translation Guidelines:
+    - Use natural, conversational language
+    - Preserve the tone and meaning of the original {source_language}
+    - Keep proper names in their original form unless they have standard equivalents
+    - Maintain [sound effects] in brackets
+    - Use appropriate punctuation for each language
+
+    Reply with the JSON object now.
+    """
+
+    label = f"{'+'.join(targets)}.srt"
+    reply = await _ask(
+        0,
+        label,
+        system_instruction=system_instruction,
+        text=f"{source_language} SRT to translate:\n\n{srt_content}",
+        with_audio=with_audio,
+    )
+    if config.debug:
+        with open(job_path(f"{label}.raw"), "w", encoding="utf-8") as f:
+            f.write(reply or "")
+    answers = _split_languages(reply or "", list(targets))
+
+    duration = audio_duration(job_path(config.audio_file))
+    retry = []
+    for code in targets:
+        output_file = f"{code}.srt"
+        content = answers.get(code)
+        if not content or "-->" not in content:
+            _report_batched(output_file, ["missing from the combined answer"])
+            retry.append(code)
+            continue
+        repaired, notes = repair_subtitles(content, duration=duration, reference=srt_content)
+        errors, warnings = find_problems(repaired, duration=duration, reference=srt_content)
+        if errors:
+            _report_batched(output_file, errors)
+            retry.append(code)
+            continue
+        _write_subtitles(output_file, repaired, notes, warnings)
+        completion()
+
+    await _gather(
+        *(
+            _translate_language(
+                srt_content=srt_content,
+                source_language_code=source_language_code,
+                target_language_code=code,
+                completion=completion,
+                semaphore=semaphore,
             )
-            tasks.append(task)
+            for code in retry
+        )
+    )
 
-        await asyncio.gather(*tasks)
+
+def _split_languages(reply: str, codes: list[str]) -> dict[str, str]:
+    """
+    Read the per-language subtitles out of a combined answer.
+
+    Models wrap JSON in code fences or a sentence often enough that the object
+    is looked for between the first and last brace. Anything unreadable gives
+    no languages, which sends every one of them to be translated on its own.
+    """
+    start, end = reply.find("{"), reply.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        data = json.loads(reply[start : end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {code: data[code] for code in codes if isinstance(data.get(code), str)}
+
+
+def _report_batched(output_file: str, errors: list[str]) -> None:
+    """
+    Explain why a language from a combined answer is translated again on its own.
+    """
+    warning(f"{output_file}: combined answer rejected ({'; '.join(errors)}); translating alone")
 
 
 async def _translate_language(
@@ -157,6 +500,7 @@ async def _translate_language(
     source_language_code: str,
     target_language_code: str,
     completion: Callable[[], None],
+    semaphore: asyncio.Semaphore,
 ) -> None:
     source_language = get_language_name(source_language_code)
     target_language = get_language_name(target_language_code)
@@ -175,50 +519,159 @@ async def _translate_language(
         else "2. Use the surrounding subtitles to understand context and tone"
     )
 
+    # Everything before the target language is the same for every language,
+    # so providers can cache it once: the instructions, the audio and the
+    # source subtitles. Only the short task at the end differs.
     system_instruction = f"""
     You are a professional translator specializing in subtitle translation.
-    You will receive {received}.
+    You will receive {received}, followed by the language to translate them into.
 
     Your task is to:
-    1. Translate the {source_language} subtitles to {target_language}
+    1. Translate the {source_language} subtitles into the requested language
     {context_step}
     3. Keep the exact same timing (timestamps) as the input SRT
-    4. Ensure translations are natural and culturally appropriate for {target_language}
+    4. Ensure translations are natural and culturally appropriate for the requested language
 
     CRITICAL REQUIREMENTS:
-    1. Output ONLY the translated subtitles as plain SRT text in {target_language}. No code blocks, no JSON, no explanations.
+    1. Output ONLY the translated subtitles as plain SRT text in the requested language. No code blocks, no JSON, no explanations.
     2. Keep ALL timestamps exactly as they are in the input SRT
     3. Return exactly the same number of cues as the input, in the same order
     4. Preserve the SRT format perfectly (number, timestamp, text, blank line)
     5. Only translate the text content, not the structure or timing
-    6. All subtitle text must be in {target_language}
+    6. All subtitle text must be in the requested language
 
     Translation Guidelines:
-    - Use natural, conversational {target_language}
+    - Use natural, conversational language
     - Preserve the tone and meaning of the original {source_language}
-    - Keep proper names in their original form unless they have standard {target_language} equivalents
+    - Keep proper names in their original form unless they have standard equivalents in the requested language
     - Maintain [sound effects] in brackets
-    - Use appropriate punctuation for {target_language}
-
-    Reply with the translated SRT text in {target_language} now.
+    - Use appropriate punctuation for the requested language
     """
 
-    await _generate_subtitles(
-        output_file=f"{target_language_code}.srt",
-        system_instruction=system_instruction,
-        text=f"{source_language} SRT to translate:\n\n{srt_content}",
-        reference=srt_content,
-        with_audio=with_audio,
+    task = (
+        f"Translate the {source_language} subtitles above into {target_language}. "
+        f"Reply with the translated SRT text in {target_language} now."
     )
+
+    def request_text(srt: str, before: str = "", after: str = "") -> str:
+        parts = []
+        if before:
+            parts.append(
+                f"Preceding {source_language} subtitles, for context only. "
+                f"Do not translate them or include them in your reply:\n\n{before}"
+            )
+        parts.append(f"{source_language} SRT to translate:\n\n{srt}")
+        if after:
+            parts.append(
+                f"Following {source_language} subtitles, for context only. "
+                f"Do not translate them or include them in your reply:\n\n{after}"
+            )
+        return "\n\n".join(parts)
+
+    output_file = f"{target_language_code}.srt"
+    source, _ = parse_strict(srt_content)
+    windows = cue_windows(len(source), config.translation_window)
+    if len(windows) > 1:
+        await _translate_windows(
+            output_file=output_file,
+            srt_content=srt_content,
+            windows=windows,
+            system_instruction=system_instruction,
+            task=task,
+            with_audio=with_audio,
+            request_text=request_text,
+            semaphore=semaphore,
+        )
+    else:
+        await _generate_subtitles(
+            output_file=output_file,
+            system_instruction=system_instruction,
+            text=task,
+            context=request_text(srt_content),
+            reference=srt_content,
+            with_audio=with_audio,
+            excerpt_text=lambda srt: f"{request_text(srt)}\n\n{task}",
+            language=target_language_code,
+        )
     completion()
 
 
+async def _translate_windows(
+    output_file: str,
+    srt_content: str,
+    windows: list[range],
+    system_instruction: str,
+    task: str,
+    with_audio: bool,
+    request_text: Callable[..., str],
+    semaphore: asyncio.Semaphore,
+) -> None:
+    """
+    Translate a long file a window of cues at a time, then merge them by cue index.
+
+    Each window is sent with a few untranslated cues either side for context,
+    and goes through the repair/validate loop against its own source cues, so
+    the answer stays short and a dropped cue costs one window. The merged file
+    is then checked against the whole source like any other translation.
+
+    A window's source cues are the shared context of its request and ``task``
+    names the language, so each window can be cached for every language.
+    """
+    context = max(0, config.translation_context)
+    count = windows[-1].stop
+    stem = os.path.splitext(output_file)[0]
+
+    async def translate_window(index: int, positions: range) -> dict[int, str]:
+        part = excerpt(srt_content, positions)
+        before = cue_text(srt_content, range(max(0, positions.start - context), positions.start))
+        after = cue_text(srt_content, range(positions.stop, min(count, positions.stop + context)))
+
+        def window_text(srt: str) -> str:
+            return f"{request_text(srt, before, after)}\n\n{task}"
+
+        async with semaphore:
+            content, _, _ = await _request_subtitles(
+                output_file=f"{stem}.part{index:03d}.srt",
+                system_instruction=system_instruction,
+                text=task,
+                context=request_text(part, before, after),
+                reference=part,
+                with_audio=with_audio,
+                excerpt_text=window_text,
+                language=stem,
+            )
+        matched = untranslated_runs(content, part)
+        translated = matched[0] if matched else {}
+        return {positions[position]: line for position, line in translated.items()}
+
+    parts = await _gather(
+        *(translate_window(index, positions) for index, positions in enumerate(windows, start=1))
+    )
+    translated = {position: line for part in parts for position, line in part.items()}
+
+    duration = audio_duration(job_path(config.audio_file))
+    repaired, notes = repair_subtitles(
+        merge_translation(srt_content, translated), duration=duration, reference=srt_content
+    )
+    errors, warnings = find_problems(repaired, duration=duration, reference=srt_content)
+    if errors:
+        raise SubtitleValidationError(
+            f"Could not produce valid subtitles for {output_file} "
+            f"from {len(windows)} windows: {'; '.join(errors)}"
+        )
+    _write_subtitles(output_file, repaired, notes, warnings)
+
+
 async def _generate_subtitles(
     output_file: str,
     system_instruction: str,
     text: Optional[str] = None,
     reference: Optional[str] = None,
     with_audio: bool = True,
+    excerpt_text: Optional[Callable[[str], str]] = None,
+    language: Optional[str] = None,
+    context: Optional[str] = None,
+    rules: Optional[Config] = None,
 ) -> None:
     """
     Ask the model for subtitles, repairing and checking the answer before accepting it.
@@ -227,20 +680,107 @@ async def _generate_subtitles(
     that fails to parse is repaired first and only re-requested if the repair
     cannot save it.
     """
-    provider = get_provider()
-    duration = audio_duration(config.audio_file)
+    duration = audio_duration(job_path(config.audio_file))
+    repaired, notes, warnings = await _request_subtitles(
+        output_file=output_file,
+        system_instruction=system_instruction,
+        text=text,
+        reference=reference,
+        with_audio=with_audio,
+        duration=duration,
+        excerpt_text=excerpt_text,
+        language=language,
+        context=context,
+        rules=rules,
+    )
+    _write_subtitles(output_file, repaired, notes, warnings)
+
+
+async def _request_subtitles(
+    output_file: str,
+    system_instruction: str,
+    text: Optional[str] = None,
+    reference: Optional[str] = None,
+    with_audio: bool = True,
+    duration: Optional[float] = None,
+    audio_file: Optional[str] = None,
+    rules: Optional[Config] = None,
+    excerpt_text: Optional[Callable[[str], str]] = None,
+    language: Optional[str] = None,
+    context: Optional[str] = None,
+) -> tuple[str, list[str], list[str]]:
+    """
+    Return an accepted answer as (subtitles, repair notes, warnings).
+
+    ``output_file`` only names the answer in messages and debug dumps; nothing
+    is written to it. ``audio_file`` and ``rules`` replace the configured
+    recording and validation settings, e.g. for one window of a long file.
+
+    A rejected answer is mended rather than discarded when its failures are
+    local: only the stretch of audio around them, or for a translation only
+    the cues that were lost, is asked for again and spliced into the rest.
+    ``excerpt_text`` builds the request text for such a run of source cues;
+    without it a rejected translation is requested again in full.
+
+    Answers are streamed and watched as they arrive when ``config.stream`` is
+    set; one that times jump back in, or that is not in ``language``, is
+    abandoned early and handled like any other rejected answer.
+
+    ``context`` is text sent before ``text`` that other requests share, such
+    as the source subtitles every target language is translated from; the
+    provider may cache it. Mending asks with ``excerpt_text`` alone.
+    """
     attempts = max(1, config.retry)
     last_errors: list[str] = []
+    rejected: Optional[str] = None
+
+    def watch() -> Callable[[str], None]:
+        return StreamCheck(duration=duration, language=language).feed
 
     for attempt in range(attempts):
-        content = await provider.generate(
-            system_instruction=system_instruction,
-            text=text,
-            with_audio=with_audio,
-        )
+        content = None
+        if rejected is not None:
+            content = await _mend(
+                rejected,
+                attempt=attempt,
+                output_file=output_file,
+                system_instruction=system_instruction,
+                text=text,
+                reference=reference,
+                with_audio=with_audio,
+                duration=duration,
+                audio_file=audio_file,
+                rules=rules or config,
+                excerpt_text=excerpt_text,
+            )
+            rejected = None
+        if content is None:
+            try:
+                content = await _ask_hedged(
+                    attempt,
+                    output_file,
+                    accept=lambda reply: _acceptable(reply, duration, reference, rules),
+                    system_instruction=system_instruction,
+                    text=text,
+                    with_audio=with_audio,
+                    audio_file=audio_file,
+                    watch=watch if config.stream else None,
+                    context=context,
+                )
+            except StreamAborted as aborted:
+                last_errors = [f"abandoned while streaming: {aborted.reason}"]
+                _report_attempt(output_file, attempt, attempts, last_errors)
+                if "-->" in aborted.kept:
+                    # The cues before the failure are worth keeping; the mend
+                    # on the next attempt asks only for the rest.
+                    rejected, _ = repair_subtitles(
+                        aborted.kept, duration=duration, reference=reference
+                    )
+                continue
 
         if config.debug:
-            with open(f"{output_file}.attempt{attempt + 1}.raw", "w", encoding="utf-8") as f:
+            raw_file = job_path(f"{output_file}.attempt{attempt + 1}.raw")
+            with open(raw_file, "w", encoding="utf-8") as f:
                 f.write(content or "")
 
         if not content or "-->" not in content:
@@ -249,21 +789,17 @@ async def _generate_subtitles(
             continue
 
         repaired, notes = repair_subtitles(content, duration=duration, reference=reference)
-        errors, warnings = find_problems(repaired, duration=duration, reference=reference)
+        errors, warnings = find_problems(
+            repaired, duration=duration, reference=reference, config=rules
+        )
 
         if errors:
             last_errors = errors
             _report_attempt(output_file, attempt, attempts, errors)
+            rejected = repaired
             continue
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(repaired)
-
-        for note in notes:
-            info(f"{output_file}: repaired — {note}")
-        for message in warnings:
-            warning(f"{output_file}: {message}")
-        return
+        return repaired, notes, warnings
 
     raise SubtitleValidationError(
         f"Could not produce valid subtitles for {output_file} "
@@ -271,6 +807,440 @@ async def _generate_subtitles(
     )
 
 
+def _acceptable(
+    reply: Optional[str],
+    duration: Optional[float],
+    reference: Optional[str],
+    rules: Optional[Config],
+) -> bool:
+    """
+    Whether an answer would pass validation once repaired.
+    """
+    if not reply or "-->" not in reply:
+        return False
+    repaired, _ = repair_subtitles(reply, duration=duration, reference=reference)
+    errors, _ = find_problems(repaired, duration=duration, reference=reference, config=rules)
+    return not errors
+
+
+async def _ask_hedged(
+    attempt: int,
+    output_file: str,
+    accept: Callable[[Optional[str]], bool],
+    system_instruction: str,
+    text: Optional[str] = None,
+    with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    watch: Optional[Callable[[], Callable[[str], None]]] = None,
+    context: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Ask the model once, sending a second request if the answer is unusually slow.
+
+    Requests that go into a batch are never hedged; nobody is waiting on them.
+    """
+    delay = None if batches.enabled() else hedge_delay(config.model, with_audio)
+    if delay is None:
+        return await _ask(
+            attempt,
+            output_file,
+            system_instruction=system_instruction,
+            text=text,
+            with_audio=with_audio,
+            audio_file=audio_file,
+            watch=watch,
+            context=context,
+        )
+
+    backup_model = config.hedge_model or config.model
+    return await race(
+        primary=lambda: _ask(
+            attempt,
+            output_file,
+            system_instruction=system_instruction,
+            text=text,
+            with_audio=with_audio,
+            audio_file=audio_file,
+            watch=watch,
+            context=context,
+        ),
+        backup=lambda: _ask(
+            attempt,
+            output_file,
+            system_instruction=system_instruction,
+            text=text,
+            with_audio=with_audio,
+            audio_file=audio_file,
+            model=backup_model,
+            watch=watch,
+            context=context,
+        ),
+        delay=delay,
+        accept=accept,
+        hedged=lambda: info(
+            f"{output_file}: no answer after {delay:.0f}s; also asking {backup_model}"
+        ),
+    )
+
+
+async def _ask(
+    attempt: int,
+    output_file: str,
+    system_instruction: str,
+    text: Optional[str] = None,
+    with_audio: bool = True,
+    audio_file: Optional[str] = None,
+    model: Optional[str] = None,
+    watch: Optional[Callable[[], Callable[[str], None]]] = None,
+    context: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Ask the model once, or replay its answer from the cache if it was asked before.
+
+    ``model`` replaces the configured model of the same provider; ``watch`` is
+    passed on for the provider to stream the answer through.
+    """
+    model = model or config.model
+    if not config.cache:
+        return await _generate(
+            system_instruction, text, with_audio, audio_file, model, watch, context
+        )
+
+    audio_hash = None
+    if with_audio:
+        source = audio_file or job_path(config.audio_file)
+        audio_hash = await asyncio.to_thread(content_hash, source)
+    key = cache.request_key(
+        provider=config.resolved_provider,
+        model=model,
+        system_instruction=system_instruction,
+        text=text,
+        audio_hash=audio_hash,
+        attempt=attempt,
+        context=context,
+    )
+
+    reply = cache.load(key)
+    if reply is not None:
+        info(f"{output_file}: reusing the cached answer to attempt {attempt + 1}")
+        return reply
+
+    if batches.enabled():
+        await _defer(key, system_instruction, text, with_audio, audio_file, model, context)
+
+    with capture() as usage:
+        reply = await _generate(
+            system_instruction, text, with_audio, audio_file, model, watch, context
+        )
+    if reply:
+        cache.store(key, model, reply, usage)
+    return reply
+
+
+async def _defer(
+    key: str,
+    system_instruction: str,
+    text: Optional[str],
+    with_audio: bool,
+    audio_file: Optional[str],
+    model: str,
+    context: Optional[str],
+) -> None:
+    """
+    Queue a request for the next batch, if the provider can take it in one.
+
+    Raises BatchPending when it was queued; returns when the request has to be
+    made directly.
+    """
+    provider = get_provider()
+    batch_request = getattr(provider, "batch_request", None)
+    if batch_request is None:
+        return
+    request = await asyncio.to_thread(
+        batch_request,
+        system_instruction=system_instruction,
+        text=text,
+        with_audio=with_audio,
+        audio_file=audio_file,
+        model=model,
+        context=context,
+    )
+    if request is not None:
+        batch_model, body = request
+        batches.defer(key, config.resolved_provider, batch_model, body)
+
+
+async def _gather(*awaitables):
+    """
+    ``asyncio.gather`` that lets every awaitable finish before raising.
+
+    One failed window or language no longer leaves the others running
+    unattended until the loop closes; each gets to the end of its own
+    requests, which for a batch means queueing them. An error other than
+    BatchPending is raised in preference to it.
+    """
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise next((e for e in errors if not isinstance(e, BatchPending)), errors[0])
+    return results
+
+
+async def _generate(
+    system_instruction: str,
+    text: Optional[str],
+    with_audio: bool,
+    audio_file: Optional[str],
+    model: str,
+    watch: Optional[Callable[[], Callable[[str], None]]] = None,
+    context: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Send one request to the provider, remembering how long it took to answer.
+
+    The time spent waiting for a slot under the process-wide request limit is
+    not counted, since it says nothing about how fast the model answers.
+
+    With ``config.fallbacks``, a request the provider fails for want of
+    capacity goes on to the next route that will take it; see ``failover``.
+    Routes that cannot hear audio are left out of requests with audio.
+    """
+    routes = failover.chain(model)
+    if len(routes) == 1:
+        async with request_slot():
+            started = time.monotonic()
+            with accounting.call(config.resolved_provider, model):
+                reply = await get_provider().generate(
+                    system_instruction=system_instruction,
+                    text=text,
+                    with_audio=with_audio,
+                    audio_file=audio_file,
+                    model=model,
+                    watch=watch,
+                    context=context,
+                )
+            observe(model, with_audio, time.monotonic() - started)
+        return reply
+
+    if with_audio:
+        routes = routes[:1] + [
+            route
+            for route in routes[1:]
+            if provider_module(route.provider).accepts_audio(route.model)
+        ]
+    failure: Optional[Exception] = None
+    for route, last in failover.attempts(routes):
+        # Only the last route tried waits out its retries; the others hand over at once.
+        retry = None if last else 1
+        try:
+            with failover.use_route(route, retry):
+                async with request_slot():
+                    with (
+                        failover.attempt(route, with_audio),
+                        accounting.call(route.provider, route.model),
+                    ):
+                        started = time.monotonic()
+                        reply = await get_provider().generate(
+                            system_instruction=system_instruction,
+                            text=text,
+                            with_audio=with_audio,
+                            audio_file=audio_file,
+                            model=route.model,
+                            watch=watch,
+                            context=context,
+                        )
+                    observe(route.model, with_audio, time.monotonic() - started)
+            return reply
+        except Exception as error:
+            if last or not failover.is_outage(error):
+                raise
+            warning(f"{route} failed ({type(error).__name__}); failing over")
+            failure = error
+    # Every route the request got to failed over, and the rest would not take it.
+    raise failure  # type: ignore[misc]
+
+
+async def _mend(
+    rejected: str,
+    attempt: int,
+    output_file: str,
+    system_instruction: str,
+    text: Optional[str],
+    reference: Optional[str],
+    with_audio: bool,
+    duration: Optional[float],
+    audio_file: Optional[str],
+    rules: Config,
+    excerpt_text: Optional[Callable[[str], str]],
+) -> Optional[str]:
+    """
+    Ask again for only the failed parts of a rejected answer and splice them in.
+
+    Returns None when the answer is not worth mending, or a replacement part
+    came back unusable; the caller then asks for the whole answer again.
+    """
+    if reference is not None:
+        if excerpt_text is None:
+            return None
+        return await _mend_translation(
+            rejected, attempt, output_file, system_instruction, reference, with_audio, excerpt_text
+        )
+    if not with_audio:
+        return None
+    return await _mend_transcription(
+        rejected, attempt, output_file, system_instruction, text, duration, audio_file, rules
+    )
+
+
+async def _mend_transcription(
+    rejected: str,
+    attempt: int,
+    output_file: str,
+    system_instruction: str,
+    text: Optional[str],
+    duration: Optional[float],
+    audio_file: Optional[str],
+    rules: Config,
+) -> Optional[str]:
+    """
+    Transcribe the failed stretches of audio again and put them in place.
+    """
+    found = failed_spans(
+        rejected,
+        duration,
+        begin_gap=rules.begin_gap_threshold / 1000,
+        end_gap=rules.end_gap_threshold / 1000,
+    )
+    if not found:
+        return None
+    kept, spans = found
+
+    provider = get_provider()
+    source = audio_file or job_path(config.audio_file)
+    seconds = sum(end - start for start, end in spans)
+    info(f"{output_file}: asking again for {len(spans)} span(s), {seconds:.0f}s of audio")
+
+    profile = AUDIO_PROFILES[audio_profile()]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        async def hear(index: int, start: float, end: float) -> Optional[list]:
+            path = os.path.join(tmpdir, f"span{index:03d}.{profile.extensions[0]}")
+            await asyncio.to_thread(cut, source, start, end, path, profile.codec)
+            await asyncio.to_thread(provider.prepare_audio, path)
+            reply = await _ask(
+                attempt,
+                output_file,
+                system_instruction=system_instruction,
+                text=text,
+                with_audio=True,
+                audio_file=path,
+            )
+            if not reply or "-->" not in reply:
+                return None
+            repaired, _ = repair_subtitles(reply, duration=end - start)
+            cues, errors = parse_strict(repaired)
+            if errors:
+                return None
+            return [(cue.start + start, min(cue.end + start, end), cue.text) for cue in cues]
+
+        patches = await _gather(
+            *(hear(index, start, end) for index, (start, end) in enumerate(spans, start=1))
+        )
+
+    if any(patch is None for patch in patches):
+        return None
+    cues = [(cue.start, cue.end, cue.text) for cue in kept]
+    cues += [cue for patch in patches for cue in patch]
+    return render(sorted(cues))
+
+
+async def _mend_translation(
+    rejected: str,
+    attempt: int,
+    output_file: str,
+    system_instruction: str,
+    reference: str,
+    with_audio: bool,
+    excerpt_text: Callable[[str], str],
+) -> Optional[str]:
+    """
+    Translate only the source cues the rejected answer lost, and slot them in.
+    """
+    found = untranslated_runs(rejected, reference)
+    if not found:
+        return None
+    translated, runs = found
+    if not runs:
+        # Nothing was lost, only extra cues added; dropping them is enough.
+        return merge_translation(reference, translated)
+
+    missing = sum(len(run) for run in runs)
+    info(f"{output_file}: asking again for {missing} lost subtitle(s) in {len(runs)} run(s)")
+
+    async def translate_run(run: list[int]) -> Optional[dict[int, str]]:
+        part = excerpt(reference, run)
+        reply = await _ask(
+            attempt,
+            output_file,
+            system_instruction=system_instruction,
+            text=excerpt_text(part),
+            with_audio=with_audio,
+        )
+        if not reply or "-->" not in reply:
+            return None
+        repaired, _ = repair_subtitles(reply, reference=part)
+        matched = untranslated_runs(repaired, part)
+        if not matched:
+            return None
+        return {run[position]: line for position, line in matched[0].items()}
+
+    results = await _gather(*(translate_run(run) for run in runs))
+    if any(result is None for result in results):
+        return None
+    for result in results:
+        translated.update(result)
+    return merge_translation(reference, translated)
+
+
+def _write_subtitles(
+    output_file: str,
+    content: str,
+    notes: list[str],
+    warnings: list[str],
+) -> None:
+    """
+    Save accepted subtitles and say what was repaired or is unusual about them.
+
+    The file is written under a temporary name and renamed into place, so a
+    killed run never leaves half a file behind, then recorded as finished.
+    """
+    temporary = job_path(f"{output_file}.tmp")
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temporary, job_path(output_file))
+    record_output(output_file, _subtitle_inputs(os.path.splitext(output_file)[0]))
+
+    for note in notes:
+        info(f"{output_file}: repaired — {note}")
+    for message in warnings:
+        warning(f"{output_file}: {message}")
+
+
+def _subtitle_inputs(language_code: str) -> dict:
+    """
+    What the subtitles in one language are made from, for the job manifest.
+    """
+    settings = {"provider": config.resolved_provider, "model": config.model}
+    if language_code == config.source_language:
+        return {
+            **file_inputs(audio=config.audio_file),
+            "audio_model": config.audio_model,
+            **settings,
+        }
+    return {**file_inputs(source=f"{config.source_language}.srt"), **settings}
+
+
 def _report_attempt(output_file: str, attempt: int, attempts: int, errors: list[str]) -> None:
     """
     Explain why an answer was rejected before asking again.
@@ -0,0 +1,210 @@
+"""
+Requests and tokens per minute, kept under the provider's quota before sending.
+
+The adaptive limit in ``limits`` only learns about a quota by running into it:
+every 429 costs a request, a backoff and a halved window. Providers publish
+their quotas as requests and tokens per minute for each model, so when those
+are known (``config.requests_per_minute`` and ``config.tokens_per_minute``)
+each model gets a token bucket for each, filled at the quota's rate and
+holding a minute's worth. A request reserves what it is expected to use and
+waits until the buckets have it, so requests go out just under the quota
+instead of bouncing off it.
+
+How many tokens a request uses is only known once the answer arrives, so it
+is estimated beforehand from the length of the prompt and of the audio. When
+the answer reports what was actually used, the difference is taken from or
+given back to the bucket, and the model's estimates are scaled to match what
+its answers have reported so far.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from ..config import config
+from .accounting import capture
+
+# Rough tokens per character of prompt text, before any correction.
+CHARS_PER_TOKEN = 4
+
+# Tokens one second of audio costs; Gemini bills 32, and others are close enough
+# for a first guess that corrections then fix.
+AUDIO_TOKENS_PER_SECOND = 32
+
+# Share of the published quota used, leaving room for clocks that disagree.
+HEADROOM = 0.95
+
+# Weight of the latest answer in a model's correction factor.
+CORRECTION_WEIGHT = 0.2
+
+# Bounds on the correction factor, so one odd answer cannot stall a run.
+MIN_CORRECTION = 0.25
+MAX_CORRECTION = 8.0
+
+
+class TokenBucket:
+    """
+    A bucket holding up to ``per_minute`` units, refilled at that rate.
+
+    Takers are never refused. The bucket may go into debt, and each taker is
+    told how long to wait for the units it took, so requests are spaced out in
+    the order they asked.
+    """
+
+    def __init__(self, per_minute: float):
+        self._lock = threading.Lock()
+        self.per_minute = 0.0
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self.resize(per_minute)
+
+    def resize(self, per_minute: float) -> None:
+        """
+        Change the rate, keeping the current level within the new size.
+        """
+        with self._lock:
+            self._refill()
+            capacity = per_minute * HEADROOM
+            if self.per_minute == 0:
+                self.level = capacity
+            self.per_minute = per_minute
+            self.level = min(self.level, capacity)
+
+    def take(self, amount: float) -> float:
+        """
+        Take ``amount`` units and return the seconds to wait before using them.
+        """
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            if self.level >= 0:
+                return 0.0
+            return -self.level / self._rate
+
+    def give_back(self, amount: float) -> None:
+        """
+        Return units taken but not used; a negative amount takes more.
+        """
+        with self._lock:
+            self._refill()
+            self.level = min(self.per_minute * HEADROOM, self.level + amount)
+
+    @property
+    def _rate(self) -> float:
+        return self.per_minute * HEADROOM / 60
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        capacity = self.per_minute * HEADROOM
+        self.level = min(capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+_lock = threading.Lock()
+_requests: dict[tuple[str, str], TokenBucket] = {}
+_tokens: dict[tuple[str, str], TokenBucket] = {}
+_corrections: dict[tuple[str, str], float] = {}
+
+
+def estimate_tokens(prompt: str = "", audio_seconds: float = 0.0) -> float:
+    """
+    The tokens a request with this prompt and audio is expected to use, before
+    any correction.
+    """
+    return len(prompt) / CHARS_PER_TOKEN + audio_seconds * AUDIO_TOKENS_PER_SECOND
+
+
+def correction(provider: str, model: str) -> float:
+    """
+    How much a model's answers have used compared with the estimates.
+    """
+    with _lock:
+        return _corrections.get((provider, model), 1.0)
+
+
+def correct(provider: str, model: str, estimated: float, used: float) -> None:
+    """
+    Move a model's correction factor towards what one answer reported.
+    """
+    if estimated <= 0 or used <= 0:
+        return
+    with _lock:
+        previous = _corrections.get((provider, model), 1.0)
+        # ``estimated`` already had the previous factor applied.
+        observed = previous * used / estimated
+        factor = previous + CORRECTION_WEIGHT * (observed - previous)
+        _corrections[(provider, model)] = min(MAX_CORRECTION, max(MIN_CORRECTION, factor))
+
+
+@asynccontextmanager
+async def reserve(
+    model: str, prompt: str = "", audio_file: Optional[str] = None
+) -> AsyncIterator[None]:
+    """
+    Wait until the selected provider's ``model`` has quota for the request, and
+    settle the tokens it reserved with what the answer reports using.
+    """
+    requests_per_minute = config.requests_per_minute
+    tokens_per_minute = config.tokens_per_minute
+    if requests_per_minute <= 0 and tokens_per_minute <= 0:
+        yield
+        return
+
+    provider = config.resolved_provider
+    wait = 0.0
+    if requests_per_minute > 0:
+        wait = max(wait, _bucket(_requests, provider, model, requests_per_minute).take(1))
+
+    tokens = None
+    estimated = 0.0
+    if tokens_per_minute > 0:
+        seconds = await asyncio.to_thread(audio_seconds, audio_file) if audio_file else 0
+        estimated = estimate_tokens(prompt, seconds) * correction(provider, model)
+        tokens = _bucket(_tokens, provider, model, tokens_per_minute)
+        wait = max(wait, tokens.take(estimated))
+
+    usage: dict = {}
+    try:
+        if wait > 0:
+            await asyncio.sleep(wait)
+        with capture() as usage:
+            yield
+    finally:
+        # Settled whether or not the request succeeded: a failed one gives back
+        # what it reserved unless the provider reported it used something.
+        if tokens is not None:
+            used = _tokens_used(usage)
+            tokens.give_back(estimated - used)
+            correct(provider, model, estimated, used)
+
+
+def _tokens_used(usage: dict) -> float:
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+
+def _bucket(
+    buckets: dict[tuple[str, str], TokenBucket], provider: str, model: str, per_minute: int
+) -> TokenBucket:
+    with _lock:
+        key = (provider, model)
+        if key not in buckets:
+            buckets[key] = TokenBucket(per_minute)
+        bucket = buckets[key]
+    if bucket.per_minute != per_minute:
+        bucket.resize(per_minute)
+    return bucket
+
+
+def audio_seconds(path: str) -> float:
+    """
+    The length of an audio file, or nothing for one that is not there.
+    """
+    from ..media.converter import audio_duration
+
+    if not os.path.exists(path):
+        return 0.0
+    return audio_duration(path) or 0.0
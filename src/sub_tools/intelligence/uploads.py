@@ -0,0 +1,92 @@
+"""
+A record of files uploaded to a provider, kept between runs.
+
+Gemini keeps an uploaded file for 48 hours, but a new process used to upload
+the same recording again: a retry after a crash, an evaluation re-run, or a
+translate run after a separate transcribe run each paid for uploading hundreds
+of megabytes. So every upload is recorded here under the hash of the file's
+contents and of the API key it belongs to, with the name the provider gave it
+and when it expires. The provider module asks the provider whether a recorded
+file is still there before reusing it, and uploads again only when it is not.
+
+The record lives next to the response cache, in ``uploads.json`` under the
+user's cache home. It holds no API keys, only hashes of them.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .cache import cache_home
+
+_lock = threading.Lock()
+
+
+def registry_path() -> str:
+    """
+    Where the record of uploads is kept.
+    """
+    return os.path.join(cache_home(), "uploads.json")
+
+
+def upload_key(provider: str, api_key: str | None, content_hash: str) -> str:
+    """
+    The record's key for one file's contents uploaded with one API key.
+    """
+    account = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return f"{provider}:{account}:{content_hash}"
+
+
+def lookup(key: str, margin: float = 0) -> dict | None:
+    """
+    The recorded upload for a key, unless it expires within ``margin`` seconds.
+    """
+    with _lock:
+        entry = _read().get(key)
+    if not entry or entry.get("expires", 0) <= time.time() + margin:
+        return None
+    return entry
+
+
+def remember(key: str, entry: dict) -> None:
+    """
+    Record an upload, dropping those that have expired.
+    """
+    with _lock:
+        uploads = _read()
+        now = time.time()
+        uploads = {k: e for k, e in uploads.items() if e.get("expires", 0) > now}
+        uploads[key] = entry
+        _write(uploads)
+
+
+def forget(key: str) -> None:
+    """
+    Drop an upload the provider no longer has.
+    """
+    with _lock:
+        uploads = _read()
+        if uploads.pop(key, None) is not None:
+            _write(uploads)
+
+
+def _read() -> dict:
+    try:
+        with open(registry_path(), "r", encoding="utf-8") as f:
+            uploads = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return uploads if isinstance(uploads, dict) else {}
+
+
+def _write(uploads: dict) -> None:
+    path = registry_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Renamed into place, so another process never reads half a record.
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(uploads, f, indent=2)
+    os.replace(temporary, path)
@@ -1,22 +1,47 @@
-from sub_tools.intelligence.pipeline import transcribe, translate
+from collections.abc import Callable
+
+from sub_tools.intelligence import batches, clients
+from sub_tools.intelligence.batches import BatchPending
+from sub_tools.intelligence.pipeline import provider_module, transcribe, translate
 from sub_tools.media.dubber import dub
+from sub_tools.media.vad import detect_speech
 
 from .arguments.parser import build_parser, parse_args
 from .config import config
-from .media.converter import download_from_url, media_to_signature, video_to_audio
-from .system.console import error, header
+from .media.converter import (
+    download_audio_from_url,
+    download_from_url,
+    media_to_signature,
+    video_to_audio,
+)
+from .system import report
+from .system.console import error, header, info
 from .system.file import ensure_output_directory
+from .system.manifest import stage
 
 
 def main():
     parser = build_parser()
     parsed = parse_args(parser)
 
+    try:
+        run_job(parsed.func)
+    except Exception as e:
+        error(f"Error: {str(e)}")
+        exit(1)
+
+
+def run_job(print_help: Callable[[], None] = lambda: None) -> None:
+    """
+    Run the configured tasks for one job, writing into its output directory.
+
+    ``print_help`` is called before giving up on a missing URL or API key.
+    """
     step = 1
 
     def require_api_key() -> None:
         if not (config.api_key and config.api_key.strip()):
-            parsed.func()
+            print_help()
             names = {
                 "google": "Google/Gemini",
                 "gemini": "Google/Gemini",
@@ -27,45 +52,76 @@ def main():
             name = names[config.resolved_provider]
             raise Exception(f"No {name} API key provided")
 
-    try:
-        ensure_output_directory(config.output_directory)
+    ensure_output_directory(config.output_directory)
 
-        if "video" in config.tasks:
-            header(f"{step}. Download Video")
-            if not config.url:
-                parsed.func()
+    if batches.enabled():
+        if not config.cache:
+            raise Exception("Batches need the response cache; drop --no-cache")
+        if config.batch_collect:
+            header("Collect Batches")
+            clients.run(batches.collect(provider_module))
+
+    # Written however the job ends, so a failed run still shows where it went.
+    with report.run():
+        try:
+            if "video" in config.tasks and not config.url:
+                print_help()
                 raise Exception("No URL provided")
-            download_from_url()
-            step += 1
-
-        if "audio" in config.tasks:
-            header(f"{step}. Video to Audio")
-            video_to_audio()
-            step += 1
-
-        if "signature" in config.tasks:
-            header(f"{step}. Audio to Signature")
-            media_to_signature()
-            step += 1
-
-        if "transcribe" in config.tasks:
-            require_api_key()
-            header(f"{step}. Transcribe")
-            transcribe()
-            step += 1
-
-        if "translate" in config.tasks:
-            require_api_key()
-            header(f"{step}. Translate")
-            translate()
-            step += 1
-
-        if "dub" in config.tasks:
-            require_api_key()
-            header(f"{step}. Dub")
-            dub()
-            step += 1
 
-    except Exception as e:
-        error(f"Error: {str(e)}")
-        exit(1)
+            if "video" in config.tasks and "audio" in config.tasks:
+                # The audio is all the later tasks need, so it comes straight from the URL.
+                header(f"{step}. Download Audio")
+                with stage("ingest"):
+                    download_audio_from_url()
+                step += 1
+            elif "video" in config.tasks:
+                header(f"{step}. Download Video")
+                with stage("video"):
+                    download_from_url()
+                step += 1
+            elif "audio" in config.tasks:
+                header(f"{step}. Video to Audio")
+                with stage("audio"):
+                    video_to_audio()
+                step += 1
+
+            if "signature" in config.tasks:
+                header(f"{step}. Audio to Signature")
+                with stage("signature"):
+                    media_to_signature()
+                step += 1
+
+            if "vad" in config.tasks:
+                header(f"{step}. Find Speech")
+                with stage("vad"):
+                    detect_speech()
+                step += 1
+
+            if "transcribe" in config.tasks:
+                require_api_key()
+                header(f"{step}. Transcribe")
+                with stage("transcribe"):
+                    transcribe()
+                step += 1
+
+            if "translate" in config.tasks:
+                require_api_key()
+                header(f"{step}. Translate")
+                with stage("translate"):
+                    translate()
+                step += 1
+
+            if "dub" in config.tasks:
+                require_api_key()
+                header(f"{step}. Dub")
+                with stage("dub"):
+                    dub()
+                step += 1
+        except BatchPending:
+            # Later stages need this stage's outputs, so the job waits here.
+            info("Stopping until the batch answers are collected")
+        finally:
+            if batches.enabled():
+                sent = clients.run(batches.submit(provider_module))
+                if sent:
+                    info("Run again with --batch-collect once the batches have finished")
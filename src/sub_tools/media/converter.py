@@ -1,22 +1,58 @@
+import os
 import re
 import subprocess
+from dataclasses import dataclass
 
-from sub_tools.system.file import should_skip
+from sub_tools.system.file import job_path, should_skip
 
 from ..config import config
+from ..system import manifest
 from ..system.console import status, warning
+from ..system.manifest import file_inputs, record_output
+from . import probe
+
+
+# Measured lengths, by path, size and modification time.
+_durations: dict[tuple[str, int, int], float | None] = {}
+
+
+@dataclass(frozen=True)
+class AudioProfile:
+    """
+    How the job's audio is encoded: ffmpeg codec arguments and the file extensions they suit.
+    """
+
+    codec: tuple[str, ...]
+    extensions: tuple[str, ...]
+
+
+# Models hear speech as well at 16 kHz mono as at full quality, and every
+# request that carries the audio, uploaded or inlined as base64, is 5-10 times
+# smaller for it. Opus is smaller still, but OpenAI's chat models only take MP3
+# or WAV, so they get an MP3 copy of it.
+AUDIO_PROFILES = {
+    "full": AudioProfile(("-c:a", "libmp3lame"), ("mp3",)),
+    "speech": AudioProfile(
+        ("-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "32k"), ("mp3",)
+    ),
+    "opus": AudioProfile(
+        ("-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-application", "voip"),
+        ("ogg", "opus"),
+    ),
+}
 
 
 def download_from_url() -> None:
     """
     Downloads media from a URL (HLS stream or direct file) and saves it as video or audio.
     """
-    if should_skip(config.video_file):
+    inputs = {"url": config.url}
+    if should_skip(config.video_file, inputs):
         return
 
     cmd = ["ffmpeg", "-y", "-i", config.url]
 
-    cmd.append(config.video_file)
+    cmd.append(job_path(config.video_file))
 
     try:
         with status("Downloading media..."):
@@ -25,24 +61,23 @@ def download_from_url() -> None:
         raise RuntimeError(
             f"Failed to download media from {config.url}: {e.stderr.decode() if e.stderr else str(e)}"
         )
+    record_output(config.video_file, inputs)
 
 
 def video_to_audio() -> None:
     """
     Converts a video file to an audio file using ffmpeg.
     """
-    if should_skip(config.audio_file):
+    inputs = {**file_inputs(video=config.video_file), "profile": config.audio_profile}
+    if should_skip(config.audio_file, inputs):
         return
 
     cmd = [
         "ffmpeg",
         "-y",
         "-i",
-        config.video_file,
-        "-vn",
-        "-c:a",
-        "libmp3lame",
-        config.audio_file,
+        job_path(config.video_file),
+        *_audio_output(job_path(config.audio_file)),
     ]
 
     try:
@@ -52,15 +87,63 @@ def video_to_audio() -> None:
         raise RuntimeError(
             f"Failed to convert video to audio: {e.stderr.decode() if e.stderr else str(e)}"
         )
+    record_output(config.audio_file, inputs, profile=config.audio_profile)
+
+
+def download_audio_from_url() -> None:
+    """
+    Downloads media from a URL straight to the audio file, in one ffmpeg run.
+
+    Downloading the video and then converting it reads the whole stream twice
+    and keeps a video nothing else uses. Here ffmpeg reads the URL once and
+    writes the audio as it goes, in the configured profile, and with
+    ``config.keep_video`` the video as well, from the same read.
+    """
+    inputs = {"url": config.url, "profile": config.audio_profile}
+    outputs = [config.audio_file] + ([config.video_file] if config.keep_video else [])
+    if all(should_skip(file, inputs) for file in outputs):
+        return
+
+    cmd = ["ffmpeg", "-y", "-i", config.url, *_audio_output(job_path(config.audio_file))]
+    if config.keep_video:
+        cmd.append(job_path(config.video_file))
+
+    try:
+        with status("Downloading audio..."):
+            subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(
+            f"Failed to download media from {config.url}: {e.stderr.decode() if e.stderr else str(e)}"
+        )
+    record_output(config.audio_file, inputs, profile=config.audio_profile)
+    if config.keep_video:
+        record_output(config.video_file, inputs)
 
 
 def audio_duration(path: str) -> float | None:
     """
     Return the length of the audio in seconds, or None if it cannot be measured.
 
-    Used to check that subtitles span the recording. A missing ffprobe is not
-    fatal; the checks that need a duration are skipped instead.
+    Used to check that subtitles span the recording, among much else, so the
+    answer is remembered for each version of the file, and read from its
+    headers where they say it. A missing ffprobe is not fatal; the checks that
+    need a duration are skipped instead.
     """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return _measure(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _durations:
+        _durations[key] = _measure(path)
+    return _durations[key]
+
+
+def _measure(path: str) -> float | None:
+    seconds = probe.duration(path)
+    if seconds is not None:
+        return seconds
+
     cmd = [
         "ffprobe",
         "-v",
@@ -102,7 +185,8 @@ def media_to_signature() -> None:
     """
     Generates a signature for the media file using the shazam CLI.
     """
-    if should_skip(config.signature_file):
+    inputs = file_inputs(audio=config.audio_file)
+    if should_skip(config.signature_file, inputs):
         return
 
     try:
@@ -115,9 +199,9 @@ def media_to_signature() -> None:
         "shazam",
         "signature",
         "--input",
-        config.audio_file,
+        job_path(config.audio_file),
         "--output",
-        config.signature_file,
+        job_path(config.signature_file),
     ]
 
     try:
@@ -127,3 +211,29 @@ def media_to_signature() -> None:
         raise RuntimeError(
             f"Failed to generate signature: {e.stderr.decode() if e.stderr else str(e)}"
         )
+    record_output(config.signature_file, inputs)
+
+
+def audio_profile() -> str:
+    """
+    The profile the job's audio file was encoded with.
+
+    Recorded in the job manifest when the file was made, so that requests
+    reuse it as it is; audio this tool did not encode counts as full quality.
+    """
+    entry = manifest.output(config.audio_file)
+    return entry.get("profile", "full") if entry else "full"
+
+
+def _audio_output(path: str) -> list[str]:
+    """
+    The ffmpeg output arguments for the job's audio file, in the configured profile.
+    """
+    profile = AUDIO_PROFILES[config.audio_profile]
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in profile.extensions:
+        raise RuntimeError(
+            f"The {config.audio_profile} audio profile needs a .{profile.extensions[0]} "
+            f"audio file, not {os.path.basename(path)}; choose one with --audio-file"
+        )
+    return ["-vn", *profile.codec, path]
@@ -15,33 +15,39 @@ The timing rules are deliberately simple:
   - speech that still overruns pushes later cues back rather than talking
     over them; the drift is bounded by MAX_TEMPO
   - text that is only a [sound effect] is not spoken
+
+Spoken cues are kept in the job's checkpoint directory until the language is
+finished, so a run killed part way through only speaks the cues it had not
+reached.
 """
 
 import asyncio
+import hashlib
 import io
+import json
 import os
 import re
+import shutil
 import subprocess
 import tempfile
 import wave
 
-from rich.progress import Progress
-
 from ..config import config
+from ..intelligence import accounting, clients
+from ..intelligence.limits import pause, request_slot
 from ..intelligence.pipeline import get_provider
-from ..intelligence.retry import backoff
 from .converter import audio_duration
 from ..subtitles.validator import Cue, SubtitleValidationError, parse_strict
-from ..system.console import info, warning
-from ..system.file import should_skip
+from ..system.console import info, progress_bar, warning
+from ..system.file import job_path, should_skip
 from ..system.language import get_language_name
+from ..system.manifest import checkpoint_directory, file_inputs, record_output
 
 SAMPLE_RATE = 24_000
 SAMPLE_WIDTH = 2  # 16-bit PCM
 CHANNELS = 1
 
 MAX_TEMPO = 2.0  # Fastest acceptable speed-up for overlong speech
-CONCURRENT_REQUESTS = 4
 
 BRACKETED = re.compile(r"\[[^\]]*\]|\([^)]*\)")
 
@@ -53,26 +59,26 @@ def dub() -> None:
     languages = [
         language
         for language in config.languages
-        if not should_skip(f"{language}.mp3")
+        if not should_skip(f"{language}.mp3", _dub_inputs(language))
     ]
 
     if not languages:
         return
 
     for language in languages:
-        if not os.path.exists(f"{language}.srt"):
+        if not os.path.exists(job_path(f"{language}.srt")):
             raise FileNotFoundError(
                 f"{language}.srt not found; run the transcribe/translate tasks first"
             )
 
-    asyncio.run(_dub(languages))
+    clients.run(_dub(languages))
 
 
 async def _dub(languages: list[str]) -> None:
-    total_duration = audio_duration(config.audio_file)
+    total_duration = audio_duration(job_path(config.audio_file))
 
     for language in languages:
-        with open(f"{language}.srt", "r", encoding="utf-8") as f:
+        with open(job_path(f"{language}.srt"), "r", encoding="utf-8") as f:
             content = f.read()
 
         cues, errors = parse_strict(content)
@@ -96,14 +102,21 @@ async def _dub_language(
 ) -> None:
     provider = get_provider()
     language_name = get_language_name(language)
-    semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+    checkpoints = checkpoint_directory("dub", language)
 
-    with Progress() as progress:
+    with progress_bar() as progress:
         progress_task = progress.add_task(f"Dub {language}", total=len(spoken))
 
         async def speak_cue(text: str) -> bytes:
-            async with semaphore:
+            path = os.path.join(checkpoints, f"{_speech_key(text, language_name)}.wav")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    audio = f.read()
+            else:
                 audio = await _speak_with_retry(provider, text, language_name)
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(audio)
+                os.replace(f"{path}.tmp", path)
             progress.update(progress_task, advance=1)
             return audio
 
@@ -133,21 +146,52 @@ async def _dub_language(
         wav_path = os.path.join(tmpdir, "track.wav")
         with open(wav_path, "wb") as f:
             f.write(track.getvalue())
-        _encode_mp3(wav_path, f"{language}.mp3")
+        _encode_mp3(wav_path, job_path(f"{language}.mp3"))
 
+    record_output(f"{language}.mp3", _dub_inputs(language))
+    shutil.rmtree(checkpoints, ignore_errors=True)
     info(f"Wrote {language}.mp3")
 
 
+def _dub_inputs(language: str) -> dict:
+    """
+    What one language's dub is made from, for the job manifest.
+    """
+    return {
+        **file_inputs(subtitles=f"{language}.srt", audio=config.audio_file),
+        "provider": config.resolved_provider,
+        "tts_model": config.tts_model,
+        "tts_voice": config.tts_voice,
+    }
+
+
+def _speech_key(text: str, language_name: str) -> str:
+    """
+    Name a spoken cue by everything that shapes how it sounds.
+    """
+    fields = [
+        config.resolved_provider,
+        config.tts_model,
+        config.tts_voice,
+        language_name,
+        text,
+    ]
+    encoded = json.dumps(fields, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
 async def _speak_with_retry(provider, text: str, language_name: str) -> bytes:
     last_error: Exception | None = None
-    for attempt in range(max(1, config.retry)):
-        try:
-            return await provider.speak(text, language_name)
-        except Exception as e:
-            last_error = e
-            if attempt < config.retry - 1:
-                await asyncio.sleep(backoff(attempt))
-    raise RuntimeError(f"Text-to-speech failed for {text[:40]!r}: {last_error}")
+    with accounting.call(config.resolved_provider):
+        for attempt in range(max(1, config.retry)):
+            try:
+                async with request_slot():
+                    return await provider.speak(text, language_name)
+            except Exception as e:
+                last_error = e
+                if attempt < config.retry - 1:
+                    await pause(e, attempt)
+        raise RuntimeError(f"Text-to-speech failed for {text[:40]!r}: {last_error}")
 
 
 def speakable_text(text: str) -> str:
@@ -0,0 +1,248 @@
+"""
+Read the length of a media file from its headers, without running ffprobe.
+
+A job asks how long its recording is many times over: for every language it
+checks, every window it cuts and every request the quota sizes. Starting an
+ffprobe for each costs more than the work it supports, while the containers
+this tool makes and reads say their length in a few bytes near the start or
+the end of the file. This reads those bytes for MP3 (from the Xing or VBRI
+header, or by walking the frames), WAV, Ogg (Opus and Vorbis) and MP4. For
+anything else, or a file it cannot make sense of, it returns None and the
+caller asks ffprobe instead.
+"""
+
+import os
+import struct
+from typing import BinaryIO, Optional
+
+# Kilobits per second by MPEG version and layer, indexed by the header's bitrate bits.
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Samples per second by MPEG version (2.5 counted as 2.5), indexed by the header's rate bits.
+MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+# How far from the end of an Ogg file its last page is looked for.
+OGG_TAIL_BYTES = 256 * 1024
+
+# Opus always counts its granule positions at this rate, whatever the input's.
+OPUS_RATE = 48000
+
+
+def duration(path: str) -> Optional[float]:
+    """
+    The length of the media file at ``path`` in seconds, or None if its
+    headers do not say.
+    """
+    try:
+        with open(path, "rb") as f:
+            start = f.read(12)
+            f.seek(0)
+            if start[:4] == b"RIFF" and start[8:12] == b"WAVE":
+                return _wav(f)
+            if start[:4] == b"OggS":
+                return _ogg(f)
+            if start[4:8] == b"ftyp":
+                return _mp4(f)
+            return _mp3(f)
+    except (OSError, struct.error):
+        return None
+
+
+def _wav(f: BinaryIO) -> Optional[float]:
+    size = os.fstat(f.fileno()).st_size
+    f.seek(12)
+    byte_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk, length = struct.unpack("<4sI", header)
+        if chunk == b"fmt ":
+            byte_rate = struct.unpack("<I", f.read(16)[8:12])[0]
+            f.seek(length - 16 + (length & 1), os.SEEK_CUR)
+        elif chunk == b"data":
+            if not byte_rate:
+                return None
+            # Streaming writers leave the size unset; the data then runs to the end.
+            available = size - f.tell()
+            return min(length, available) / byte_rate
+        else:
+            f.seek(length + (length & 1), os.SEEK_CUR)
+
+
+def _ogg(f: BinaryIO) -> Optional[float]:
+    first = f.read(512)
+    serial = first[14:18]
+    segments = first[26]
+    packet = first[27 + segments :]
+    if packet.startswith(b"OpusHead"):
+        rate = OPUS_RATE
+        skip = struct.unpack("<H", packet[10:12])[0]
+    elif packet.startswith(b"\x01vorbis"):
+        rate = struct.unpack("<I", packet[12:16])[0]
+        skip = 0
+    else:
+        return None
+
+    size = os.fstat(f.fileno()).st_size
+    f.seek(max(0, size - OGG_TAIL_BYTES))
+    tail = f.read()
+    at = tail.rfind(b"OggS")
+    while at >= 0:
+        page = tail[at : at + 27]
+        if len(page) == 27 and page[14:18] == serial:
+            granule = struct.unpack("<q", page[6:14])[0]
+            if granule >= 0:
+                return max(0, granule - skip) / rate
+        at = tail.rfind(b"OggS", 0, at)
+    return None
+
+
+def _mp4(f: BinaryIO) -> Optional[float]:
+    size = os.fstat(f.fileno()).st_size
+    moov = _find_box(f, b"moov", 0, size)
+    if moov is None:
+        return None
+    mvhd = _find_box(f, b"mvhd", *moov)
+    if mvhd is None:
+        return None
+    f.seek(mvhd[0])
+    version = f.read(4)[0]
+    if version == 1:
+        timescale, length = struct.unpack(">IQ", f.read(28)[16:])
+    else:
+        timescale, length = struct.unpack(">II", f.read(16)[8:])
+    return length / timescale if timescale else None
+
+
+def _find_box(f: BinaryIO, name: bytes, start: int, end: int) -> Optional[tuple[int, int]]:
+    """
+    Where the contents of the first ``name`` box between ``start`` and ``end`` lie.
+    """
+    at = start
+    while at + 8 <= end:
+        f.seek(at)
+        length, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if length == 1:
+            length = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif length == 0:
+            length = end - at
+        if length < header:
+            return None
+        if kind == name:
+            return at + header, at + length
+        at += length
+    return None
+
+
+def _mp3(f: BinaryIO) -> Optional[float]:
+    start = _skip_id3(f)
+    f.seek(start)
+    head = f.read(4096)
+    at = _next_frame(head, 0)
+    # Only padding may come before the first frame; anything else is another format.
+    if at is None or head[:at].strip(b"\x00"):
+        return None
+    frame = _frame(head[at : at + 4])
+    version, layer, rate, spf, _, channels = frame
+
+    # An encoder that knew the length wrote it into the first frame.
+    side = (32 if channels > 1 else 17) if version == 1 else (17 if channels > 1 else 9)
+    xing = head[at + 4 + side : at + 4 + side + 12]
+    if xing[:4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", xing[4:8])[0]
+        if flags & 1:
+            return struct.unpack(">I", xing[8:12])[0] * spf / rate
+    vbri = head[at + 36 : at + 36 + 18]
+    if vbri[:4] == b"VBRI":
+        return struct.unpack(">I", vbri[14:18])[0] * spf / rate
+
+    return _count_frames(f, start + at, spf, rate)
+
+
+def _count_frames(f: BinaryIO, start: int, spf: int, rate: int) -> Optional[float]:
+    """
+    Walk every frame from ``start``, for a file without a length in its header.
+    """
+    f.seek(start)
+    buffer = b""
+    at = frames = 0
+    while True:
+        if at + 4 > len(buffer):
+            if at > len(buffer):
+                f.seek(at - len(buffer), os.SEEK_CUR)
+                buffer, at = b"", 0
+            buffer = buffer[at:] + f.read(1024 * 1024)
+            at = 0
+            if len(buffer) < 4:
+                break
+        frame = _frame(buffer[at : at + 4])
+        if frame is None:
+            # An ID3v1 tag or trailing junk ends the audio.
+            break
+        at += frame[4]
+        frames += 1
+    return frames * spf / rate if frames else None
+
+
+def _skip_id3(f: BinaryIO) -> int:
+    """
+    The offset past any ID3v2 tags at the start of the file.
+    """
+    at = 0
+    while True:
+        f.seek(at)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            return at
+        length = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        at += 10 + length + (10 if header[5] & 0x10 else 0)
+
+
+def _next_frame(data: bytes, at: int) -> Optional[int]:
+    """
+    The offset of the first frame from ``at`` that is followed by another.
+    """
+    while at + 4 <= len(data):
+        at = data.find(b"\xff", at)
+        if at < 0:
+            return None
+        frame = _frame(data[at : at + 4])
+        if frame is not None:
+            following = data[at + frame[4] : at + frame[4] + 4]
+            if len(following) < 4 or _frame(following) is not None:
+                return at
+        at += 1
+    return None
+
+
+def _frame(header: bytes) -> Optional[tuple]:
+    """
+    (version, layer, sample rate, samples, bytes, channels) of an MPEG audio
+    frame header, or None if these four bytes are not one.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((header[1] >> 3) & 3)
+    layer = {1: 3, 2: 2, 3: 1}.get((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    channels = 1 if header[3] >> 6 == 3 else 2
+    if layer == 1:
+        return version, layer, rate, 384, (12 * bitrate // rate + padding) * 4, channels
+    spf = 1152 if layer == 2 or version == 1 else 576
+    return version, layer, rate, spf, spf // 8 * bitrate // rate + padding, channels
@@ -0,0 +1,153 @@
+"""
+Split a long recording into windows that can be transcribed independently.
+
+One request for a two-hour file is slow, and a single bad cue means paying for
+all two hours again. Shorter windows are transcribed side by side instead, so
+the wall-clock time follows the longest window rather than the whole file.
+
+Windows are cut in silence wherever the recording allows it, because a cut
+through a word costs that word in both halves. Each cut lands in the middle of
+the longest pause near the target length; only a recording with no usable
+pause is cut at the target length itself.
+"""
+
+import re
+import subprocess
+from dataclasses import dataclass
+
+# Quieter than this for at least SILENCE_SECONDS counts as a pause.
+SILENCE_NOISE = "-35dB"
+SILENCE_SECONDS = 0.5
+
+# A cut is looked for in the last half of each window, so no window is shorter
+# than half the target unless the recording itself is.
+EARLIEST_CUT = 0.5
+
+SILENCE_START = re.compile(r"silence_start:\s*(-?\d+(?:\.\d+)?)")
+SILENCE_END = re.compile(r"silence_end:\s*(-?\d+(?:\.\d+)?)")
+
+
+@dataclass
+class Window:
+    """
+    One stretch of the recording, with the silence either side of its cuts.
+
+    ``lead`` and ``trail`` are the seconds of pause the window inherited at its
+    start and end, which its subtitles are not expected to cover.
+    """
+
+    start: float
+    end: float
+    lead: float = 0.0
+    trail: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def detect_silences(path: str) -> list[tuple[float, float]]:
+    """
+    Return the pauses in the recording as (start, end) pairs, in seconds.
+    """
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        path,
+        "-af",
+        f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_SECONDS}",
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        stderr = e.stderr if getattr(e, "stderr", None) else str(e)
+        raise RuntimeError(f"Failed to find pauses in {path}: {stderr}")
+    return parse_silences(result.stderr)
+
+
+def parse_silences(output: str) -> list[tuple[float, float]]:
+    """
+    Read the pauses from ffmpeg's silencedetect log.
+
+    A pause still open when the file ends has no silence_end line; it is left
+    out, since the final window runs to the end of the file anyway.
+    """
+    silences = []
+    start = None
+    for line in output.splitlines():
+        match = SILENCE_START.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_windows(
+    duration: float,
+    silences: list[tuple[float, float]],
+    target: float,
+) -> list[Window]:
+    """
+    Divide the recording into windows of at most ``target`` seconds.
+
+    Every cut is made in the middle of the longest pause that ends a window
+    between half and all of the target length.
+    """
+    if target <= 0 or duration <= target:
+        return [Window(0.0, duration)]
+
+    windows: list[Window] = []
+    start, lead = 0.0, 0.0
+    while duration - start > target:
+        earliest = start + target * EARLIEST_CUT
+        latest = start + target
+        candidates = [
+            (end - begin, (begin + end) / 2)
+            for begin, end in silences
+            if earliest < (begin + end) / 2 <= latest
+        ]
+        if candidates:
+            length, cut = max(candidates)
+            half = length / 2
+        else:
+            cut, half = latest, 0.0
+        windows.append(Window(start, cut, lead=lead, trail=half))
+        start, lead = cut, half
+    windows.append(Window(start, duration, lead=lead))
+    return windows
+
+
+def cut(path: str, start: float, end: float, destination: str, codec: tuple[str, ...] = ()) -> None:
+    """
+    Write one window of the recording to its own audio file.
+
+    ``codec`` gives the ffmpeg arguments to encode it with, those of the
+    recording's own profile, so a window is no larger than its share of it.
+    """
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-ss",
+        f"{start:.3f}",
+        "-t",
+        f"{end - start:.3f}",
+        "-i",
+        path,
+        "-vn",
+        *(codec or ("-c:a", "libmp3lame")),
+        destination,
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        stderr = e.stderr.decode() if getattr(e, "stderr", None) else str(e)
+        raise RuntimeError(f"Failed to cut {start:.0f}s-{end:.0f}s from {path}: {stderr}")
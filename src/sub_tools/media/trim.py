@@ -0,0 +1,190 @@
+"""
+Cut long silences out of the audio sent for transcription, and put the time back.
+
+Intros, music beds and dead air are billed as audio like any speech, and the
+model spends as long listening to them. With a speech index, the audio a
+request carries can leave them out: every pause longer than the configured
+length is shortened to a brief one, so the model still hears a break, and the
+rest is sent as one condensed recording. An offset table remembers where each
+kept stretch came from, and the subtitles for the condensed recording are moved
+back onto the original timeline before they are checked as a whole.
+
+Stretches are kept in whole frames of the speech index, 30 ms each, picked by
+number from the audio decoded just as the index decoded it. The cuts are then
+exact to the sample, so timestamps do not drift however many of them there are.
+"""
+
+import bisect
+import math
+import subprocess
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..subtitles.splice import render
+from ..subtitles.validator import parse_strict
+from .vad import BLOCK_FRAMES, FRAME_SAMPLES, FRAME_SECONDS, SAMPLE_RATE, SpeechIndex
+
+# Seconds of each shortened pause left in, half either side of it.
+KEPT_PAUSE = 0.6
+
+# Trimming less than this share of a stretch is not worth a condensed copy.
+MIN_SAVING = 0.05
+
+
+@dataclass
+class OffsetTable:
+    """
+    The stretches of a recording kept in a condensed copy of it, as sorted
+    (start, end) pairs in seconds from ``origin``, where the copy starts.
+    """
+
+    origin: float
+    kept: list[tuple[float, float]]
+    length: float
+
+    def __post_init__(self):
+        self._starts, at = [], 0.0
+        for start, end in self.kept:
+            self._starts.append(at)
+            at += end - start
+
+    @property
+    def duration(self) -> float:
+        """Seconds of the condensed copy."""
+        return sum(end - start for start, end in self.kept)
+
+    @property
+    def removed(self) -> float:
+        """Seconds left out of the copy."""
+        return self.length - self.duration
+
+    def to_source(self, seconds: float, end: bool = False) -> float:
+        """
+        The time, from ``origin``, that a moment in the condensed copy came from.
+
+        A moment where two kept stretches meet belongs to the earlier one when
+        it ends a cue and to the later one when it starts one, so no cue grows
+        to cover a pause that was cut.
+        """
+        if not self.kept:
+            return 0.0
+        find = bisect.bisect_left if end else bisect.bisect_right
+        index = min(max(find(self._starts, seconds) - 1, 0), len(self.kept) - 1)
+        start, stop = self.kept[index]
+        return start + min(max(seconds - self._starts[index], 0.0), stop - start)
+
+
+def plan(index: SpeechIndex, start: float, end: float, min_pause: float) -> OffsetTable:
+    """
+    What to keep of the recording between ``start`` and ``end``: everything
+    but the pauses the index found of at least ``min_pause`` seconds, which
+    are shortened to ``KEPT_PAUSE``.
+    """
+    edge = KEPT_PAUSE / 2
+    cuts = []
+    for silence_start, silence_end in index.silences(min_pause):
+        first, last = max(silence_start, start), min(silence_end, end)
+        if last - first < min_pause:
+            continue
+        # Pauses at the edges of the stretch border speech on one side only.
+        cuts.append(
+            (first + (edge if first > start else 0.0), last - (edge if last < end else 0.0))
+        )
+
+    kept: list[tuple[int, int]] = []
+    cursor = start
+    for cut_start, cut_end in cuts + [(end, end)]:
+        if cut_start > cursor:
+            first = _frame(cursor - start, math.floor)
+            last = min(_frame(cut_start - start, math.ceil), _frame(end - start, math.floor))
+            if kept and first <= kept[-1][1]:
+                kept[-1] = (kept[-1][0], max(kept[-1][1], last))
+            elif last > first:
+                kept.append((first, last))
+        cursor = max(cursor, cut_end)
+    return OffsetTable(
+        start,
+        [(round(a * FRAME_SECONDS, 3), round(b * FRAME_SECONDS, 3)) for a, b in kept],
+        end - start,
+    )
+
+
+def worth_it(table: OffsetTable) -> bool:
+    """
+    Whether a condensed copy leaves out enough to send it instead.
+    """
+    return table.length > 0 and table.removed / table.length >= MIN_SAVING
+
+
+def condense(source: str, table: OffsetTable, destination: str, codec: tuple[str, ...]) -> None:
+    """
+    Write the kept stretches of ``source`` to ``destination``, one after the other.
+
+    One ffmpeg decodes the stretch to PCM, the kept frames are picked out of it
+    by number, and another ffmpeg encodes them, so the work is the same however
+    many pauses are cut.
+    """
+    keep = np.zeros(round(table.length / FRAME_SECONDS) + 1, dtype=bool)
+    for start, end in table.kept:
+        keep[round(start / FRAME_SECONDS) : round(end / FRAME_SECONDS)] = True
+
+    decode = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-ss", f"{table.origin:.3f}", "-t", f"{table.length:.3f}", "-i", source,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    encode = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "-",
+        *codec, destination,
+    ]
+    frame_bytes = FRAME_SAMPLES * 2
+    try:
+        with tempfile.TemporaryFile() as errors, subprocess.Popen(
+            decode, stdout=subprocess.PIPE, stderr=errors
+        ) as decoder, subprocess.Popen(
+            encode, stdin=subprocess.PIPE, stderr=errors
+        ) as encoder:
+            frame = 0
+            while True:
+                data = decoder.stdout.read(BLOCK_FRAMES * frame_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % frame_bytes
+                frames = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, FRAME_SAMPLES)
+                chosen = keep[frame : frame + len(frames)]
+                encoder.stdin.write(frames[: len(chosen)][chosen].tobytes())
+                frame += len(frames)
+            encoder.stdin.close()
+            decoder.wait()
+            encoder.wait()
+            errors.seek(0)
+            stderr = errors.read().decode(errors="replace")
+    except FileNotFoundError as e:
+        raise RuntimeError(f"Failed to trim the silence from {source}: {e}")
+    if decoder.returncode or encoder.returncode:
+        raise RuntimeError(f"Failed to trim the silence from {source}: {stderr}")
+
+
+def restore(content: str, table: OffsetTable) -> str:
+    """
+    Move valid SRT for the condensed copy onto the original timeline, from ``origin``.
+    """
+    cues, errors = parse_strict(content)
+    if errors:
+        raise ValueError(f"cannot restore invalid subtitles: {'; '.join(errors)}")
+    return render(
+        [
+            (table.to_source(cue.start), table.to_source(cue.end, end=True), cue.text)
+            for cue in cues
+        ]
+    )
+
+
+def _frame(seconds: float, rounding) -> int:
+    """
+    The frame at ``seconds``, rounded as asked unless already on the grid.
+    """
+    return rounding(round(seconds / FRAME_SECONDS, 6))
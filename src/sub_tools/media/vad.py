@@ -0,0 +1,281 @@
+"""
+Find where the recording has speech in it, and where it has none.
+
+Several stages guess at silence: the coverage checks allow fixed gaps at either
+end, and long recordings are cut where ffmpeg hears a pause. A speech index
+answers them instead. It is built once per recording from the decoded audio,
+streamed out of ffmpeg as 16 kHz mono PCM and judged 30 ms at a time by its
+energy and how often it crosses zero: loud frames are speech, quieter ones
+count too if they hiss like a consonant, and anything that crosses zero as
+often as noise does is not. Short gaps inside speech are closed and short
+bursts outside it dropped, so the index is a few hundred intervals for an hour
+of talk, and decoding, not judging, sets the pace.
+
+The index of the job's recording is kept in ``.sub-tools/speech.json`` with
+the hash of the audio it describes, so later runs and stages reuse it for as
+long as the recording is unchanged.
+"""
+
+import bisect
+import json
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from ..config import config
+from ..system.console import info, status
+from ..system.file import content_hash, job_path, move_into_place
+from ..system.manifest import JOB_DIRECTORY
+
+INDEX = os.path.join(JOB_DIRECTORY, "speech.json")
+
+# Bumped whenever the detector changes, so indexes it made earlier are made again.
+VERSION = 1
+
+SAMPLE_RATE = 16_000
+FRAME_SAMPLES = 480  # 30 ms
+FRAME_SECONDS = FRAME_SAMPLES / SAMPLE_RATE
+
+# Decoded audio is judged this many frames at a time, about a minute of it.
+BLOCK_FRAMES = 2000
+
+# A frame is loud enough to be speech this far above the quietest tenth of the
+# recording, but never when quieter than the floor, and at most halfway up to
+# its loudest tenth so that a recording of nothing but talk still has speech.
+MARGIN_DB = 12.0
+FLOOR_DB = -50.0
+
+# Consonants such as "s" and "f" are quieter than vowels but cross zero more
+# often; noise and hiss cross it more often still.
+CONSONANT_DB = 6.0
+CONSONANT_CROSSINGS = 0.1
+NOISE_CROSSINGS = 0.4
+
+# Pauses shorter than this are part of the speech around them, speech shorter
+# than this is a click or a cough, and every stretch of speech is widened by
+# the padding so that the first and last sounds of a word stay inside it.
+MIN_PAUSE = 0.3
+MIN_SPEECH = 0.2
+PADDING = 0.1
+
+# Indexes measured in this process, by the hash of the audio.
+_indexes: dict[str, "SpeechIndex"] = {}
+
+
+@dataclass
+class SpeechIndex:
+    """
+    The stretches of speech in a recording, as sorted (start, end) pairs in
+    seconds, and how long the recording is.
+    """
+
+    duration: float
+    speech: list[tuple[float, float]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._starts = [start for start, _ in self.speech]
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(end - start for start, end in self.speech)
+
+    def speech_between(self, start: float, end: float) -> float:
+        """
+        Seconds of speech between ``start`` and ``end``.
+        """
+        total = 0.0
+        for first, last in self._overlapping(start, end):
+            total += min(last, end) - max(first, start)
+        return total
+
+    def first_speech(self, start: float = 0.0, end: Optional[float] = None) -> Optional[float]:
+        """
+        When speech first starts between ``start`` and ``end``, if it does.
+        """
+        end = self.duration if end is None else end
+        spans = self._overlapping(start, end)
+        return max(spans[0][0], start) if spans else None
+
+    def last_speech(self, start: float = 0.0, end: Optional[float] = None) -> Optional[float]:
+        """
+        When speech last ends between ``start`` and ``end``, if it does.
+        """
+        end = self.duration if end is None else end
+        spans = self._overlapping(start, end)
+        return min(spans[-1][1], end) if spans else None
+
+    def silences(self, min_seconds: float = 0.0) -> list[tuple[float, float]]:
+        """
+        The stretches without speech, as (start, end) pairs, at least ``min_seconds`` long.
+        """
+        edges = [0.0] + [time for span in self.speech for time in span] + [self.duration]
+        gaps = zip(edges[::2], edges[1::2])
+        return [(start, end) for start, end in gaps if end - start >= max(min_seconds, 1e-9)]
+
+    def _overlapping(self, start: float, end: float) -> list[tuple[float, float]]:
+        first = max(0, bisect.bisect_right(self._starts, start) - 1)
+        last = bisect.bisect_left(self._starts, end)
+        return [(s, e) for s, e in self.speech[first:last] if e > start and s < end]
+
+
+def speech_index(path: Optional[str] = None) -> SpeechIndex:
+    """
+    The speech index of an audio file, the job's recording by default,
+    measured only if no index of these exact contents is kept already.
+    """
+    path = path or job_path(config.audio_file)
+    index = load(path)
+    if index is None:
+        index = measure(path)
+        _indexes[content_hash(path)] = index
+        if _is_job_audio(path):
+            _save(index, content_hash(path))
+    return index
+
+
+def load(path: Optional[str] = None) -> Optional[SpeechIndex]:
+    """
+    The speech index kept for an audio file, the job's recording by default,
+    or None if there is none for its current contents.
+    """
+    path = path or job_path(config.audio_file)
+    if not os.path.exists(path):
+        return None
+    digest = content_hash(path)
+    if digest not in _indexes and _is_job_audio(path):
+        try:
+            with open(job_path(INDEX), "r", encoding="utf-8") as f:
+                kept = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if kept.get("version") != VERSION or kept.get("audio") != digest:
+            return None
+        _indexes[digest] = SpeechIndex(
+            kept["duration"], [(start, end) for start, end in kept["speech"]]
+        )
+    return _indexes.get(digest)
+
+
+def measure(path: str) -> SpeechIndex:
+    """
+    Decode the audio and find its speech.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", "-i", path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise RuntimeError(f"Failed to find speech in {path}: {e}")
+
+    energies, crossings = [], []
+    block_bytes = BLOCK_FRAMES * FRAME_SAMPLES * 2
+    remainder = b""
+    samples = 0
+    with process:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - len(data) % (FRAME_SAMPLES * 2)
+            remainder = data[usable:]
+            frames = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, FRAME_SAMPLES)
+            samples += frames.size
+            energy, crossing = _judge(frames)
+            energies.append(energy)
+            crossings.append(crossing)
+        stderr = process.stderr.read()
+    if process.returncode:
+        raise RuntimeError(f"Failed to find speech in {path}: {stderr.decode(errors='replace')}")
+
+    duration = (samples + len(remainder) // 2) / SAMPLE_RATE
+    if not energies:
+        return SpeechIndex(duration)
+    speaking = _classify(np.concatenate(energies), np.concatenate(crossings))
+    return SpeechIndex(duration, _spans(speaking, duration))
+
+
+def detect_speech() -> None:
+    """
+    Build the speech index of the job's recording, as a task of its own.
+    """
+    with status("Finding speech..."):
+        index = speech_index()
+    info(
+        f"Found {index.speech_seconds / 60:.1f} minutes of speech in "
+        f"{index.duration / 60:.1f} minutes of audio, in {len(index.speech)} stretches"
+    )
+
+
+def _judge(frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The loudness in dBFS and the share of samples that cross zero, per frame.
+    """
+    scaled = frames.astype(np.float32) / 32768.0
+    power = np.einsum("ij,ij->i", scaled, scaled) / FRAME_SAMPLES
+    energy = 10.0 * np.log10(power + 1e-10)
+    signs = np.signbit(frames)
+    crossing = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / FRAME_SAMPLES
+    return energy, crossing
+
+
+def _classify(energy: np.ndarray, crossing: np.ndarray) -> np.ndarray:
+    quiet, loud = np.percentile(energy, [10, 90])
+    threshold = max(FLOOR_DB, min(quiet + MARGIN_DB, (quiet + loud) / 2))
+    voiced = energy > threshold
+    consonant = (energy > threshold - CONSONANT_DB) & (crossing > CONSONANT_CROSSINGS)
+    return (voiced | consonant) & (crossing < NOISE_CROSSINGS)
+
+
+def _spans(speaking: np.ndarray, duration: float) -> list[tuple[float, float]]:
+    """
+    Turn per-frame decisions into stretches of speech, smoothed and padded.
+    """
+    edges = np.diff(np.concatenate(([0], speaking.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * FRAME_SECONDS
+    ends = np.flatnonzero(edges == -1) * FRAME_SECONDS
+
+    spans: list[list[float]] = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if spans and start - spans[-1][1] < MIN_PAUSE:
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+
+    padded: list[tuple[float, float]] = []
+    for start, end in spans:
+        if end - start < MIN_SPEECH:
+            continue
+        start, end = max(0.0, start - PADDING), min(duration, end + PADDING)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return [(round(start, 3), round(end, 3)) for start, end in padded]
+
+
+def _is_job_audio(path: str) -> bool:
+    return os.path.abspath(path) == os.path.abspath(job_path(config.audio_file))
+
+
+def _save(index: SpeechIndex, digest: str) -> None:
+    path = os.path.abspath(job_path(INDEX))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": VERSION,
+                "audio": digest,
+                "duration": index.duration,
+                "speech": [list(span) for span in index.speech],
+            },
+            f,
+        )
+    move_into_place(temporary, path)
@@ -0,0 +1,6 @@
+"""A local stand-in for the provider APIs, for load tests that cost nothing."""
+
+from .replies import Recordings
+from .server import Behavior, Latency, MockServer
+
+__all__ = ["Behavior", "Latency", "MockServer", "Recordings"]
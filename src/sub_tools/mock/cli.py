@@ -0,0 +1,122 @@
+"""
+Serve the provider stand-in from the command line.
+
+Run ``sub-tools-mock``, then point ``sub-tools`` at it with the environment
+variables it prints, with any API key, to load-test a configuration offline.
+"""
+
+import argparse
+import signal
+import sys
+
+from ..system.console import header, info
+from .replies import Recordings
+from .server import Behavior, Latency, MockServer
+
+
+def _error_rate(value: str) -> tuple[int, float]:
+    status, separator, share = value.partition("=")
+    try:
+        if not separator:
+            raise ValueError
+        return int(status), float(share)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected STATUS=SHARE, such as 429=0.05, not {value!r}")
+
+
+def _latency(value: str) -> Latency:
+    try:
+        return Latency.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="sub-tools-mock",
+        description="Serve a local stand-in for the Gemini, OpenAI, Anthropic and OpenRouter APIs.",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765, help="Port to listen on (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--latency",
+        type=_latency,
+        default=Latency(),
+        help=(
+            "Delay before each answer, in seconds: a number, uniform:LOW:HIGH, normal:MEAN:SD, "
+            "lognormal:MEDIAN:SIGMA or exponential:MEAN (default: 0)."
+        ),
+    )
+    parser.add_argument(
+        "--error",
+        type=_error_rate,
+        action="append",
+        default=[],
+        metavar="STATUS=SHARE",
+        help="Refuse this share of model requests with this status, such as 429=0.05. Repeatable.",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        help="Seconds a 429 or 503 refusal asks the client to wait, in a Retry-After header.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for latencies and refusals; a run with the same seed is repeated exactly.",
+    )
+    parser.add_argument(
+        "--recorded",
+        metavar="DIRECTORY",
+        help="Take subtitle text from the {language}.srt files of an earlier run here.",
+    )
+    parser.add_argument(
+        "--speech",
+        metavar="WAV",
+        help="Answer every speech request with this recording instead of silence.",
+    )
+    return parser
+
+
+def main() -> None:
+    parser = _parser()
+    args = parser.parse_args()
+    if sum(share for _, share in args.error) > 1:
+        parser.error("the shares of --error add up to more than 1")
+
+    speech = None
+    if args.speech:
+        with open(args.speech, "rb") as f:
+            speech = f.read()
+    behavior = Behavior(
+        latency=args.latency,
+        errors=dict(args.error),
+        retry_after=args.retry_after,
+        seed=args.seed,
+        recordings=Recordings(args.recorded),
+        speech=speech,
+    )
+    server = MockServer(behavior, host=args.host, port=args.port)
+
+    header(f"Serving the provider stand-in at {server.url}")
+    for provider, url in server.base_urls().items():
+        info(f"export {provider.upper()}_BASE_URL={url}")
+    # Load-test harnesses stop the stand-in with SIGTERM; it reports either way.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        for (kind, status), count in sorted(server.counts.items()):
+            info(f"{kind}: {count} answered {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+What the stand-in answers: subtitles and speech made up from the request.
+
+An answer depends only on the request and on the recordings given, so a run
+against the stand-in can be repeated exactly. A transcription has one cue
+every ``CUE_SECONDS`` for as long as the audio it was sent lasts. A translation
+keeps every cue and its timing and changes only the text, written in the
+target language's script where the pipeline checks it. Speech is silence,
+about as long as the text would take to say.
+
+Given a directory of recorded subtitles, such as the output of an earlier real
+run, the text comes from there instead: cue N of a transcription or
+translation into a language is cue N of ``{language}.srt``.
+"""
+
+import io
+import json
+import os
+import re
+import wave
+from typing import Optional
+
+import pycountry
+
+from ..media.dubber import CHANNELS, SAMPLE_RATE, SAMPLE_WIDTH
+from ..subtitles.splice import render
+from ..subtitles.validator import parse_strict
+from ..system.language import SCRIPTS
+
+# Seconds from the start of one made-up cue to the next, and the share of them
+# that it is shown.
+CUE_SECONDS = 3.0
+CUE_SHOWN = 0.8
+
+# Audio length assumed when a request's audio cannot be measured.
+DEFAULT_DURATION = 60.0
+
+# Characters of text spoken per second of made-up speech.
+SPOKEN_CHARACTERS_PER_SECOND = 15
+
+# A word in each script the pipeline checks, for translations into it.
+SCRIPT_WORDS = {
+    "ARABIC": "ترجمة",
+    "ARMENIAN": "ենթագրեր",
+    "BENGALI": "উপশিরোনাম",
+    "CJK": "字幕",
+    "CYRILLIC": "субтитры",
+    "DEVANAGARI": "उपशीर्षक",
+    "GEORGIAN": "სუბტიტრები",
+    "GREEK": "υπότιτλοι",
+    "HANGUL": "자막",
+    "HEBREW": "כתוביות",
+    "TAMIL": "வசனங்கள்",
+    "THAI": "คำบรรยาย",
+}
+
+_SRT_TO_TRANSLATE = re.compile(r"SRT to translate:\n\n(.*?)(?:\n\nFollowing .*)?$", re.S)
+_TARGET = re.compile(r"into (.+?)\. Reply with")
+_KEYS = re.compile(r"JSON object with the keys (.+?)\. ")
+_HEARD = re.compile(r"audio file in (.+?)\.")
+
+
+class Recordings:
+    """
+    Subtitles recorded earlier, by language code, read on first use.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._texts: dict[str, list[str]] = {}
+
+    def texts(self, language: str) -> list[str]:
+        """
+        The text of each cue recorded for ``language``, or none.
+        """
+        if self.directory is None:
+            return []
+        if language not in self._texts:
+            path = os.path.join(self.directory, f"{language}.srt")
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    cues, errors = parse_strict(f.read())
+            except OSError:
+                cues, errors = [], []
+            self._texts[language] = [cue.text for cue in cues] if not errors else []
+        return self._texts[language]
+
+
+def answer(
+    system_instruction: str,
+    text: str,
+    duration: Optional[float],
+    recordings: Recordings,
+) -> str:
+    """
+    The answer to one text request, from what the pipeline asks for in it.
+    """
+    found = _SRT_TO_TRANSLATE.search(text)
+    if found:
+        source = found[1].strip()
+        keys = _KEYS.search(system_instruction)
+        if keys:
+            codes = re.findall(r'"([^"]+)"', keys[1])
+            return json.dumps(
+                {code: translate(source, code, recordings) for code in codes},
+                ensure_ascii=False,
+            )
+        target = _TARGET.search(text)
+        code = language_code(target[1]) if target else "en"
+        return translate(source, code, recordings)
+    heard = _HEARD.search(system_instruction)
+    if heard:
+        return transcribe(language_code(heard[1]), duration, recordings)
+    return "OK"
+
+
+def transcribe(language: str, duration: Optional[float], recordings: Recordings) -> str:
+    """
+    Subtitles for audio of ``duration`` seconds, one cue every ``CUE_SECONDS``.
+    """
+    duration = duration or DEFAULT_DURATION
+    count = max(1, int(duration // CUE_SECONDS))
+    recorded = recordings.texts(language)
+    cues = []
+    for index in range(count):
+        start = index * CUE_SECONDS
+        end = min(duration, start + CUE_SECONDS * CUE_SHOWN)
+        if recorded:
+            line = recorded[index % len(recorded)]
+        else:
+            line = _line(language, index + 1)
+        cues.append((start, end, line))
+    return render(cues)
+
+
+def translate(srt: str, language: str, recordings: Recordings) -> str:
+    """
+    ``srt`` with the text of every cue replaced by text in ``language``.
+    """
+    cues, _ = parse_strict(srt)
+    recorded = recordings.texts(language)
+    lines = []
+    for position, cue in enumerate(cues):
+        if position < len(recorded):
+            line = recorded[position]
+        elif _script_word(language):
+            line = _line(language, cue.index)
+        else:
+            # A Latin script is not told apart from the source, so the text
+            # is kept as it is.
+            line = cue.text
+        lines.append((cue.start, cue.end, line))
+    return render(lines)
+
+
+def speech(text: str) -> bytes:
+    """
+    Silence as long as ``text`` would take to say, as WAV in the dubber's format.
+    """
+    return pcm_to_wav(silence(text))
+
+
+def silence(text: str) -> bytes:
+    """
+    Raw 16-bit PCM silence as long as ``text`` would take to say.
+    """
+    seconds = max(0.5, len(text) / SPOKEN_CHARACTERS_PER_SECOND)
+    return bytes(int(seconds * SAMPLE_RATE) * SAMPLE_WIDTH * CHANNELS)
+
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    """
+    Wrap raw PCM in the dubber's format in a WAV header.
+    """
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return out.getvalue()
+
+
+def language_code(name: str) -> str:
+    """
+    The two-letter code of a language named as the pipeline names it.
+    """
+    language = pycountry.languages.get(name=name)
+    code = getattr(language, "alpha_2", None) if language else None
+    return code or name
+
+
+def _script_word(language: str) -> Optional[str]:
+    scripts = SCRIPTS.get(language.split("-")[0].lower(), ())
+    if not scripts or "LATIN" in scripts:
+        return None
+    return SCRIPT_WORDS.get(scripts[0])
+
+
+def _line(language: str, number: int) -> str:
+    return f"{_script_word(language) or 'Line'} {number}."
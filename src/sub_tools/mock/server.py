@@ -0,0 +1,703 @@
+"""
+A local HTTP stand-in for the provider APIs that sub-tools uses.
+
+It speaks just enough of each API for the real SDKs to work against it:
+Gemini's generateContent, streamGenerateContent, file uploads and cached
+contents; OpenAI's chat completions, transcriptions and speech, which
+OpenRouter shares; and Anthropic's messages. Answers come from ``replies``.
+
+Every model request waits a delay drawn from ``Behavior.latency`` and may be
+refused with one of ``Behavior.errors``, in the provider's own error format,
+so that concurrency, retries and failover can be measured without spending
+anything. The draws for a request are seeded with ``Behavior.seed``, the
+request itself and how many times it has been seen, so a run is repeated
+exactly however its requests interleave.
+"""
+
+import base64
+import email.parser
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import wave
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from ..media.converter import audio_duration
+from ..subtitles.validator import parse_strict
+from . import replies
+from .replies import Recordings
+
+# Seconds an uploaded file or cached context is said to be kept.
+FILE_LIFETIME_SECONDS = 48 * 3600
+
+_GENERATE = re.compile(
+    r"/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$"
+)
+
+_GEMINI_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+_ANTHROPIC_TYPE = {429: "rate_limit_error", 500: "api_error", 503: "overloaded_error"}
+
+
+@dataclass(frozen=True)
+class Latency:
+    """
+    A distribution of delays, in seconds: fixed, uniform, normal, lognormal or
+    exponential.
+    """
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """
+        Read ``SECONDS``, ``uniform:LOW:HIGH``, ``normal:MEAN:SD``,
+        ``lognormal:MEDIAN:SIGMA`` or ``exponential:MEAN``.
+        """
+        kind, _, rest = spec.partition(":")
+        try:
+            if not rest:
+                return cls("fixed", float(kind))
+            values = [float(value) for value in rest.split(":")]
+        except ValueError:
+            raise ValueError(f"{spec!r} is not a latency") from None
+        arity = {"uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if arity.get(kind) != len(values):
+            raise ValueError(f"{spec!r} is not a latency")
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        One delay, never negative.
+        """
+        if self.kind == "uniform":
+            delay = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            delay = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            delay = self.a * math.exp(rng.gauss(0.0, self.b))
+        elif self.kind == "exponential":
+            delay = rng.expovariate(1 / self.a) if self.a > 0 else 0.0
+        else:
+            delay = self.a
+        return max(0.0, delay)
+
+
+@dataclass
+class Behavior:
+    """
+    How the stand-in behaves.
+
+    ``errors`` maps an HTTP status to the share of model requests refused with
+    it. A refusal of ``retry_after_statuses`` says to retry after
+    ``retry_after`` seconds, when given. ``speech`` is a recording returned
+    for every speech request instead of silence.
+    """
+
+    latency: Latency = field(default_factory=Latency)
+    errors: dict[int, float] = field(default_factory=dict)
+    retry_after: Optional[float] = None
+    retry_after_statuses: tuple[int, ...] = (429, 503)
+    seed: int = 0
+    recordings: Recordings = field(default_factory=Recordings)
+    speech: Optional[bytes] = None
+
+
+class MockServer:
+    """
+    The stand-in, serving on ``host:port`` (any free port for 0) from a
+    thread once started, or in the foreground with ``serve_forever``.
+    """
+
+    def __init__(
+        self, behavior: Optional[Behavior] = None, host: str = "127.0.0.1", port: int = 0
+    ):
+        self.behavior = behavior or Behavior()
+        self.counts: Counter[tuple[str, int]] = Counter()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._seen: Counter[str] = Counter()
+        self._directory = tempfile.TemporaryDirectory(prefix="sub-tools-mock-")
+        self._uploads: dict[str, dict] = {}
+        self._files: dict[str, dict] = {}
+        self._caches: dict[str, dict] = {}
+        self._durations: dict[str, Optional[float]] = {}
+
+    @property
+    def url(self) -> str:
+        """
+        The root URL the stand-in serves.
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_urls(self) -> dict[str, str]:
+        """
+        The base URL to give each provider's client, by provider.
+        """
+        return {
+            "gemini": self.url,
+            "openai": f"{self.url}/v1",
+            "anthropic": self.url,
+            "openrouter": f"{self.url}/api/v1",
+        }
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        self._directory.cleanup()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def draw(self, body: bytes, path: str) -> random.Random:
+        """
+        The random numbers for one request, the same on every run.
+        """
+        digest = hashlib.sha256(path.encode("utf-8") + b"\0" + body).hexdigest()
+        with self._lock:
+            seen = self._seen[digest]
+            self._seen[digest] += 1
+        return random.Random(f"{self.behavior.seed}:{digest}:{seen}")
+
+    def count(self, kind: str, status: int) -> None:
+        with self._lock:
+            self.counts[(kind, status)] += 1
+
+    def store_audio(self, data: bytes) -> str:
+        """
+        Keep received audio on disk, returning its path.
+        """
+        path = os.path.join(self._directory.name, hashlib.sha256(data).hexdigest())
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return path
+
+    def duration(self, path: Optional[str]) -> Optional[float]:
+        """
+        How long the audio at ``path`` lasts, measured once.
+        """
+        if path is None:
+            return None
+        with self._lock:
+            if path in self._durations:
+                return self._durations[path]
+        measured = audio_duration(path)
+        with self._lock:
+            self._durations[path] = measured
+        return measured
+
+    # Gemini files and cached contents
+
+    def begin_upload(self, metadata: dict) -> str:
+        upload_id = os.urandom(8).hex()
+        with self._lock:
+            self._uploads[upload_id] = {"metadata": metadata.get("file") or {}, "data": b""}
+        return upload_id
+
+    def continue_upload(self, upload_id: str, data: bytes, finalize: bool) -> Optional[dict]:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload["data"] += data
+            if not finalize:
+                return {}
+            del self._uploads[upload_id]
+        path = self.store_audio(upload["data"])
+        now = datetime.now(timezone.utc)
+        name = f"files/{os.path.basename(path)[:16]}"
+        metadata = upload["metadata"]
+        file = {
+            "name": name,
+            "displayName": metadata.get("displayName") or metadata.get("display_name") or name,
+            "mimeType": metadata.get("mimeType") or metadata.get("mime_type") or "audio/mpeg",
+            "sizeBytes": str(len(upload["data"])),
+            "createTime": _timestamp(now),
+            "updateTime": _timestamp(now),
+            "expirationTime": _timestamp(now + timedelta(seconds=FILE_LIFETIME_SECONDS)),
+            "sha256Hash": base64.b64encode(hashlib.sha256(upload["data"]).digest()).decode(),
+            "uri": f"{self.url}/v1beta/{name}",
+            "state": "ACTIVE",
+            "source": "UPLOADED",
+        }
+        with self._lock:
+            self._files[name] = {"file": file, "path": path}
+        return file
+
+    def file(self, name: str) -> Optional[dict]:
+        with self._lock:
+            return self._files.get(name)
+
+    def file_path(self, uri: str) -> Optional[str]:
+        name = "files/" + uri.rstrip("/").rsplit("/", 1)[-1]
+        stored = self.file(name)
+        return stored["path"] if stored else None
+
+    def store_cache(self, request: dict) -> dict:
+        name = f"cachedContents/{os.urandom(8).hex()}"
+        now = datetime.now(timezone.utc)
+        cached = {
+            "name": name,
+            "model": request.get("model", ""),
+            "createTime": _timestamp(now),
+            "updateTime": _timestamp(now),
+            "expireTime": _timestamp(now + timedelta(seconds=FILE_LIFETIME_SECONDS)),
+        }
+        with self._lock:
+            self._caches[name] = request
+        return cached
+
+    def cache(self, name: str) -> dict:
+        with self._lock:
+            return self._caches.get(name, {})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "sub-tools-mock"
+
+    @property
+    def mock(self) -> MockServer:
+        return self.server.mock  # type: ignore[attr-defined]
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._read_body()
+        path = urlsplit(self.path).path
+        match = re.search(r"/(files/[^/]+)$", path)
+        stored = self.mock.file(match[1]) if match else None
+        if stored is None:
+            self._error("gemini", 404, "file not found")
+            return
+        self._json(stored["file"])
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = parse_qs(parts.query)
+
+        if path.endswith("/upload/v1beta/files"):
+            self._upload(body, query)
+            return
+        if path.endswith("/cachedContents"):
+            self._json(self.mock.store_cache(json.loads(body or b"{}")))
+            return
+
+        generate = _GENERATE.search(path)
+        if generate:
+            provider, kind = "gemini", "generate"
+        elif path.endswith("/chat/completions"):
+            provider, kind = "openai", "chat"
+        elif path.endswith("/audio/transcriptions"):
+            provider, kind = "openai", "transcription"
+        elif path.endswith("/audio/speech"):
+            provider, kind = "openai", "speech"
+        elif path.endswith("/messages"):
+            provider, kind = "anthropic", "messages"
+        else:
+            self._error("openai", 404, f"no such endpoint: {path}")
+            return
+        if path.startswith("/api/"):
+            provider = "openrouter"
+
+        rng = self.mock.draw(body, path)
+        status = self._refusal(rng)
+        if status:
+            self.mock.count(f"{provider} {kind}", status)
+            self._error(provider, status, "injected by sub-tools-mock")
+            return
+        time.sleep(self.mock.behavior.latency.sample(rng))
+        self.mock.count(f"{provider} {kind}", 200)
+
+        if generate:
+            self._gemini(json.loads(body), generate["model"], generate["method"])
+        elif kind == "chat":
+            self._chat(json.loads(body))
+        elif kind == "transcription":
+            self._transcription(body)
+        elif kind == "speech":
+            self._speech(json.loads(body))
+        else:
+            self._messages(json.loads(body))
+
+    def _refusal(self, rng: random.Random) -> Optional[int]:
+        roll = rng.random()
+        for status, share in sorted(self.mock.behavior.errors.items()):
+            if roll < share:
+                return status
+            roll -= share
+        return None
+
+    # Gemini
+
+    def _upload(self, body: bytes, query: dict) -> None:
+        upload_id = query.get("upload_id", [None])[0]
+        if upload_id is None:
+            upload_id = self.mock.begin_upload(json.loads(body or b"{}"))
+            url = f"{self.mock.url}/upload/v1beta/files?upload_id={upload_id}"
+            self._json({}, headers={"X-Goog-Upload-URL": url, "X-Goog-Upload-Status": "active"})
+            return
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        file = self.mock.continue_upload(upload_id, body, "finalize" in command)
+        if file is None:
+            self._error("gemini", 404, "upload not found")
+            return
+        status = "final" if file else "active"
+        self._json({"file": file} if file else {}, headers={"X-Goog-Upload-Status": status})
+
+    def _gemini(self, request: dict, model: str, method: str) -> None:
+        cached = self.mock.cache(_get(request, "cachedContent") or "")
+        system = _gemini_text([_get(cached, "systemInstruction")]) + _gemini_text(
+            [_get(request, "systemInstruction")]
+        )
+        contents = (_get(cached, "contents") or []) + (request.get("contents") or [])
+        text = _gemini_text(contents)
+        audio = self._gemini_audio(contents)
+        generation = _get(request, "generationConfig") or {}
+        modalities = _get(generation, "responseModalities") or []
+
+        if "AUDIO" in modalities:
+            pcm = replies.silence(text)
+            if self.mock.behavior.speech is not None:
+                pcm = _wav_frames(self.mock.behavior.speech)
+            part = {
+                "inlineData": {
+                    "mimeType": "audio/L16;codec=pcm;rate=24000",
+                    "data": base64.b64encode(pcm).decode("ascii"),
+                }
+            }
+            self._json(_gemini_response([part], system + text, "", model))
+            return
+
+        reply = self._reply(system, text, audio)
+        if method == "generateContent":
+            self._json(_gemini_response([{"text": reply}], system + text, reply, model))
+            return
+        self._events(
+            f"data: {json.dumps(_gemini_response([{'text': piece}], system + text, reply, model))}"
+            for piece in _pieces(reply)
+        )
+
+    def _gemini_audio(self, contents: list) -> Optional[str]:
+        for content in contents:
+            for part in content.get("parts") or []:
+                file_data = _get(part, "fileData")
+                if file_data:
+                    return self.mock.file_path(_get(file_data, "fileUri") or "")
+                inline = _get(part, "inlineData")
+                if inline and str(_get(inline, "mimeType") or "").startswith("audio"):
+                    return self.mock.store_audio(base64.b64decode(inline["data"]))
+        return None
+
+    # OpenAI, OpenRouter
+
+    def _chat(self, request: dict) -> None:
+        system, text, audio = "", "", None
+        for message in request.get("messages") or []:
+            content = message.get("content")
+            blocks = [{"type": "text", "text": content}] if isinstance(content, str) else content
+            for block in blocks or []:
+                if block.get("type") == "text":
+                    if message.get("role") in ("system", "developer"):
+                        system += block["text"]
+                    else:
+                        text += block["text"]
+                elif block.get("type") == "input_audio":
+                    data = (block.get("input_audio") or block.get("inputAudio") or {})["data"]
+                    audio = self.mock.store_audio(base64.b64decode(data))
+        model = request.get("model", "")
+        reply = self._reply(system, text, audio)
+        usage = {
+            "prompt_tokens": _tokens(system + text),
+            "completion_tokens": _tokens(reply),
+            "total_tokens": _tokens(system + text) + _tokens(reply),
+        }
+        common = {
+            "id": "chatcmpl-mock",
+            "created": int(time.time()),
+            "model": model,
+            "system_fingerprint": "sub-tools-mock",
+        }
+        if not request.get("stream"):
+            message = {"role": "assistant", "content": reply}
+            choice = {"index": 0, "finish_reason": "stop", "message": message}
+            self._json({**common, "object": "chat.completion", "choices": [choice], "usage": usage})
+            return
+
+        def chunk(delta: dict, finish: Optional[str]) -> str:
+            choice = {"index": 0, "delta": delta, "finish_reason": finish}
+            return json.dumps({**common, "object": "chat.completion.chunk", "choices": [choice]})
+
+        events = [chunk({"role": "assistant", "content": ""}, None)]
+        events += [chunk({"content": piece}, None) for piece in _pieces(reply)]
+        events.append(chunk({}, "stop"))
+        events.append(
+            json.dumps({**common, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        )
+        events.append("[DONE]")
+        self._events(f"data: {event}" for event in events)
+
+    def _transcription(self, body: bytes) -> None:
+        fields = _multipart(self.headers.get("Content-Type", ""), body)
+        audio = self.mock.store_audio(fields.get("file", b""))
+        language = fields.get("language", b"en").decode("utf-8") or "en"
+        srt = replies.transcribe(
+            language, self.mock.duration(audio), self.mock.behavior.recordings
+        )
+        response_format = fields.get("response_format", b"json").decode("utf-8")
+        if response_format in ("srt", "text", "vtt"):
+            self._send(200, srt.encode("utf-8"), "text/plain; charset=utf-8")
+            return
+        cues, _ = parse_strict(srt)
+        segments = [
+            {"id": position, "start": cue.start, "end": cue.end, "text": cue.text}
+            for position, cue in enumerate(cues)
+        ]
+        text = " ".join(cue.text for cue in cues)
+        self._json(
+            {
+                "text": text,
+                "language": language,
+                "duration": cues[-1].end if cues else 0.0,
+                "segments": segments,
+                "usage": {"type": "duration", "seconds": math.ceil(cues[-1].end if cues else 0)},
+            }
+        )
+
+    def _speech(self, request: dict) -> None:
+        audio = self.mock.behavior.speech or replies.speech(request.get("input", ""))
+        self._send(200, audio, "audio/wav")
+
+    # Anthropic
+
+    def _messages(self, request: dict) -> None:
+        system = request.get("system") or ""
+        if not isinstance(system, str):
+            system = "".join(block.get("text", "") for block in system)
+        text = ""
+        for message in request.get("messages") or []:
+            content = message.get("content")
+            if isinstance(content, str):
+                text += content
+            else:
+                text += "".join(block.get("text", "") for block in content or [])
+        model = request.get("model", "")
+        reply = self._reply(system, text, None)
+        usage = {"input_tokens": _tokens(system + text), "output_tokens": _tokens(reply)}
+        message = {
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        if not request.get("stream"):
+            self._json(message)
+            return
+        start = {**message, "content": [], "stop_reason": None}
+        start["usage"] = {**usage, "output_tokens": 0}
+        block = {"type": "text", "text": ""}
+        events = [
+            ("message_start", {"type": "message_start", "message": start}),
+            (
+                "content_block_start",
+                {"type": "content_block_start", "index": 0, "content_block": block},
+            ),
+        ]
+        for piece in _pieces(reply):
+            delta = {"type": "text_delta", "text": piece}
+            events.append(
+                ("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": delta})
+            )
+        events.append(("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        events.append(
+            (
+                "message_delta",
+                {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                    "usage": {"output_tokens": usage["output_tokens"]},
+                },
+            )
+        )
+        events.append(("message_stop", {"type": "message_stop"}))
+        self._events(f"event: {name}\ndata: {json.dumps(data)}" for name, data in events)
+
+    # Shared
+
+    def _reply(self, system: str, text: str, audio: Optional[str]) -> str:
+        duration = self.mock.duration(audio)
+        return replies.answer(system, text, duration, self.mock.behavior.recordings)
+
+    def _read_body(self) -> bytes:
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailers, if any, end with an empty line.
+                    while self.rfile.readline().strip():
+                        pass
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(
+        self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data: dict, status: int = 200, headers: Optional[dict] = None) -> None:
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def _events(self, events) -> None:
+        """
+        Send server-sent events, one chunk of the body each.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in events:
+            data = f"{event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _error(self, provider: str, status: int, message: str) -> None:
+        behavior = self.mock.behavior
+        headers = {}
+        if behavior.retry_after is not None and status in behavior.retry_after_statuses:
+            headers["Retry-After"] = f"{behavior.retry_after:g}"
+        if provider == "gemini":
+            name = _GEMINI_STATUS.get(status, "UNKNOWN")
+            body: dict = {"error": {"code": status, "message": message, "status": name}}
+        elif provider == "anthropic":
+            error = {"type": _ANTHROPIC_TYPE.get(status, "api_error"), "message": message}
+            body = {"type": "error", "error": error}
+        else:
+            body = {"error": {"code": status, "message": message, "type": "mock_error"}}
+        self._json(body, status=status, headers=headers)
+
+
+def _get(data: Optional[dict], camel: str):
+    """
+    A field of a request, named in camelCase or snake_case.
+    """
+    if not data:
+        return None
+    if camel in data:
+        return data[camel]
+    return data.get(re.sub(r"([A-Z])", lambda m: "_" + m[1].lower(), camel))
+
+
+def _gemini_text(contents: list) -> str:
+    text = ""
+    for content in contents:
+        if not content:
+            continue
+        for part in content.get("parts") or []:
+            text += part.get("text") or ""
+    return text
+
+
+def _gemini_response(parts: list, prompt: str, reply: str, model: str) -> dict:
+    return {
+        "candidates": [
+            {"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}
+        ],
+        "usageMetadata": {
+            "promptTokenCount": _tokens(prompt),
+            "candidatesTokenCount": _tokens(reply),
+            "totalTokenCount": _tokens(prompt) + _tokens(reply),
+        },
+        "modelVersion": model,
+    }
+
+
+def _pieces(reply: str) -> list[str]:
+    """
+    An answer cut where its cues end, as it would arrive streamed.
+    """
+    pieces = re.findall(r".*?\n\n|.+$", reply, re.S)
+    return pieces or [reply]
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _wav_frames(data: bytes) -> bytes:
+    """
+    The PCM frames of a WAV recording, or the data itself if it is not one.
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return data
+
+
+def _multipart(content_type: str, body: bytes) -> dict[str, bytes]:
+    """
+    The fields of a multipart/form-data body, by name.
+    """
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = {}
+    for part in message.get_payload() if message.is_multipart() else []:
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = part.get_payload(decode=True) or b""
+    return fields
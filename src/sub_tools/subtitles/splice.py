@@ -0,0 +1,252 @@
+"""
+Take subtitle files apart and put them back together.
+
+Long recordings are transcribed in windows, each answered with timestamps that
+start from zero. Stitching moves every window's cues to where the window sits
+in the recording and joins them into one file, numbered from one, for the
+usual repair and validation to judge as a whole.
+
+The same pieces let a rejected answer be mended instead of thrown away. One
+backwards timestamp in block 212 does not make the other four hundred cues
+wrong, so only the stretch around the failure is asked for again and spliced
+into the cues that were fine.
+
+Long translations are split the same way, by cue rather than by time: each
+window of source cues is translated on its own, and the answers are merged
+back by cue index onto the source timings.
+"""
+
+from .validator import Cue, parse_strict
+
+# Asking again for more than this share of a file costs about as much as a new
+# answer, and a new answer is more likely to hang together.
+MAX_RETRY_SHARE = 0.5
+
+# Audio either side of a failed stretch that is heard again, so the new answer
+# does not start or stop in the middle of a word.
+SPAN_PADDING = 1.0
+
+
+def shift(content: str, offset: float) -> str:
+    """
+    Move every cue in valid SRT content later by ``offset`` seconds.
+    """
+    return stitch([(offset, content)])
+
+
+def stitch(parts: list[tuple[float, str]]) -> str:
+    """
+    Join (offset, content) pairs of valid SRT into one file, in the given order.
+
+    Each part must already have passed validation; a part that fails to parse
+    is a bug in the caller, not something to paper over here.
+    """
+    cues = []
+    for offset, content in parts:
+        parsed, errors = parse_strict(content)
+        if errors:
+            raise ValueError(f"cannot stitch invalid subtitles: {'; '.join(errors)}")
+        cues += [(cue.start + offset, cue.end + offset, cue.text) for cue in parsed]
+    return render(cues)
+
+
+def render(cues: list[tuple[float, float, str]]) -> str:
+    """
+    Serialize (start, end, text) cues as SRT, numbered from one.
+    """
+    blocks = [
+        f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n"
+        for index, (start, end, text) in enumerate(cues, start=1)
+    ]
+    return "\n".join(blocks)
+
+
+def format_timestamp(seconds: float) -> str:
+    """
+    Render seconds as an SRT timestamp.
+    """
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, rest = divmod(milliseconds, 3_600_000)
+    minutes, rest = divmod(rest, 60_000)
+    whole, fraction = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{whole:02d},{fraction:03d}"
+
+
+def failed_spans(
+    content: str,
+    duration: float | None,
+    begin_gap: float,
+    end_gap: float,
+) -> tuple[list[Cue], list[tuple[float, float]]] | None:
+    """
+    Split a transcription into the cues worth keeping and the spans to hear again.
+
+    A block that does not parse, runs backwards, steps back in time or ends
+    after the recording is dropped along with a little audio either side of
+    it; so is silence at either end longer than ``begin_gap``/``end_gap``
+    seconds allow. Returns None when there is too little to keep, or no known
+    duration to place the spans in.
+    """
+    if not duration:
+        return None
+
+    cues = _block_cues(content)
+    kept: list[Cue] = []
+    failed: list[tuple[float, float]] = []
+    previous_end = 0.0
+    for position, cue in enumerate(cues):
+        usable = (
+            cue is not None
+            and cue.start < cue.end <= duration + 1
+            and (not kept or cue.start >= kept[-1].start)
+        )
+        if usable:
+            kept.append(cue)
+            previous_end = cue.end
+            continue
+        following = next(
+            (
+                later.start
+                for later in cues[position + 1 :]
+                if later is not None and later.start >= previous_end
+            ),
+            duration,
+        )
+        failed.append((previous_end, following))
+
+    if not kept:
+        return None
+    if kept[0].start > begin_gap:
+        failed.append((0.0, kept[0].start))
+    if duration - kept[-1].end > end_gap:
+        failed.append((kept[-1].end, duration))
+
+    spans = _merge(
+        (max(0.0, start - SPAN_PADDING), min(duration, end + SPAN_PADDING))
+        for start, end in failed
+    )
+    # A kept cue the padding reaches into is heard again whole, so none of its
+    # words fall between the old answer and the new one.
+    touched = [cue for cue in kept if _overlaps(cue, spans)]
+    spans = _merge(spans + [(cue.start, cue.end) for cue in touched])
+    if sum(end - start for start, end in spans) > duration * MAX_RETRY_SHARE:
+        return None
+
+    return [cue for cue in kept if not _overlaps(cue, spans)], spans
+
+
+def untranslated_runs(
+    content: str,
+    reference: str,
+) -> tuple[dict[int, str], list[list[int]]] | None:
+    """
+    Match a translation to its source, cue by cue, and find what is missing.
+
+    Returns the translated text for each source position that came back intact,
+    and the runs of consecutive source positions that did not. Timings are
+    compared exactly because repair has already put the source timings back;
+    a cue that still does not line up is treated as lost. Returns None when
+    the source cannot be parsed or too much is missing to be worth mending.
+    """
+    source, errors = parse_strict(reference)
+    if errors or not source:
+        return None
+
+    positions = {(cue.start, cue.end): position for position, cue in enumerate(source)}
+    translated: dict[int, str] = {}
+    for cue in _block_cues(content):
+        if cue is None:
+            continue
+        position = positions.get((cue.start, cue.end))
+        if position is not None and position not in translated:
+            translated[position] = cue.text
+
+    runs: list[list[int]] = []
+    for position in range(len(source)):
+        if position in translated:
+            continue
+        if runs and runs[-1][-1] == position - 1:
+            runs[-1].append(position)
+        else:
+            runs.append([position])
+
+    missing = sum(len(run) for run in runs)
+    if not translated or missing > len(source) * MAX_RETRY_SHARE:
+        return None
+    return translated, runs
+
+
+def cue_windows(count: int, size: int) -> list[range]:
+    """
+    Divide ``count`` cue positions into consecutive windows of at most ``size``.
+
+    The windows are as even as possible, so the last is never a short
+    leftover. A size of zero or less means one window for everything.
+    """
+    if size <= 0 or count <= size:
+        return [range(count)]
+    windows = -(-count // size)
+    bounds = [round(count * i / windows) for i in range(windows + 1)]
+    return [range(start, end) for start, end in zip(bounds, bounds[1:])]
+
+
+def cue_text(reference: str, positions: range) -> str:
+    """
+    The text of the source cues at the given positions, one cue per line.
+
+    Without numbers or timestamps, so a model shown them as context has no
+    cues to copy into its answer.
+    """
+    source, _ = parse_strict(reference)
+    return "\n".join(source[p].text.replace("\n", " ") for p in positions if p < len(source))
+
+
+def excerpt(reference: str, positions: list[int]) -> str:
+    """
+    The source cues at the given positions, as SRT numbered from one.
+    """
+    source, _ = parse_strict(reference)
+    return render([(source[p].start, source[p].end, source[p].text) for p in positions])
+
+
+def merge_translation(reference: str, translated: dict[int, str]) -> str:
+    """
+    Rebuild a translation on the source timings from text per source position.
+
+    Positions with no translation are left out, for validation to count.
+    """
+    source, _ = parse_strict(reference)
+    return render(
+        [
+            (cue.start, cue.end, translated[position])
+            for position, cue in enumerate(source)
+            if position in translated
+        ]
+    )
+
+
+def _block_cues(content: str) -> list[Cue | None]:
+    """
+    Parse each block on its own, with None for a block that is not valid SRT.
+    """
+    cues: list[Cue | None] = []
+    for block in content.replace("\r\n", "\n").strip().split("\n\n"):
+        if not block.strip():
+            continue
+        parsed, errors = parse_strict(block)
+        cues.append(None if errors or len(parsed) != 1 else parsed[0])
+    return cues
+
+
+def _overlaps(cue: Cue, spans: list[tuple[float, float]]) -> bool:
+    return any(cue.start < end and cue.end > start for start, end in spans)
+
+
+def _merge(spans) -> list[tuple[float, float]]:
+    merged: list[tuple[float, float]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,100 @@
+"""
+Check subtitles while the model is still writing them.
+
+A long answer takes minutes to arrive, and one that goes wrong in its first
+cues is usually wrong for good: a transcript that jumps back to the start of
+the recording, or a translation written in the wrong language. Watching the
+cues as they stream in lets such an answer be abandoned seconds in, instead
+of being paid for and waited on in full before validation rejects it.
+
+Only failures that repair cannot fix stop a stream. Blocks that do not parse
+yet are left alone, since repair usually saves them once the answer is whole.
+"""
+
+from sub_tools.system.language import get_language_name, script_share
+
+from .splice import format_timestamp
+from .validator import parse_strict
+
+# Small steps back are put in order by repair; a jump back this far means the
+# model started over.
+BACKWARDS_SECONDS = 10.0
+
+# Letters of subtitle text to read before judging the language, and the share
+# of them that must be in the language's own script.
+LANGUAGE_LETTERS = 200
+MIN_SCRIPT_SHARE = 0.5
+
+
+class StreamAborted(Exception):
+    """
+    An answer was abandoned while it was streaming.
+
+    ``kept`` is the text of the cues that came before the failure and can still
+    be used, or an empty string when none can.
+    """
+
+    def __init__(self, reason: str, kept: str = ""):
+        super().__init__(reason)
+        self.reason = reason
+        self.kept = kept
+
+
+class StreamCheck:
+    """
+    Follow one streamed answer cue by cue; ``feed`` raises StreamAborted.
+
+    ``duration`` is the length of the recording in seconds and ``language`` the
+    code of the language the subtitles should be in; either may be None.
+    """
+
+    def __init__(self, duration: float | None = None, language: str | None = None):
+        self.duration = duration
+        self.language = language
+        self._text = ""
+        self._checked = 0
+        self._latest: float | None = None
+        self._letters: list[str] = []
+        self._language_checked = language is None
+
+    def feed(self, piece: str) -> None:
+        """
+        Take the next piece of the answer and check every cue it completes.
+        """
+        self._text += piece.replace("\r", "")
+        while True:
+            end = self._text.find("\n\n", self._checked)
+            if end < 0:
+                return
+            block = self._text[self._checked : end]
+            kept = self._text[: self._checked]
+            self._checked = end + 2
+            self._check(block, kept)
+
+    def _check(self, block: str, kept: str) -> None:
+        cues, errors = parse_strict(block)
+        if errors or len(cues) != 1:
+            return
+        cue = cues[0]
+
+        if self.duration is not None and cue.start > self.duration + 1:
+            raise StreamAborted(
+                f"subtitle at {format_timestamp(cue.start)} starts after the audio ends", kept
+            )
+        if self._latest is not None and cue.start < self._latest - BACKWARDS_SECONDS:
+            raise StreamAborted(
+                f"timestamps ran backwards from {format_timestamp(self._latest)} "
+                f"to {format_timestamp(cue.start)}",
+                kept,
+            )
+        self._latest = max(cue.start, self._latest or 0.0)
+
+        if self._language_checked:
+            return
+        self._letters += [char for char in cue.text if char.isalpha()]
+        if len(self._letters) < LANGUAGE_LETTERS:
+            return
+        self._language_checked = True
+        share = script_share("".join(self._letters), self.language)
+        if share is not None and share < MIN_SCRIPT_SHARE:
+            raise StreamAborted(f"subtitles are not in {get_language_name(self.language)}")
@@ -1,8 +1,11 @@
+from collections.abc import Iterator
 from contextlib import contextmanager
+from contextvars import ContextVar
 
 from rich import print
 from rich.console import Console
 from rich.panel import Panel
+from rich.progress import Progress
 from rich.theme import Theme
 
 theme = Theme(
@@ -17,25 +20,49 @@ theme = Theme(
 
 console = Console(theme=theme)
 
+# Progress bars and spinners redraw one place on the terminal, so they are
+# turned off while several jobs print side by side.
+live = True
+
+# The name of the job running in the current context, shown before its messages.
+_job: ContextVar[str | None] = ContextVar("job", default=None)
+
+
+@contextmanager
+def job_label(name: str) -> Iterator[None]:
+    """
+    Prefix every message printed inside the block with the job's name.
+    """
+    token = _job.set(name)
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+def _prefix() -> str:
+    name = _job.get()
+    return f"\\[{name}] " if name else ""
+
 
 def header(title: str):
-    print(Panel(f"[bold cyan]{title}"))
+    print(Panel(f"[bold cyan]{_prefix()}{title}"))
 
 
 def info(message: str) -> None:
-    console.print(f"[info] :information_source: {message}[/info]")
+    console.print(f"[info] :information_source: {_prefix()}{message}[/info]")
 
 
 def success(message: str) -> None:
-    console.print(f"[success] :white_check_mark:  {message}[/success] ")
+    console.print(f"[success] :white_check_mark:  {_prefix()}{message}[/success] ")
 
 
 def warning(message: str) -> None:
-    console.print(f"[warning] :warning:  {message}[/warning]")
+    console.print(f"[warning] :warning:  {_prefix()}{message}[/warning]")
 
 
 def error(message: str) -> None:
-    console.print(f"[error] :cross_mark:  {message}[/error]")
+    console.print(f"[error] :cross_mark:  {_prefix()}{message}[/error]")
 
 
 def log(text):
@@ -44,5 +71,15 @@ def log(text):
 
 @contextmanager
 def status(title):
+    if not live:
+        yield
+        return
     with console.status(title):
         yield
+
+
+def progress_bar() -> Progress:
+    """
+    A progress display, or one that shows nothing while jobs run side by side.
+    """
+    return Progress(disable=not live)
@@ -1,23 +1,93 @@
+import hashlib
 import os
+import stat
 
 from ..config import config
-from .console import warning
+from .console import info, warning
+
+# Recordings run to hundreds of megabytes, so a hash is only recomputed when
+# the file's size or modification time says it could have changed.
+_hashes: dict[tuple[str, int, int], str] = {}
 
 
 def ensure_output_directory(path: str) -> None:
     """
-    Ensures the output directory exists and changes to it.
+    Ensures the output directory exists.
     """
     os.makedirs(path, exist_ok=True)
-    os.chdir(path)
 
 
-def should_skip(file: str) -> bool:
+def job_path(*parts: str) -> str:
+    """
+    The path of a file named relative to the output directory.
+
+    Job files are named as they appear inside the output directory, and are
+    found through it rather than by changing the working directory, which the
+    whole process shares. Absolute names are returned unchanged.
+    """
+    return os.path.join(config.output_directory, *parts)
+
+
+def move_into_place(temporary: str, path: str) -> None:
     """
-    Checks if a file should be skipped based on existence and overwrite flag.
+    Rename a finished temporary file onto ``path``.
+
+    Temporary files are made readable by their owner alone. The file takes the
+    mode ``path`` had instead, or the one the umask gives a new file, like every
+    other file the tool writes.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(temporary, mode)
+    os.replace(temporary, path)
+
+
+def should_skip(file: str, inputs: dict | None = None) -> bool:
     """
-    if os.path.exists(file) and not config.overwrite:
-        path = os.path.join(config.output_directory, file)
+    Checks if a finished file can be kept instead of being made again.
+
+    ``file`` is named relative to the output directory.
+
+    The job manifest must have recorded the file as complete and made from the
+    same ``inputs``. A file changed since then was edited by hand and is kept
+    unless ``--overwrite`` is given. Files the manifest does not know are
+    trusted only in an output directory that had no manifest yet.
+    """
+    from . import manifest
+
+    path = job_path(file)
+    if not os.path.exists(path) or config.overwrite:
+        return False
+
+    if manifest.finished(file, inputs):
+        warning(f"File {path} already exists. Skipping...")
+        return True
+    if manifest.edited(file, inputs):
+        warning(f"File {path} was edited since it was made. Keeping it; --overwrite remakes it.")
+        return True
+    if not manifest.tracked():
         warning(f"File {path} already exists. Skipping...")
+        manifest.record_output(file, inputs)
         return True
+
+    info(f"{path} is unfinished or out of date; making it again")
     return False
+
+
+def content_hash(path: str) -> str:
+    """
+    Return the SHA-256 of a file's contents, remembered while the file is unchanged.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
@@ -1,5 +1,32 @@
+import unicodedata
+
 import pycountry
 
+# The scripts each language is written in, named by the first word of the
+# Unicode names of its letters. Languages not listed are not checked.
+SCRIPTS = {
+    **{
+        code: ("LATIN",)
+        for code in (
+            "af ca cs cy da de en es et eu fi fr ga gl hr hu id is it lt lv ms nb nl no "
+            "pl pt ro sk sl sq sv sw tl tr vi"
+        ).split()
+    },
+    **{code: ("CYRILLIC",) for code in "be bg kk mk mn ru sr uk".split()},
+    **{code: ("ARABIC",) for code in "ar fa ur".split()},
+    **{code: ("DEVANAGARI",) for code in "hi mr ne".split()},
+    "bn": ("BENGALI",),
+    "el": ("GREEK",),
+    "he": ("HEBREW",),
+    "hy": ("ARMENIAN",),
+    "ja": ("CJK", "HIRAGANA", "KATAKANA"),
+    "ka": ("GEORGIAN",),
+    "ko": ("HANGUL", "CJK"),
+    "ta": ("TAMIL",),
+    "th": ("THAI",),
+    "zh": ("CJK",),
+}
+
 
 def get_language_name(language_code: str) -> str:
     """
@@ -10,3 +37,17 @@ def get_language_name(language_code: str) -> str:
         return language.name
     else:
         return language_code
+
+
+def script_share(text: str, language_code: str) -> float | None:
+    """
+    The share of letters in ``text`` written in the language's own script.
+
+    None when the language's script is not known or the text has no letters.
+    """
+    scripts = SCRIPTS.get(language_code.split("-")[0].lower())
+    letters = [char for char in text if char.isalpha()]
+    if not scripts or not letters:
+        return None
+    native = sum(1 for char in letters if unicodedata.name(char, "").startswith(scripts))
+    return native / len(letters)
@@ -0,0 +1,184 @@
+"""
+The job manifest: what each stage made, from what, and what it cost.
+
+A run that is killed part way leaves files behind that look finished but are
+not: an audio file cut off mid-encode, or an SRT from an older model. So every
+output is recorded in the manifest once it is complete, together with a hash of
+its contents and a fingerprint of the inputs it was made from. A later run keeps
+a file only if the manifest says it was finished and its inputs have not changed
+since; anything else is made again. A finished file whose contents changed was
+edited by hand, and is kept too.
+
+Each stage also records when it ran, how long it took, the provider usage it
+caused and a summary of the requests it made, which also goes into the run
+report. The manifest lives in ``.sub-tools/job.json`` inside the output
+directory, next to the checkpoints stages keep for resuming part way through.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from ..intelligence.accounting import calls, capture
+from . import report
+from .file import content_hash, job_path, move_into_place
+
+JOB_DIRECTORY = ".sub-tools"
+MANIFEST = os.path.join(JOB_DIRECTORY, "job.json")
+
+# Loaded manifests by absolute path, with whether the file existed on loading.
+_manifests: dict[str, tuple[dict, bool]] = {}
+
+# The stage the current job is running, whose record collects the outputs made in it.
+_stage: ContextVar[dict | None] = ContextVar("stage", default=None)
+
+
+def fingerprint(inputs: dict | None) -> str:
+    """
+    A digest of everything an output was made from.
+    """
+    encoded = json.dumps(inputs or {}, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def file_inputs(**paths: str) -> dict:
+    """
+    Name input files by their contents' hashes, or None for a missing file.
+
+    Paths are relative to the output directory.
+    """
+    return {
+        name: content_hash(job_path(path)) if os.path.exists(job_path(path)) else None
+        for name, path in paths.items()
+    }
+
+
+def tracked() -> bool:
+    """
+    Whether this output directory had a manifest before this run started.
+
+    Directories from before manifests existed have files nobody recorded;
+    those are trusted rather than all made again.
+    """
+    return _load()[1]
+
+
+def finished(file: str, inputs: dict | None = None) -> bool:
+    """
+    Whether the manifest recorded ``file`` as complete, unchanged and made from ``inputs``.
+    """
+    entry = _load()[0]["outputs"].get(file)
+    if not entry or not os.path.exists(job_path(file)):
+        return False
+    return entry["inputs"] == fingerprint(inputs) and entry["hash"] == content_hash(job_path(file))
+
+
+def edited(file: str, inputs: dict | None = None) -> bool:
+    """
+    Whether ``file`` was recorded as complete and made from ``inputs``, but its
+    contents have changed since.
+    """
+    entry = _load()[0]["outputs"].get(file)
+    if not entry or not os.path.exists(job_path(file)):
+        return False
+    return entry["inputs"] == fingerprint(inputs) and entry["hash"] != content_hash(job_path(file))
+
+
+def output(file: str) -> dict | None:
+    """
+    The manifest's entry for ``file``, if it was recorded as complete.
+    """
+    return _load()[0]["outputs"].get(file)
+
+
+def record_output(file: str, inputs: dict | None = None, **details) -> None:
+    """
+    Record ``file`` as complete, made from ``inputs``, with any ``details`` later
+    stages need to know about how it was made.
+    """
+    manifest = _load()[0]
+    entry = {
+        "hash": content_hash(job_path(file)),
+        "inputs": fingerprint(inputs),
+        "finished": time.time(),
+        **details,
+    }
+    manifest["outputs"][file] = entry
+    record = _stage.get()
+    if record is not None:
+        record["inputs"][file] = entry["inputs"]
+        record["outputs"][file] = entry["hash"]
+    _save(manifest)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[dict]:
+    """
+    Record a stage's timing, usage and outputs, whether or not it finishes.
+    """
+    manifest = _load()[0]
+    record = {
+        "started": time.time(),
+        "seconds": None,
+        "finished": False,
+        "inputs": {},
+        "outputs": {},
+        "usage": {},
+        "requests": None,
+    }
+    manifest["stages"][name] = record
+    token = _stage.set(record)
+    # Saved straight away, so even a run killed in its first stage leaves a
+    # manifest behind and its half-written files are not trusted next time.
+    _save(manifest)
+    started = time.monotonic()
+    try:
+        with capture() as usage, calls() as made:
+            yield record
+        record["finished"] = True
+    finally:
+        _stage.reset(token)
+        record["seconds"] = round(time.monotonic() - started, 3)
+        record["usage"] = usage
+        record["requests"] = report.summarize(made)
+        report.add_stage(name, record)
+        _save(manifest)
+
+
+def checkpoint_directory(*parts: str) -> str:
+    """
+    A directory for a stage's partial results, created on first use.
+    """
+    path = job_path(JOB_DIRECTORY, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _load() -> tuple[dict, bool]:
+    path = os.path.abspath(job_path(MANIFEST))
+    if path not in _manifests:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            existed = True
+        except (OSError, ValueError):
+            manifest, existed = {}, False
+        manifest.setdefault("version", 1)
+        manifest.setdefault("stages", {})
+        manifest.setdefault("outputs", {})
+        _manifests[path] = (manifest, existed)
+    return _manifests[path]
+
+
+def _save(manifest: dict) -> None:
+    path = os.path.abspath(job_path(MANIFEST))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    move_into_place(temporary, path)
@@ -0,0 +1,126 @@
+"""
+The run report: where a run's minutes and tokens went.
+
+The manifest keeps each stage's totals for deciding what to make again; the
+report is for reading afterwards. It is written to ``run-report.json`` next to
+the outputs at the end of every run, finished or not, and breaks each stage
+down from the calls the accounting layer kept: how many requests were made,
+how many failed or were retried, the spread of their latencies and of the time
+until their answers started to arrive, and what they used, in all and per
+provider model.
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from ..intelligence import accounting
+from ..intelligence.accounting import Call
+from .file import job_path, move_into_place
+
+REPORT = "run-report.json"
+
+PERCENTILES = (50, 95, 99)
+
+# The stages of the run in progress, by name, as each one ends.
+_stages: ContextVar[Optional[dict]] = ContextVar("report_stages", default=None)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    The nearest-rank percentile of ``values``, which must not be empty.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def spread(values: list[float]) -> Optional[dict]:
+    """
+    Percentiles and the maximum of ``values``, in seconds, or None without any.
+    """
+    if not values:
+        return None
+    summary = {f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES}
+    summary["max"] = round(max(values), 3)
+    return summary
+
+
+def summarize(calls: list[Call]) -> dict:
+    """
+    Totals and latency percentiles of ``calls``, in all and per provider model.
+    """
+    summary = _totals(calls)
+    models: dict[str, list[Call]] = {}
+    for call in calls:
+        models.setdefault(f"{call.provider}:{call.model}", []).append(call)
+    summary["models"] = {name: _totals(group) for name, group in sorted(models.items())}
+    return summary
+
+
+@contextmanager
+def run() -> Iterator[None]:
+    """
+    Report on the stages run inside the block, once it ends.
+    """
+    stages: dict = {}
+    token = _stages.set(stages)
+    started = time.time()
+    clock = time.monotonic()
+    try:
+        with accounting.calls() as calls:
+            yield
+    finally:
+        _stages.reset(token)
+        _save(
+            {
+                "version": 1,
+                "started": started,
+                "seconds": round(time.monotonic() - clock, 3),
+                "stages": stages,
+                "total": summarize(calls),
+            }
+        )
+
+
+def add_stage(name: str, record: dict) -> None:
+    """
+    Add a stage's record to the report of the run in progress, if any.
+    """
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = record
+
+
+def _totals(calls: list[Call]) -> dict:
+    usage: dict = {"audio_seconds": round(sum(call.audio_seconds for call in calls), 3)}
+    for call in calls:
+        for name, value in call.counts.items():
+            usage[name] = usage.get(name, 0) + value
+    latencies = [call.latency for call in calls if call.latency is not None]
+    first_bytes = [call.first_byte for call in calls if call.first_byte is not None]
+    latency = spread(latencies)
+    if latency is not None:
+        latency["total"] = round(sum(latencies), 3)
+    return {
+        "requests": len(calls),
+        "failed": sum(1 for call in calls if call.error is not None),
+        "retries": sum(call.retries for call in calls),
+        "seconds": round(sum(call.seconds for call in calls), 3),
+        "latency": latency,
+        "first_byte": spread(first_bytes),
+        "usage": usage,
+    }
+
+
+def _save(report: dict) -> None:
+    path = os.path.abspath(job_path(REPORT))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    move_into_place(temporary, path)
@@ -0,0 +1,148 @@
+"""
+Batch manifests, and running their jobs in one process.
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from sub_tools import batch
+from sub_tools.config import Config, config
+
+
+def _write(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+class TestReadManifest:
+    def test_jsonl_rows_become_job_settings(self, tmp_path):
+        path = _write(
+            tmp_path / "jobs.jsonl",
+            [
+                {"output": "one", "url": "https://example.com/1.m3u8", "languages": ["en", "fr"]},
+                {"output": "two", "audio_file": "/data/2.mp3", "model": "gpt-5.6-luna"},
+            ],
+        )
+
+        jobs = batch.read_manifest(path)
+
+        assert jobs[0] == {
+            "output_directory": str(tmp_path / "one"),
+            "url": "https://example.com/1.m3u8",
+            "languages": ["en", "fr"],
+        }
+        assert jobs[1]["output_directory"] == str(tmp_path / "two")
+        assert jobs[1]["audio_file"] == "/data/2.mp3"
+
+    def test_csv_values_are_converted(self, tmp_path):
+        path = tmp_path / "jobs.csv"
+        path.write_text(
+            "output,languages,retry,overwrite,hedge_model\n"
+            "one,en fr,2,yes,\n"
+            '/abs/two,"es,de",5,false,gemini-3.7-pro\n',
+            encoding="utf-8",
+        )
+
+        jobs = batch.read_manifest(str(path))
+
+        assert jobs[0] == {
+            "output_directory": str(tmp_path / "one"),
+            "languages": ["en", "fr"],
+            "retry": 2,
+            "overwrite": True,
+        }
+        assert jobs[1]["output_directory"] == "/abs/two"
+        assert jobs[1]["languages"] == ["es", "de"]
+        assert jobs[1]["overwrite"] is False
+        assert jobs[1]["hedge_model"] == "gemini-3.7-pro"
+
+    def test_bad_rows_name_their_line(self, tmp_path):
+        missing = _write(tmp_path / "a.jsonl", [{"output": "one"}, {"url": "x"}])
+        unknown = _write(tmp_path / "b.jsonl", [{"output": "one", "colour": "red"}])
+        shared = _write(tmp_path / "c.jsonl", [{"output": "one"}, {"output": "./one"}])
+        batch_wide = _write(tmp_path / "d.jsonl", [{"output": "one", "max_requests": 2}])
+
+        with pytest.raises(ValueError, match=r"a.jsonl:2: every job needs an output"):
+            batch.read_manifest(missing)
+        with pytest.raises(ValueError, match=r"b.jsonl:1: 'colour'"):
+            batch.read_manifest(unknown)
+        with pytest.raises(ValueError, match=r"c.jsonl:2: .* also used on line 1"):
+            batch.read_manifest(shared)
+        with pytest.raises(ValueError, match=r"d.jsonl:1: 'max_requests'"):
+            batch.read_manifest(batch_wide)
+
+
+class TestJobConfig:
+    def test_job_settings_override_the_command_line(self):
+        base = Config(model="gemini-3.7-flash", languages=["en"], retry=3)
+
+        job = batch.job_config(base, {"model": "claude-sonnet-5", "retry": 1})
+
+        assert (job.model, job.resolved_provider, job.retry) == ("claude-sonnet-5", "anthropic", 1)
+        assert job.languages == ["en"]
+        assert base.model == "gemini-3.7-flash"
+
+    def test_explicit_provider_is_kept(self):
+        base = Config(model="google/gemini-2.5-flash", provider="openrouter")
+
+        job = batch.job_config(base, {"languages": ["fr"]})
+
+        assert job.resolved_provider == "openrouter"
+
+
+def test_jobs_run_in_turn_without_changing_directory(tmp_path, monkeypatch):
+    path = _write(
+        tmp_path / "jobs.jsonl",
+        [
+            {"output": "one", "languages": ["fr"]},
+            {"output": "two", "languages": ["de"]},
+            {"output": "three", "languages": ["es"]},
+        ],
+    )
+    monkeypatch.setattr(config, "languages", ["en"])
+    cwd = os.getcwd()
+    seen = []
+
+    def run_job():
+        seen.append((os.path.basename(config.output_directory), config.languages, os.getcwd()))
+        if config.languages == ["de"]:
+            raise RuntimeError("no audio")
+
+    monkeypatch.setattr(batch, "run_job", run_job)
+
+    assert batch.run_batch(path) == 1
+    assert seen == [("one", ["fr"], cwd), ("two", ["de"], cwd), ("three", ["es"], cwd)]
+    assert config.languages == ["en"]
+
+
+def test_parallel_jobs_each_see_their_own_settings(tmp_path, monkeypatch):
+    path = _write(
+        tmp_path / "jobs.jsonl",
+        [
+            {"output": "one", "model": "gpt-5.6-luna"},
+            {"output": "two", "model": "claude-sonnet-5"},
+        ],
+    )
+    both_running = threading.Barrier(2, timeout=5)
+    seen = {}
+
+    def run_job():
+        before = config.model
+        both_running.wait()
+        seen[os.path.basename(config.output_directory)] = (
+            before,
+            config.model,
+            config.resolved_provider,
+        )
+
+    monkeypatch.setattr(batch, "run_job", run_job)
+
+    assert batch.run_batch(path, parallel_jobs=2) == 0
+    assert seen == {
+        "one": ("gpt-5.6-luna", "gpt-5.6-luna", "openai"),
+        "two": ("claude-sonnet-5", "claude-sonnet-5", "anthropic"),
+    }
+
@@ -0,0 +1,322 @@
+"""
+Batch submission and collection, against a local stand-in for the batch APIs.
+"""
+
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from anthropic import AsyncAnthropic
+from google.genai import types
+from openai import AsyncOpenAI
+
+from sub_tools.config import config
+from sub_tools.intelligence import anthropic, batches, gemini, openai
+from sub_tools.main import run_job
+from sub_tools.subtitles.splice import render
+from sub_tools.subtitles.validator import parse_strict
+
+SOURCE = render([(t * 2.0, t * 2.0 + 1.5, f"Source {t}.") for t in range(6)])
+
+
+def _translate(prompt: str) -> str:
+    """
+    Answer a translation request the way a model would.
+    """
+    body = prompt.split("SRT to translate:\n\n", 1)[1].split("\n\nTranslate the", 1)[0]
+    return body.replace("Source", "Quelle" if "into French" in prompt else "Fuente")
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "\n\n".join(part["text"] for part in content if part.get("type") == "text")
+
+
+class BatchServer:
+    """
+    Just enough of the OpenAI Batch and Anthropic Message Batches APIs.
+
+    Batches are answered as soon as they are submitted, but report themselves
+    finished only once ``finish`` is called.
+    """
+
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self.finished = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload, content_type="application/json"):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reply(server.post(self.path, body))
+
+            def do_GET(self):
+                payload = server.get(self.path)
+                if isinstance(payload, bytes):
+                    self._reply(payload, "application/x-jsonl")
+                else:
+                    self._reply(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def finish(self):
+        self.finished = True
+
+    def post(self, path: str, body: bytes):
+        if path == "/v1/files":
+            lines = [line.strip(b"\r") for line in body.split(b"\n")]
+            requests = [json.loads(line) for line in lines if line.startswith(b'{"custom_id"')]
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = b"\n".join(
+                json.dumps(self._openai_answer(request)).encode() for request in requests
+            )
+            return {"id": file_id, "object": "file", "bytes": len(body), "created_at": 0,
+                    "filename": "requests.jsonl", "purpose": "batch", "status": "processed"}
+        if path == "/v1/batches":
+            request = json.loads(body)
+            batch_id = f"batch_{len(self.batches) + 1}"
+            self.batches[batch_id] = {"kind": "openai", "output": request["input_file_id"]}
+            return self._openai_batch(batch_id)
+        if path == "/v1/messages/batches":
+            requests = json.loads(body)["requests"]
+            batch_id = f"msgbatch_{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "kind": "anthropic",
+                "results": b"\n".join(
+                    json.dumps(self._anthropic_answer(request)).encode() for request in requests
+                ),
+            }
+            return self._anthropic_batch(batch_id)
+        raise AssertionError(path)
+
+    def get(self, path: str):
+        if match := re.fullmatch(r"/v1/batches/(\w+)", path):
+            return self._openai_batch(match[1])
+        if match := re.fullmatch(r"/v1/files/([\w-]+)/content", path):
+            return self.files[match[1]]
+        if match := re.fullmatch(r"/v1/messages/batches/(\w+)", path):
+            return self._anthropic_batch(match[1])
+        if match := re.fullmatch(r"/v1/messages/batches/(\w+)/results", path):
+            return self.batches[match[1]]["results"]
+        raise AssertionError(path)
+
+    def _openai_batch(self, batch_id: str) -> dict:
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": "file-in",
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": "completed" if self.finished else "in_progress",
+            "output_file_id": self.batches[batch_id]["output"] if self.finished else None,
+        }
+
+    def _openai_answer(self, request: dict) -> dict:
+        prompt = _text(request["body"]["messages"][1]["content"])
+        completion = {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request["body"]["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": _translate(prompt)},
+                }
+            ],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+        return {
+            "id": "req-1",
+            "custom_id": request["custom_id"],
+            "response": {"status_code": 200, "request_id": "r", "body": completion},
+        }
+
+    def _anthropic_batch(self, batch_id: str) -> dict:
+        counts = {"processing": 0, "succeeded": 1, "errored": 0, "canceled": 0, "expired": 0}
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if self.finished else "in_progress",
+            "request_counts": counts,
+            "created_at": "2026-01-01T00:00:00Z",
+            "expires_at": "2026-01-02T00:00:00Z",
+            "ended_at": None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results"
+            if self.finished
+            else None,
+        }
+
+    def _anthropic_answer(self, request: dict) -> dict:
+        params = request["params"]
+        message = {
+            "id": "msg_1",
+            "type": "message",
+            "role": "assistant",
+            "model": params["model"],
+            "content": [{"type": "text", "text": _translate(_text(params["messages"][0]["content"]))}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 50},
+        }
+        return {
+            "custom_id": request["custom_id"],
+            "result": {"type": "succeeded", "message": message},
+        }
+
+
+@pytest.fixture
+def server():
+    server = BatchServer()
+    yield server
+    server.httpd.shutdown()
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch, server):
+    monkeypatch.setattr(config, "output_directory", str(tmp_path / "job"))
+    (tmp_path / "job").mkdir()
+    (tmp_path / "job" / "en.srt").write_text(SOURCE, encoding="utf-8")
+    monkeypatch.setattr(config, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "tasks", ["translate"])
+    monkeypatch.setattr(config, "source_language", "en")
+    monkeypatch.setattr(config, "languages", ["fr", "es"])
+    monkeypatch.setattr(config, "stream", False)
+    monkeypatch.setattr(config, "provider", "openai")
+    monkeypatch.setattr(config, "model", "gpt-5.6")
+    monkeypatch.setattr(config, "openai_api_key", "test")
+    monkeypatch.setattr(config, "anthropic_api_key", "test")
+    monkeypatch.setattr(
+        openai,
+        "_new_client",
+        lambda: AsyncOpenAI(api_key="test", base_url=f"{server.url}/v1", max_retries=0),
+    )
+    monkeypatch.setattr(
+        anthropic,
+        "_new_client",
+        lambda: AsyncAnthropic(api_key="test", base_url=server.url, max_retries=0),
+    )
+    return tmp_path / "job"
+
+
+def _pending(job) -> list[dict]:
+    path = job / batches.BATCH_FILE
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+
+
+class TestOpenAIBatches:
+    def test_submit_then_collect(self, job, server, monkeypatch):
+        monkeypatch.setattr(config, "batch_submit", True)
+        run_job()
+
+        assert not (job / "fr.srt").exists()
+        [batch] = _pending(job)
+        assert batch["provider"] == "openai" and len(batch["keys"]) == 2
+
+        server.finish()
+        monkeypatch.setattr(config, "batch_submit", False)
+        monkeypatch.setattr(config, "batch_collect", True)
+        run_job()
+
+        assert _pending(job) == []
+        for code, word in (("fr", "Quelle"), ("es", "Fuente")):
+            cues, errors = parse_strict((job / f"{code}.srt").read_text(encoding="utf-8"))
+            assert not errors
+            assert [cue.text for cue in cues] == [f"{word} {t}." for t in range(6)]
+
+    def test_running_batch_is_not_sent_again(self, job, server, monkeypatch):
+        monkeypatch.setattr(config, "batch_submit", True)
+        run_job()
+        monkeypatch.setattr(config, "batch_submit", False)
+        monkeypatch.setattr(config, "batch_collect", True)
+        run_job()
+
+        assert len(server.batches) == 1
+        assert len(_pending(job)) == 1
+        assert not (job / "fr.srt").exists()
+
+    def test_batches_need_the_response_cache(self, job, monkeypatch):
+        monkeypatch.setattr(config, "batch_submit", True)
+        monkeypatch.setattr(config, "cache", False)
+
+        with pytest.raises(Exception, match="response cache"):
+            run_job()
+
+
+class TestAnthropicBatches:
+    def test_submit_then_collect(self, job, server, monkeypatch):
+        monkeypatch.setattr(config, "provider", "anthropic")
+        monkeypatch.setattr(config, "model", "claude-sonnet-5")
+        monkeypatch.setattr(config, "languages", ["fr"])
+        monkeypatch.setattr(config, "batch_submit", True)
+        run_job()
+        assert len(_pending(job)) == 1
+
+        server.finish()
+        monkeypatch.setattr(config, "batch_submit", False)
+        monkeypatch.setattr(config, "batch_collect", True)
+        run_job()
+
+        cues, errors = parse_strict((job / "fr.srt").read_text(encoding="utf-8"))
+        assert not errors
+        assert cues[0].text == "Quelle 0."
+        assert anthropic.usage["claude-sonnet-5"]["input_tokens"] >= 100
+
+
+class TestGeminiBatches:
+    def test_answers_are_matched_by_key(self, monkeypatch):
+        def answer(text):
+            return types.GenerateContentResponse(
+                candidates=[
+                    types.Candidate(
+                        content=types.Content(role="model", parts=[types.Part(text=text)])
+                    )
+                ]
+            )
+
+        job = types.BatchJob(
+            name="batches/1",
+            state=types.JobState.JOB_STATE_SUCCEEDED,
+            dest=types.BatchJobDestination(
+                inlined_responses=[
+                    types.InlinedResponse(response=answer("second"), metadata={"key": "b"}),
+                    types.InlinedResponse(response=answer("first"), metadata={"key": "a"}),
+                ]
+            ),
+        )
+
+        async def get(name):
+            return job
+
+        client = SimpleNamespace(aio=SimpleNamespace(batches=SimpleNamespace(get=get)))
+        monkeypatch.setattr(gemini, "_client", lambda: client)
+
+        answers = asyncio.run(gemini.collect_batch("gemini-3.7-flash", "batches/1", ["a", "b"]))
+
+        assert {key: reply for key, (reply, _) in answers.items()} == {
+            "a": "first",
+            "b": "second",
+        }
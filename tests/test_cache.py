@@ -0,0 +1,152 @@
+"""
+The response cache, tested against a temporary directory and a fake provider.
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import cache, pipeline
+from sub_tools.intelligence.accounting import capture, record
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_sizes", {})
+    monkeypatch.setattr(config, "cache", True)
+    monkeypatch.setattr(config, "cache_dir", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def key(**overrides):
+    fields = dict(
+        provider="gemini",
+        model="gemini-3.7-flash",
+        system_instruction="Transcribe.",
+        text="Audio follows.",
+        audio_hash="abc",
+        attempt=0,
+    )
+    fields.update(overrides)
+    return cache.request_key(**fields)
+
+
+class TestRequestKey:
+    def test_is_stable(self):
+        assert key() == key()
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            {"provider": "openrouter"},
+            {"model": "gemini-3.6-flash"},
+            {"system_instruction": "Translate."},
+            {"text": "Other text."},
+            {"audio_hash": "def"},
+            {"attempt": 1},
+        ],
+    )
+    def test_every_input_changes_the_key(self, change):
+        assert key(**change) != key()
+
+    def test_another_endpoint_changes_the_key(self, monkeypatch):
+        monkeypatch.setattr(config, "provider", "gemini")
+        default = key()
+        monkeypatch.setattr(config, "gemini_base_url", "http://127.0.0.1:8765")
+
+        assert key() != default
+
+
+class TestStore:
+    def test_round_trip(self, cache_dir):
+        cache.store(key(), "gemini-3.7-flash", "1\nreply", {"input_tokens": 10})
+
+        assert cache.load(key()) == "1\nreply"
+        assert cache.load(key(attempt=1)) is None
+
+    def test_eviction_removes_the_least_recently_used(self, cache_dir):
+        for attempt in range(3):
+            cache.store(key(attempt=attempt), "m", "x" * 1000, {})
+        old = time.time() - 100
+        for attempt in range(3):
+            path = cache._entry_path(key(attempt=attempt))
+            os.utime(path, (old + attempt, old + attempt))
+
+        cache.load(key(attempt=0))
+        cache.evict(max_bytes=2500)
+
+        assert cache.load(key(attempt=0)) is not None
+        assert cache.load(key(attempt=1)) is None
+        assert cache.load(key(attempt=2)) is not None
+
+    def test_directory_is_walked_only_once_it_is_full(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(config, "cache_max_mb", 3 / 1024)
+        walks = []
+        evict = cache.evict
+        monkeypatch.setattr(cache, "evict", lambda max_bytes: walks.append(1) or evict(max_bytes))
+
+        for attempt in range(2):
+            cache.store(key(attempt=attempt), "m", "x" * 1000, {})
+        assert len(walks) == 1
+        cache.store(key(attempt=2), "m", "x" * 1000, {})
+
+        assert len(walks) == 2
+        assert cache._sizes[str(cache_dir)] <= 3 * 1024
+        assert cache.load(key(attempt=2)) is not None
+
+
+def test_capture_collects_only_its_own_counts():
+    bucket = {"requests": 0, "input_tokens": 0}
+    record(bucket, requests=1)
+    with capture() as counts:
+        record(bucket, requests=1, input_tokens=5)
+
+    assert counts == {"requests": 1, "input_tokens": 5}
+    assert bucket == {"requests": 2, "input_tokens": 5}
+
+
+def test_nested_captures_both_collect_counts():
+    bucket = {"requests": 0}
+    with capture() as outer:
+        record(bucket, requests=1)
+        with capture() as inner:
+            record(bucket, requests=1)
+
+    assert inner == {"requests": 1}
+    assert outer == {"requests": 2}
+
+
+def test_pipeline_replays_cached_answers(cache_dir, monkeypatch):
+    calls = []
+
+    async def generate(
+        system_instruction,
+        text=None,
+        with_audio=True,
+        audio_file=None,
+        model=None,
+        watch=None,
+        context=None,
+    ):
+        calls.append(text)
+        return f"answer {len(calls)}"
+
+    provider = SimpleNamespace(generate=generate)
+    monkeypatch.setattr(pipeline, "get_provider", lambda: provider)
+
+    def ask(attempt):
+        return asyncio.run(
+            pipeline._ask(attempt, "en.srt", "Translate.", text="Hello", with_audio=False)
+        )
+
+    assert ask(0) == "answer 1"
+    assert ask(0) == "answer 1"
+    assert ask(1) == "answer 2"
+    assert len(calls) == 2
+
+    monkeypatch.setattr(config, "cache", False)
+    assert ask(0) == "answer 3"
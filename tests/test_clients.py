@@ -0,0 +1,94 @@
+"""
+Provider clients are reused within a run and closed at its end.
+"""
+
+import asyncio
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import anthropic, clients
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+
+async def _close(client):
+    client.closed = True
+
+
+@pytest.fixture
+def made(monkeypatch):
+    monkeypatch.setattr(clients, "_clients", {})
+    monkeypatch.setattr(config, "gemini_api_key", "one")
+    monkeypatch.setattr(config, "model", "gemini-3.7-flash")
+    made = []
+
+    def make():
+        made.append(FakeClient())
+        return made[-1]
+
+    return made, make
+
+
+class TestShared:
+    def test_same_client_for_the_same_provider_and_key(self, made):
+        made, make = made
+
+        async def run():
+            first = clients.shared("gemini", make, _close)
+            second = clients.shared("gemini", make, _close)
+            other_url = clients.shared("gemini", make, _close, base_url="http://127.0.0.1")
+            config.gemini_api_key = "two"
+            other_key = clients.shared("gemini", make, _close)
+            return first, second, other_url, other_key
+
+        first, second, other_url, other_key = clients.run(run())
+
+        assert first is second
+        assert len({id(first), id(other_url), id(other_key)}) == 3
+        assert all(client.closed for client in made)
+        assert clients._clients == {}
+
+    def test_each_run_gets_its_own_client(self, made):
+        made, make = made
+
+        async def run():
+            return clients.shared("gemini", make, _close)
+
+        assert clients.run(run()) is not clients.run(run())
+        assert len(made) == 2
+
+    def test_clients_are_closed_when_the_run_fails(self, made):
+        made, make = made
+
+        async def run():
+            clients.shared("gemini", make, _close)
+            raise RuntimeError("stage failed")
+
+        with pytest.raises(RuntimeError, match="stage failed"):
+            clients.run(run())
+        assert made[0].closed
+
+    def test_other_loops_keep_their_clients(self, made):
+        made, make = made
+
+        async def inner():
+            return clients.shared("gemini", make, _close)
+
+        outside = asyncio.run(inner())
+        clients.run(inner())
+
+        assert not outside.closed
+        assert len(clients._clients) == 1
+
+
+def test_anthropic_client_keeps_the_pool_limits(monkeypatch):
+    monkeypatch.setattr(config, "http_connections", 3)
+
+    pool = anthropic._new_client()._client._transport._pool
+
+    assert pool._max_connections == 3
+    assert pool._max_keepalive_connections == 3
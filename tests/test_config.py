@@ -1,8 +1,10 @@
 """
-Provider selection follows from the model name alone.
+Provider selection follows from the model name alone, for the job being run.
 """
 
-from sub_tools.config import Config
+import asyncio
+
+from sub_tools.config import Config, config, use_config
 
 
 class TestProviderInference:
@@ -80,3 +82,23 @@ class TestApiKeySelection:
 
         config.set_provider("openrouter")
         assert config.api_key == "r"
+
+
+class TestConfigContext:
+    def test_reads_and_writes_go_to_the_current_job(self):
+        job = Config(model="gpt-5.6-luna")
+        default_model, default_retry = config.model, config.retry
+
+        with use_config(job):
+            assert config.resolved_provider == "openai"
+            config.retry = default_retry + 4
+
+        assert job.retry == default_retry + 4
+        assert (config.model, config.retry) == (default_model, default_retry)
+
+    def test_threads_started_by_a_job_see_its_config(self):
+        async def model_in_thread():
+            return await asyncio.to_thread(lambda: config.model)
+
+        with use_config(Config(model="claude-sonnet-5")):
+            assert asyncio.run(model_in_thread()) == "claude-sonnet-5"
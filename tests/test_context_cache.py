@@ -0,0 +1,127 @@
+"""
+Provider-side caching of the context that translations into every language share.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from sub_tools.config import config
+from sub_tools.intelligence import anthropic, cache, gemini
+
+
+class FakeCaches:
+    def __init__(self, error=None):
+        self.error = error
+        self.created = []
+
+    async def create(self, model, config):
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setattr(gemini, "_cached_contexts", {})
+    monkeypatch.setattr(gemini, "_context_locks", {})
+    caches = FakeCaches()
+    return caches, SimpleNamespace(aio=SimpleNamespace(caches=caches))
+
+
+def _parts(text):
+    return [types.Part.from_text(text=text)]
+
+
+class TestGeminiCachedContext:
+    def test_languages_arriving_together_make_one_cache(self, caches):
+        caches, client = caches
+
+        def ask():
+            return gemini._cached_context(client, "m", "Translate.", _parts("SRT"), [])
+
+        async def run():
+            return await asyncio.gather(*(ask() for _ in range(5)))
+
+        names = asyncio.run(run())
+
+        assert names == ["cachedContents/1"] * 5
+        assert len(caches.created) == 1
+
+    def test_other_context_gets_its_own_cache(self, caches):
+        caches, client = caches
+
+        async def run():
+            first = await gemini._cached_context(client, "m", "Translate.", _parts("one"), [])
+            second = await gemini._cached_context(client, "m", "Translate.", _parts("two"), [])
+            return first, second
+
+        assert asyncio.run(run()) == ("cachedContents/1", "cachedContents/2")
+
+    def test_refused_context_is_sent_uncached_from_then_on(self, caches):
+        caches, client = caches
+        caches.error = genai_errors.ClientError(400, {"error": {"message": "too small"}})
+
+        async def run():
+            for _ in range(3):
+                assert await gemini._cached_context(client, "m", "T.", _parts("SRT"), []) is None
+
+        asyncio.run(run())
+
+        assert list(gemini._cached_contexts.values()) == [None]
+
+
+class TestAnthropicCacheControl:
+    def test_context_ends_in_a_breakpoint(self, monkeypatch):
+        monkeypatch.setattr(config, "context_cache", True)
+
+        content = anthropic._user_content("Into French.", "SRT")
+
+        assert content[0] == {
+            "type": "text",
+            "text": "SRT",
+            "cache_control": {"type": "ephemeral"},
+        }
+        assert content[1] == {"type": "text", "text": "Into French."}
+
+    def test_without_caching_the_context_is_plain_text(self, monkeypatch):
+        monkeypatch.setattr(config, "context_cache", False)
+
+        assert anthropic._user_content("Into French.", "SRT") == "SRT\n\nInto French."
+        assert anthropic._user_content("Hello", None) == "Hello"
+
+    def test_cached_tokens_count_as_input(self, monkeypatch):
+        monkeypatch.setattr(anthropic, "usage", {})
+        response = SimpleNamespace(
+            usage=SimpleNamespace(
+                input_tokens=10,
+                output_tokens=5,
+                cache_read_input_tokens=900,
+                cache_creation_input_tokens=0,
+            )
+        )
+
+        anthropic._record_usage("claude", response)
+
+        bucket = anthropic.usage["claude"]
+        assert bucket["input_tokens"] == 910
+        assert bucket["cached_input_tokens"] == 900
+
+
+def test_context_is_part_of_the_response_cache_key():
+    fields = dict(
+        provider="gemini",
+        model="m",
+        system_instruction="Translate.",
+        text="Into French.",
+        audio_hash=None,
+        attempt=0,
+    )
+
+    assert cache.request_key(**fields) == cache.request_key(**fields, context=None)
+    assert cache.request_key(**fields) != cache.request_key(**fields, context="SRT")
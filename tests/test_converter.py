@@ -1,3 +1,4 @@
+import subprocess
 import threading
 from functools import partial
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
@@ -6,7 +7,14 @@ from pathlib import Path
 import pytest
 
 from sub_tools.config import config
-from sub_tools.media.converter import download_from_url, video_to_audio
+from sub_tools.intelligence import openai
+from sub_tools.media.converter import (
+    audio_profile,
+    download_audio_from_url,
+    download_from_url,
+    video_to_audio,
+)
+from sub_tools.system import manifest
 
 # A two-second synthetic clip (ffmpeg testsrc + sine tone) checked into the
 # repository, so download tests never depend on a third-party file host. It is
@@ -37,6 +45,14 @@ def fixture_server():
         server.shutdown()
 
 
+@pytest.fixture(autouse=True)
+def job_directory(tmp_path, monkeypatch):
+    """
+    Give each test its own output directory, so job manifests never leak between them.
+    """
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+
+
 @pytest.fixture
 def video_url(fixture_server):
     return f"{fixture_server}/video.mp4"
@@ -137,3 +153,121 @@ class TestVideoToAudio:
 
         assert audio_file.read_text() == "existing audio content"
         assert audio_file.stat().st_mtime == original_mtime
+
+
+class TestDownloadAudioFromUrl:
+    """Integration tests for download_audio_from_url, which reads the URL only once."""
+
+    @pytest.fixture(autouse=True)
+    def files(self, tmp_path, monkeypatch, video_url):
+        monkeypatch.setattr(config, "url", video_url)
+        monkeypatch.setattr(config, "video_file", "video.mp4")
+        monkeypatch.setattr(config, "audio_file", "audio.mp3")
+        monkeypatch.setattr(config, "overwrite", False)
+
+    def test_writes_only_the_audio(self, tmp_path):
+        download_audio_from_url()
+
+        assert (tmp_path / "audio.mp3").stat().st_size > 0
+        assert not (tmp_path / "video.mp4").exists()
+
+    def test_keeps_the_video_when_asked(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "keep_video", True)
+
+        download_audio_from_url()
+
+        assert (tmp_path / "audio.mp3").stat().st_size > 0
+        assert (tmp_path / "video.mp4").stat().st_size > 0
+
+    def test_skips_a_finished_download(self, tmp_path):
+        download_audio_from_url()
+        original_mtime = (tmp_path / "audio.mp3").stat().st_mtime_ns
+
+        download_audio_from_url()
+
+        assert (tmp_path / "audio.mp3").stat().st_mtime_ns == original_mtime
+
+
+def _stream_summary(path) -> str:
+    cmd = ["ffmpeg", "-hide_banner", "-i", str(path)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return next(line for line in result.stderr.splitlines() if "Audio:" in line)
+
+
+class TestAudioProfile:
+    """The audio profile picked at extraction, and how requests reuse it."""
+
+    @pytest.fixture(autouse=True)
+    def files(self, tmp_path, monkeypatch, video_url):
+        monkeypatch.setattr(config, "url", video_url)
+        monkeypatch.setattr(config, "audio_file", "audio.mp3")
+        monkeypatch.setattr(config, "overwrite", False)
+        monkeypatch.setattr(config, "keep_video", False)
+
+    def test_speech_profile_is_mono_16_khz(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "speech")
+
+        download_audio_from_url()
+
+        summary = _stream_summary(tmp_path / "audio.mp3")
+        assert "16000 Hz, mono" in summary
+        assert audio_profile() == "speech"
+
+    def test_opus_profile_writes_ogg(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "opus")
+        monkeypatch.setattr(config, "audio_file", "audio.ogg")
+
+        download_audio_from_url()
+
+        assert "opus" in _stream_summary(tmp_path / "audio.ogg")
+
+    def test_opus_profile_refuses_an_mp3_name(self, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "opus")
+
+        with pytest.raises(RuntimeError, match="--audio-file"):
+            download_audio_from_url()
+
+    def test_changing_the_profile_makes_the_audio_again(self, tmp_path, monkeypatch):
+        download_audio_from_url()
+        assert audio_profile() == "full"
+        # A later run, which reads the manifest this one left.
+        monkeypatch.setattr(manifest, "_manifests", {})
+        monkeypatch.setattr(config, "audio_profile", "speech")
+
+        download_audio_from_url()
+
+        assert audio_profile() == "speech"
+        assert "mono" in _stream_summary(tmp_path / "audio.mp3")
+
+    def test_openai_does_not_compress_speech_audio_again(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "speech")
+        monkeypatch.setattr(openai, "_send_files", {})
+        monkeypatch.setattr(openai, "MAX_FILE_BYTES", 0)
+        download_audio_from_url()
+
+        def compress(path):
+            raise AssertionError("compressed again")
+
+        monkeypatch.setattr(openai, "_compress", compress)
+        with pytest.raises(RuntimeError, match="too large .* in its speech audio profile"):
+            openai._send_file(str(tmp_path / "audio.mp3"))
+
+    def test_openai_gets_an_mp3_of_opus_audio(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "opus")
+        monkeypatch.setattr(config, "audio_file", "audio.ogg")
+        monkeypatch.setattr(openai, "_send_files", {})
+        download_audio_from_url()
+
+        send_path, extension = openai._send_file(str(tmp_path / "audio.ogg"))
+
+        assert extension == "mp3"
+        assert send_path.endswith(".mp3")
+
+    def test_openai_transcribes_opus_audio_as_it_is(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "audio_profile", "opus")
+        monkeypatch.setattr(config, "audio_file", "audio.ogg")
+        monkeypatch.setattr(openai, "_send_files", {})
+        download_audio_from_url()
+        path = str(tmp_path / "audio.ogg")
+
+        assert openai._send_file(path, openai.TRANSCRIPTION_FORMATS) == (path, "ogg")
@@ -19,3 +19,9 @@ class TestEnsureOutputDirectory:
         os.makedirs(output_path)
         ensure_output_directory(str(output_path))  # Should not raise
         assert output_path.exists()
+
+    def test_does_not_change_directory(self, tmp_path):
+        """Test that jobs find their files through the path, not the working directory."""
+        cwd = os.getcwd()
+        ensure_output_directory(str(tmp_path / "output"))
+        assert os.getcwd() == cwd
@@ -0,0 +1,216 @@
+"""
+Requests fail over along a chain of routes while a provider is down.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from sub_tools.config import config, split_route
+from sub_tools.intelligence import failover, pipeline
+from sub_tools.intelligence.failover import Health, Route
+
+
+class Overloaded(Exception):
+    status_code = 503
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(failover, "_health", {})
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """
+    Fake gemini, openrouter and anthropic modules that log each request as
+    (provider, model, retry) and answer or fail as told.
+    """
+    monkeypatch.setattr(config, "provider", "gemini")
+    monkeypatch.setattr(config, "model", "gemini-3.7-flash")
+    monkeypatch.setattr(
+        config, "fallbacks", ["openrouter:google/gemini-3.7-flash", "anthropic:claude-sonnet-5"]
+    )
+    monkeypatch.setattr(config, "retry", 3)
+    log = []
+    failing: dict[str, Exception] = {}
+
+    def module(name, hears=True):
+        async def generate(
+            system_instruction,
+            text=None,
+            with_audio=True,
+            audio_file=None,
+            model=None,
+            watch=None,
+            context=None,
+        ):
+            log.append((config.resolved_provider, model, config.retry))
+            if name in failing:
+                raise failing[name]
+            return f"answer from {name}"
+
+        return SimpleNamespace(generate=generate, accepts_audio=lambda model=None: hears)
+
+    modules = {
+        "gemini": module("gemini"),
+        "openrouter": module("openrouter"),
+        "anthropic": module("anthropic", hears=False),
+    }
+    monkeypatch.setattr(pipeline, "provider_module", lambda name: modules[name])
+    monkeypatch.setattr(pipeline, "get_provider", lambda: modules[config.resolved_provider])
+    return log, failing
+
+
+def _generate(with_audio=False):
+    return asyncio.run(pipeline._generate("Translate.", "text", with_audio, None, config.model))
+
+
+class TestRoutes:
+    def test_split_keeps_colons_in_the_model(self):
+        assert split_route("openrouter:google/gemini-2.5-flash:free") == (
+            "openrouter",
+            "google/gemini-2.5-flash:free",
+        )
+
+    def test_split_rejects_a_bare_model(self):
+        with pytest.raises(ValueError):
+            split_route("gpt-5.6")
+
+    def test_outage_errors(self):
+        assert failover.is_outage(Overloaded())
+        assert failover.is_outage(ConnectionResetError())
+        assert not failover.is_outage(ValueError("bad request"))
+
+
+class TestHealth:
+    def test_repeated_failures_degrade_a_route(self):
+        health = Health()
+        health.failed()
+        assert not health.degraded
+        health.failed()
+
+        assert health.degraded
+        assert not health.admit()
+
+    def test_one_probe_at_a_time_once_due(self, monkeypatch):
+        monkeypatch.setattr(failover, "PROBE_SECONDS", 0)
+        health = Health()
+        health.failed()
+        health.failed()
+
+        assert health.admit()
+        assert not health.admit()
+
+        health.succeeded(False, 1.0)
+        assert not health.degraded
+        assert health.admit()
+
+    def test_failed_probe_waits_longer(self):
+        health = Health()
+        health.failed()
+        health.failed()
+        health.probe_at = 0
+
+        assert health.admit()
+        health.failed()
+
+        assert health.degraded
+        assert health.probe_interval == 2 * failover.PROBE_SECONDS
+        assert not health.admit()
+
+    def test_slow_answers_degrade_a_route(self):
+        health = Health()
+        for _ in range(20):
+            health.succeeded(False, 1.0)
+        assert not health.degraded
+
+        for _ in range(5):
+            health.succeeded(False, 10.0)
+
+        assert health.degraded
+
+    def test_latency_is_judged_per_kind_of_request(self):
+        health = Health()
+        for _ in range(20):
+            health.succeeded(False, 1.0)
+            health.succeeded(True, 30.0)
+
+        assert not health.degraded
+
+
+class TestGenerate:
+    def test_no_fallbacks_sends_as_before(self, providers, monkeypatch):
+        log, failing = providers
+        monkeypatch.setattr(config, "fallbacks", [])
+        failing["gemini"] = Overloaded()
+
+        with pytest.raises(Overloaded):
+            _generate()
+
+        assert log == [("gemini", "gemini-3.7-flash", 3)]
+
+    def test_overloaded_provider_hands_over_at_once(self, providers):
+        log, failing = providers
+        failing["gemini"] = Overloaded()
+
+        assert _generate() == "answer from openrouter"
+        assert log == [
+            ("gemini", "gemini-3.7-flash", 1),
+            ("openrouter", "google/gemini-3.7-flash", 1),
+        ]
+
+    def test_last_route_keeps_its_retries(self, providers):
+        log, failing = providers
+        failing["gemini"] = failing["openrouter"] = Overloaded()
+
+        assert _generate() == "answer from anthropic"
+        assert log[-1] == ("anthropic", "claude-sonnet-5", 3)
+
+    def test_retries_go_to_the_last_healthy_route(self, providers):
+        log, failing = providers
+        failing["gemini"] = failing["openrouter"] = Overloaded()
+        anthropic = failover.health(Route("anthropic", "claude-sonnet-5"))
+        anthropic.probe_at = float("inf")
+
+        with pytest.raises(Overloaded):
+            _generate()
+
+        assert log == [
+            ("gemini", "gemini-3.7-flash", 1),
+            ("openrouter", "google/gemini-3.7-flash", 3),
+        ]
+
+    def test_degraded_route_is_skipped_until_probed(self, providers):
+        log, failing = providers
+        failing["gemini"] = Overloaded()
+        _generate()
+        _generate()
+        log.clear()
+        del failing["gemini"]
+
+        assert _generate() == "answer from openrouter"
+        assert log == [("openrouter", "google/gemini-3.7-flash", 1)]
+
+        failover.health(Route("gemini", "gemini-3.7-flash")).probe_at = 0
+        assert _generate() == "answer from gemini"
+        assert not failover.health(Route("gemini", "gemini-3.7-flash")).degraded
+
+    def test_bad_request_is_not_failed_over(self, providers):
+        log, failing = providers
+        failing["gemini"] = ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            _generate()
+
+        assert len(log) == 1
+
+    def test_audio_skips_routes_that_cannot_hear(self, providers):
+        log, failing = providers
+        failing["gemini"] = failing["openrouter"] = Overloaded()
+
+        with pytest.raises(Overloaded):
+            _generate(with_audio=True)
+
+        assert [provider for provider, _, _ in log] == ["gemini", "openrouter"]
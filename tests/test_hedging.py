@@ -0,0 +1,94 @@
+"""
+Hedged requests, raced with sleeps instead of a provider.
+"""
+
+import asyncio
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import hedging
+
+
+@pytest.fixture(autouse=True)
+def fresh_history(monkeypatch):
+    monkeypatch.setattr(hedging, "_latencies", {})
+    monkeypatch.setattr(config, "hedge_percentile", 90)
+
+
+def _answer(reply, seconds, log=None):
+    async def answer():
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"cancelled {reply}")
+            raise
+        return reply
+
+    return answer
+
+
+class TestHedgeDelay:
+    def test_waits_for_enough_history(self):
+        for seconds in range(hedging.MIN_SAMPLES - 1):
+            hedging.observe("m", True, float(seconds))
+
+        assert hedging.hedge_delay("m", True) is None
+
+    def test_uses_the_percentile_of_recent_latencies(self):
+        for seconds in range(1, 11):
+            hedging.observe("m", True, float(seconds))
+
+        assert hedging.hedge_delay("m", True) == 10.0
+        assert hedging.hedge_delay("m", False) is None
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.setattr(config, "hedge_percentile", 0)
+        for seconds in range(10):
+            hedging.observe("m", True, float(seconds))
+
+        assert hedging.hedge_delay("m", True) is None
+
+
+class TestRace:
+    def test_fast_answer_is_not_hedged(self):
+        started = []
+        reply = asyncio.run(
+            hedging.race(
+                _answer("primary", 0),
+                _answer("backup", 0),
+                delay=1.0,
+                accept=lambda reply: True,
+                hedged=lambda: started.append(True),
+            )
+        )
+
+        assert reply == "primary"
+        assert not started
+
+    def test_stalled_request_loses_to_the_backup(self):
+        log = []
+        reply = asyncio.run(
+            hedging.race(
+                _answer("primary", 5.0, log),
+                _answer("backup", 0),
+                delay=0.01,
+                accept=lambda reply: True,
+            )
+        )
+
+        assert reply == "backup"
+        assert log == ["cancelled primary"]
+
+    def test_rejected_answer_waits_for_the_other(self):
+        reply = asyncio.run(
+            hedging.race(
+                _answer("primary", 0.1),
+                _answer("garbled", 0),
+                delay=0.01,
+                accept=lambda reply: reply != "garbled",
+            )
+        )
+
+        assert reply == "primary"
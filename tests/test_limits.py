@@ -0,0 +1,214 @@
+"""
+The limits on provider requests in flight: the process-wide one and the
+adaptive one per model.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sub_tools.intelligence import limits
+from sub_tools.intelligence.limits import AdaptiveLimit, RequestLimit
+
+
+async def _hold(limit, active, peak, seconds=0.01):
+    await limit.acquire()
+    try:
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(seconds)
+        active[0] -= 1
+    finally:
+        limit.release()
+
+
+class TestRequestLimit:
+    def test_caps_requests_on_one_loop(self):
+        limit = RequestLimit(3)
+        active, peak = [0], [0]
+
+        async def run():
+            await asyncio.gather(*(_hold(limit, active, peak) for _ in range(12)))
+
+        asyncio.run(run())
+
+        assert peak[0] == 3
+        assert limit.active == 0
+
+    def test_caps_requests_across_threads(self):
+        limit = RequestLimit(2)
+        lock = threading.Lock()
+        counts = {"active": 0, "peak": 0}
+
+        async def request():
+            await limit.acquire()
+            try:
+                with lock:
+                    counts["active"] += 1
+                    counts["peak"] = max(counts["peak"], counts["active"])
+                await asyncio.sleep(0.01)
+                with lock:
+                    counts["active"] -= 1
+            finally:
+                limit.release()
+
+        def job():
+            async def run():
+                await asyncio.gather(*(request() for _ in range(5)))
+
+            asyncio.run(run())
+
+        threads = [threading.Thread(target=job) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counts["peak"] == 2
+        assert limit.active == 0
+
+    def test_cancelled_waiters_do_not_keep_slots(self):
+        limit = RequestLimit(1)
+
+        async def run():
+            await limit.acquire()
+            waiter = asyncio.create_task(limit.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            limit.release()
+            await asyncio.wait_for(limit.acquire(), timeout=1)
+            limit.release()
+
+        asyncio.run(run())
+
+        assert limit.active == 0
+
+    def test_slot_handed_to_a_cancelled_waiter_is_passed_on(self):
+        limit = RequestLimit(1)
+
+        async def run():
+            await limit.acquire()
+            waiter = asyncio.create_task(limit.acquire())
+            await asyncio.sleep(0)
+            limit.release()
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            await asyncio.wait_for(limit.acquire(), timeout=1)
+            limit.release()
+
+        asyncio.run(run())
+
+        assert limit.active == 0
+
+
+def test_zero_removes_the_limit(monkeypatch):
+    monkeypatch.setattr(limits.config, "max_requests", 0)
+    monkeypatch.setattr(limits, "_limit", RequestLimit(1))
+
+    async def run():
+        async with limits.request_slot():
+            async with limits.request_slot():
+                return limits._limit.active
+
+    assert asyncio.run(run()) == 0
+
+
+class Throttled(Exception):
+    """An overload error carrying a response, as the SDKs raise them."""
+
+    def __init__(self, status=429, headers=None):
+        super().__init__(f"Error code: {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class TestAdaptiveLimit:
+    def test_grows_by_about_one_per_window_of_successes(self):
+        limit = AdaptiveLimit(ceiling=16)
+        assert limit.window == limits.INITIAL_WINDOW
+
+        for _ in range(limits.INITIAL_WINDOW + 1):
+            limit.succeeded()
+
+        assert int(limit.window) == limits.INITIAL_WINDOW + 1
+
+    def test_never_grows_past_the_ceiling(self):
+        limit = AdaptiveLimit(ceiling=2)
+        for _ in range(50):
+            limit.succeeded()
+
+        assert limit.window == 2
+
+    def test_halves_once_per_round_of_refusals(self):
+        limit = AdaptiveLimit(ceiling=16)
+        limit.window = 8.0
+
+        limit.throttled(epoch=0)
+        limit.throttled(epoch=0)  # sent before the first halving
+        assert limit.window == 4
+
+        limit.throttled(epoch=1)
+        assert limit.window == 2
+
+    def test_retry_after_holds_back_new_requests(self):
+        limit = AdaptiveLimit(ceiling=4)
+        limit.throttled(epoch=0, retry_after=0.05)
+
+        async def run():
+            started = time.monotonic()
+            await limit.acquire()
+            limit.release()
+            return time.monotonic() - started
+
+        assert asyncio.run(run()) >= 0.04
+
+    def test_model_slot_feeds_back_outcomes(self, monkeypatch):
+        monkeypatch.setattr(limits, "_adaptive", {})
+
+        async def run():
+            async with limits.model_slot("model-a"):
+                pass
+            with pytest.raises(Throttled):
+                async with limits.model_slot("model-a"):
+                    raise Throttled(503)
+            with pytest.raises(ValueError):
+                async with limits.model_slot("model-a"):
+                    raise ValueError("bad request")
+
+        asyncio.run(run())
+
+        limit = limits._adaptive[(limits.config.resolved_provider, "model-a")]
+        assert limit.window == (limits.INITIAL_WINDOW + 1 / limits.INITIAL_WINDOW) / 2
+        assert limit.active == 0
+
+
+class TestThrottleErrors:
+    def test_overload_is_recognised(self):
+        assert limits.is_throttled(Throttled(429))
+        assert limits.is_throttled(Throttled(503))
+        assert limits.is_throttled(RuntimeError("503 UNAVAILABLE"))
+        assert not limits.is_throttled(Throttled(400))
+        assert not limits.is_throttled(RuntimeError("subtitle 1503 is empty"))
+
+    def test_retry_after_in_seconds_milliseconds_or_a_date(self):
+        assert limits.retry_after(Throttled(headers={"retry-after": "7"})) == 7
+        assert limits.retry_after(Throttled(headers={"retry-after-ms": "1500"})) == 1.5
+        assert limits.retry_after(Throttled(headers={"retry-after": "86400"})) == (
+            limits.MAX_RETRY_AFTER
+        )
+        date = "Thu, 01 Jan 1970 00:00:00 GMT"
+        assert limits.retry_after(Throttled(headers={"retry-after": date})) == 0
+        assert limits.retry_after(Throttled()) is None
+
+    def test_retries_wait_a_random_share_of_the_backoff(self):
+        delays = {limits.retry_delay(RuntimeError("boom"), attempt=1) for _ in range(20)}
+
+        assert all(5 <= delay <= 10 for delay in delays)
+        assert len(delays) > 1
+        assert limits.retry_delay(Throttled(headers={"retry-after": "3"}), 0) >= 3
@@ -0,0 +1,120 @@
+"""
+The job manifest, in a temporary output directory.
+"""
+
+import json
+import os
+import stat
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence.accounting import record
+from sub_tools.system import manifest
+from sub_tools.system.file import should_skip
+
+
+@pytest.fixture(autouse=True)
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+    monkeypatch.setattr(manifest, "_manifests", {})
+    monkeypatch.setattr(config, "overwrite", False)
+    return tmp_path
+
+
+def _reload(monkeypatch):
+    """Start over as a new run would, reading the manifest from disk."""
+    monkeypatch.setattr(manifest, "_manifests", {})
+
+
+class TestFinished:
+    def test_recorded_file_is_finished(self, job):
+        (job / "en.srt").write_text("subtitles")
+        manifest.record_output("en.srt", {"model": "a"})
+
+        assert manifest.finished("en.srt", {"model": "a"})
+
+    def test_changed_contents_or_inputs_are_not(self, job):
+        (job / "en.srt").write_text("subtitles")
+        manifest.record_output("en.srt", {"model": "a"})
+
+        assert not manifest.finished("en.srt", {"model": "b"})
+        (job / "en.srt").write_text("subtit")
+        assert not manifest.finished("en.srt", {"model": "a"})
+
+
+class TestShouldSkip:
+    def test_trusts_files_from_before_manifests(self, job, monkeypatch):
+        (job / "audio.mp3").write_text("old audio")
+
+        assert should_skip("audio.mp3", {"video": None})
+        _reload(monkeypatch)
+        assert manifest.finished("audio.mp3", {"video": None})
+
+    def test_remakes_a_file_the_manifest_does_not_know(self, job, monkeypatch):
+        with manifest.stage("audio"):
+            pass
+        _reload(monkeypatch)
+        (job / "audio.mp3").write_text("cut off mid-encode")
+
+        assert not should_skip("audio.mp3")
+
+    def test_remakes_a_file_whose_inputs_changed(self, job, monkeypatch):
+        (job / "fr.srt").write_text("traduction")
+        manifest.record_output("fr.srt", {"source": "abc"})
+        _reload(monkeypatch)
+
+        assert should_skip("fr.srt", {"source": "abc"})
+        assert not should_skip("fr.srt", {"source": "def"})
+
+    def test_keeps_a_file_edited_by_hand(self, job, monkeypatch):
+        (job / "en.srt").write_text("subtitles")
+        manifest.record_output("en.srt", {"model": "a"})
+        _reload(monkeypatch)
+        (job / "en.srt").write_text("subtitles, corrected")
+
+        assert should_skip("en.srt", {"model": "a"})
+        assert (job / "en.srt").read_text() == "subtitles, corrected"
+        assert not should_skip("en.srt", {"model": "b"})
+
+    def test_overwrite_always_remakes(self, job, monkeypatch):
+        (job / "fr.srt").write_text("traduction")
+        manifest.record_output("fr.srt")
+        monkeypatch.setattr(config, "overwrite", True)
+
+        assert not should_skip("fr.srt")
+
+
+def test_stage_records_timing_usage_and_outputs(job):
+    bucket = {"requests": 0, "output_tokens": 0}
+    with manifest.stage("translate"):
+        record(bucket, requests=2, output_tokens=40)
+        (job / "fr.srt").write_text("traduction")
+        manifest.record_output("fr.srt", {"source": "abc"})
+
+    saved = json.loads((job / manifest.MANIFEST).read_text())
+    stage = saved["stages"]["translate"]
+    assert stage["finished"] is True
+    assert stage["seconds"] >= 0
+    assert stage["usage"] == {"requests": 2, "output_tokens": 40}
+    assert stage["outputs"] == {"fr.srt": saved["outputs"]["fr.srt"]["hash"]}
+
+
+def test_interrupted_stage_is_saved_unfinished(job):
+    with pytest.raises(KeyboardInterrupt):
+        with manifest.stage("dub"):
+            raise KeyboardInterrupt
+
+    saved = json.loads((job / manifest.MANIFEST).read_text())
+    assert saved["stages"]["dub"]["finished"] is False
+
+
+def test_manifest_follows_the_umask(job):
+    umask = os.umask(0o022)
+    try:
+        with manifest.stage("audio"):
+            pass
+    finally:
+        os.umask(umask)
+
+    assert stat.S_IMODE(os.stat(job / manifest.MANIFEST).st_mode) == 0o644
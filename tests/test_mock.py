@@ -0,0 +1,193 @@
+"""
+The provider stand-in answers the real SDKs, slowly or not at all when told to.
+"""
+
+import asyncio
+import json
+import random
+import wave
+
+import openai as openai_sdk
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import anthropic, gemini, openai, openrouter
+from sub_tools.mock import Behavior, Latency, MockServer, Recordings, replies, server
+from sub_tools.subtitles.validator import parse_strict
+from sub_tools.system.language import get_language_name
+
+SOURCE = (
+    "1\n00:00:00,000 --> 00:00:01,500\nHello there.\n\n"
+    "2\n00:00:02,000 --> 00:00:03,000\nGoodbye.\n"
+)
+
+TRANSCRIBE = "You will receive an audio file in English.\nReply with the SRT text now."
+
+
+def translate_task(target: str) -> str:
+    return (
+        f"English SRT to translate:\n\n{SOURCE}\n\n"
+        f"Translate the English subtitles above into {target}. "
+        f"Reply with the translated SRT text in {target} now."
+    )
+
+
+@pytest.fixture
+def mock(tmp_path, monkeypatch):
+    """
+    A running stand-in with every provider pointed at it and a recording that
+    measures seven seconds.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(server, "audio_duration", lambda path: 7.0)
+    monkeypatch.setattr(gemini, "_uploaded_files", {})
+    monkeypatch.setattr(openai, "_send_files", {})
+    with wave.open(str(tmp_path / "audio.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(bytes(2 * 8000))
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+    monkeypatch.setattr(config, "audio_file", "audio.wav")
+    monkeypatch.setattr(config, "retry", 1)
+
+    with MockServer() as stand_in:
+        for provider, url in stand_in.base_urls().items():
+            monkeypatch.setattr(config, f"{provider}_api_key", "test")
+            monkeypatch.setattr(config, f"{provider}_base_url", url)
+        yield stand_in
+
+
+def _use(monkeypatch, provider: str, model: str) -> None:
+    monkeypatch.setattr(config, "provider", provider)
+    monkeypatch.setattr(config, "model", model)
+
+
+def _cues(reply: str) -> list:
+    cues, errors = parse_strict(reply)
+    assert not errors
+    return cues
+
+
+class TestLatency:
+    @pytest.mark.parametrize(
+        "spec",
+        ["0.5", "uniform:0.1:0.3", "normal:1:0.2", "lognormal:1:0.5", "exponential:2"],
+    )
+    def test_delays_are_never_negative(self, spec):
+        latency = Latency.parse(spec)
+        rng = random.Random(1)
+
+        assert all(latency.sample(rng) >= 0 for _ in range(100))
+
+    @pytest.mark.parametrize("spec", ["slow", "uniform:1", "gamma:1:2"])
+    def test_rejects_what_it_cannot_read(self, spec):
+        with pytest.raises(ValueError):
+            Latency.parse(spec)
+
+
+class TestReplies:
+    def test_transcription_spans_the_audio(self):
+        cues = _cues(replies.transcribe("en", 10.0, Recordings()))
+
+        assert len(cues) == 3
+        assert cues[-1].end <= 10.0
+
+    def test_translation_keeps_timings_and_takes_the_target_script(self):
+        reply = replies.answer("Translate.", translate_task("Russian"), None, Recordings())
+
+        cues = _cues(reply)
+        assert [(cue.start, cue.end) for cue in cues] == [(0.0, 1.5), (2.0, 3.0)]
+        assert "субтитры" in cues[0].text
+
+    def test_combined_translation_answers_every_key(self):
+        system = 'Output ONLY a JSON object with the keys "fr", "ja". The value is SRT.'
+
+        answer = json.loads(
+            replies.answer(system, f"English SRT to translate:\n\n{SOURCE}", None, Recordings())
+        )
+
+        assert set(answer) == {"fr", "ja"}
+        assert _cues(answer["fr"])[0].text == "Hello there."
+        assert "字幕" in _cues(answer["ja"])[0].text
+
+    def test_recorded_subtitles_supply_the_text(self, tmp_path):
+        (tmp_path / "fr.srt").write_text(
+            "1\n00:00:00,000 --> 00:00:01,000\nBonjour.\n", encoding="utf-8"
+        )
+
+        reply = replies.answer("", translate_task("French"), None, Recordings(str(tmp_path)))
+
+        assert [cue.text for cue in _cues(reply)] == ["Bonjour.", "Goodbye."]
+
+
+class TestProviders:
+    @pytest.mark.parametrize(
+        "module, provider, model",
+        [
+            (gemini, "gemini", "gemini-2.5-flash"),
+            (openai, "openai", "gpt-audio-1.5"),
+            (openrouter, "openrouter", "google/gemini-2.5-flash"),
+        ],
+    )
+    @pytest.mark.parametrize("streamed", [False, True])
+    def test_transcription_follows_the_audio(
+        self, mock, monkeypatch, module, provider, model, streamed
+    ):
+        _use(monkeypatch, provider, model)
+        pieces = []
+        watch = (lambda: pieces.append) if streamed else None
+
+        reply = asyncio.run(module.generate(TRANSCRIBE, "Transcribe.", watch=watch))
+
+        assert [cue.end for cue in _cues(reply)] == [2.4, 5.4]
+        assert "".join(pieces) == (reply if streamed else "")
+
+    @pytest.mark.parametrize("streamed", [False, True])
+    def test_anthropic_translates(self, mock, monkeypatch, streamed):
+        _use(monkeypatch, "anthropic", "claude-sonnet-5")
+        watch = (lambda: (lambda piece: None)) if streamed else None
+
+        task = translate_task(get_language_name("el"))
+
+        reply = asyncio.run(anthropic.generate("Translate.", task, with_audio=False, watch=watch))
+
+        assert "υπότιτλοι" in _cues(reply)[0].text
+
+    def test_speech_is_in_the_dubbers_format(self, mock, monkeypatch):
+        _use(monkeypatch, "gemini", "gemini-2.5-flash")
+
+        audio = asyncio.run(gemini.speak("Fifteen letters", "en"))
+
+        assert audio == replies.speech("Fifteen letters")
+
+    def test_uploads_are_served_back(self, mock, monkeypatch):
+        _use(monkeypatch, "gemini", "gemini-2.5-flash")
+
+        file = gemini.prepare_audio()
+
+        assert gemini._client().files.get(name=file.name).state.name == "ACTIVE"
+
+
+class TestRefusals:
+    def test_injected_errors_reach_the_client(self, mock, monkeypatch):
+        mock.behavior = Behavior(errors={429: 1.0}, retry_after=2)
+        _use(monkeypatch, "openai", "gpt-5.6")
+
+        with pytest.raises(openai_sdk.RateLimitError) as refused:
+            asyncio.run(openai.generate("Translate.", translate_task("French"), with_audio=False))
+
+        assert refused.value.response.headers["Retry-After"] == "2"
+        assert mock.counts == {("openai chat", 429): 1}
+
+    def test_refusals_repeat_with_the_seed(self):
+        def refusals(seed):
+            stand_in = MockServer(Behavior(errors={503: 0.5}, seed=seed))
+            try:
+                draws = [stand_in.draw(b"request", "/v1/chat/completions") for _ in range(20)]
+                return [rng.random() < 0.5 for rng in draws]
+            finally:
+                stand_in.stop()
+
+        assert refusals(7) == refusals(7)
+        assert refusals(7) != refusals(8)
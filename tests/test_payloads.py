@@ -0,0 +1,123 @@
+"""
+Audio is base64-encoded into request bodies as they are sent, not held in memory.
+"""
+
+import asyncio
+import base64
+import io
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from sub_tools.config import config
+from sub_tools.intelligence import openai, payloads
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    # Small chunks, so even a short file is encoded in several pieces.
+    monkeypatch.setattr(payloads, "CHUNK_BYTES", 6)
+    path = tmp_path / "audio.mp3"
+    path.write_bytes(bytes(range(256)) * 3 + b"end")
+    return path
+
+
+def _completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-audio-1.5",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+class TestEncode:
+    @pytest.mark.parametrize("size", [0, 1, 5, 6, 7, 800])
+    def test_matches_encoding_the_whole_file(self, tmp_path, monkeypatch, size):
+        monkeypatch.setattr(payloads, "CHUNK_BYTES", 6)
+        path = tmp_path / "audio.mp3"
+        path.write_bytes(bytes(i % 251 for i in range(size)))
+
+        encoded = b"".join(payloads.encode(str(path)))
+
+        assert encoded == base64.b64encode(path.read_bytes())
+        assert len(encoded) == payloads.encoded_length(size)
+
+
+class TestInline:
+    def test_placeholder_is_filled_in_as_the_body_is_sent(self, audio):
+        body = {"audio": payloads.placeholder(str(audio)), "text": "Transcribe."}
+        request = httpx.Request("POST", "https://example.com", json=body)
+
+        inlined = payloads.inline(request)
+        sent = b"".join(asyncio.run(_read(inlined)))
+
+        assert json.loads(sent) == {
+            "audio": base64.b64encode(audio.read_bytes()).decode("ascii"),
+            "text": "Transcribe.",
+        }
+        assert int(inlined.headers["Content-Length"]) == len(sent)
+        assert "Transfer-Encoding" not in inlined.headers
+
+    def test_request_without_placeholder_is_sent_as_is(self):
+        request = httpx.Request("POST", "https://example.com", json={"text": "hello"})
+
+        assert payloads.inline(request) is request
+
+    def test_write_fills_in_placeholders(self, audio):
+        out = io.BytesIO()
+        line = json.dumps({"data": payloads.placeholder(str(audio))}).encode("utf-8")
+
+        payloads.write(line, out)
+
+        assert json.loads(out.getvalue())["data"] == base64.b64encode(
+            audio.read_bytes()
+        ).decode("ascii")
+
+
+async def _read(request: httpx.Request) -> list[bytes]:
+    return [chunk async for chunk in request.stream]
+
+
+class TestOpenAI:
+    def test_audio_reaches_the_api_encoded(self, audio, monkeypatch):
+        monkeypatch.setattr(config, "output_directory", str(audio.parent))
+        monkeypatch.setattr(config, "audio_file", audio.name)
+        monkeypatch.setattr(config, "model", "gpt-audio-1.5")
+        monkeypatch.setattr(config, "openai_api_key", "test")
+        monkeypatch.setattr(config, "provider", "openai")
+        monkeypatch.setattr(openai, "_send_files", {})
+        received = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            received.append(json.loads(await request.aread()))
+            return httpx.Response(200, json=_completion("1\n00:00:00,000 --> 00:00:01,000\nHi\n"))
+
+        transport = payloads.InliningTransport(httpx.MockTransport(handler))
+        monkeypatch.setattr(
+            openai,
+            "_new_client",
+            lambda: AsyncOpenAI(
+                api_key="test",
+                max_retries=0,
+                http_client=httpx.AsyncClient(transport=transport),
+            ),
+        )
+
+        reply = asyncio.run(openai.generate("Transcribe.", "Go."))
+
+        assert "Hi" in reply
+        [content] = [m["content"] for m in received[0]["messages"] if m["role"] == "user"]
+        assert content[0]["input_audio"]["data"] == base64.b64encode(audio.read_bytes()).decode(
+            "ascii"
+        )
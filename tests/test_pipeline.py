@@ -0,0 +1,183 @@
+"""
+Translation requests, answered by a fake provider.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import pipeline
+from sub_tools.subtitles.splice import render
+from sub_tools.subtitles.validator import parse_strict
+
+SOURCE = render([(t * 2.0, t * 2.0 + 1.5, f"Source {t}.") for t in range(20)])
+
+
+def _body(text: str) -> str:
+    return text.split("SRT to translate:\n\n", 1)[1].split("\n\nTranslate the", 1)[0]
+
+
+@pytest.fixture
+def translating(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+    (tmp_path / "en.srt").write_text(SOURCE, encoding="utf-8")
+    monkeypatch.setattr(config, "source_language", "en")
+    monkeypatch.setattr(config, "overwrite", True)
+    monkeypatch.setattr(config, "cache", False)
+    monkeypatch.setattr(config, "audio_file", str(tmp_path / "missing.mp3"))
+    return tmp_path
+
+
+def _use(monkeypatch, generate):
+    provider = SimpleNamespace(
+        generate=generate,
+        accepts_audio=lambda: False,
+        prepare_audio=lambda path=None: None,
+    )
+    monkeypatch.setattr(pipeline, "get_provider", lambda: provider)
+
+
+class TestSplitLanguages:
+    def test_reads_fenced_json(self):
+        reply = '```json\n{"fr": "1\\nA", "es": "1\\nB", "note": 3}\n```'
+
+        assert pipeline._split_languages(reply, ["fr", "es"]) == {"fr": "1\nA", "es": "1\nB"}
+
+    def test_unreadable_reply_gives_nothing(self):
+        assert pipeline._split_languages("Sorry, I cannot help.", ["fr"]) == {}
+        assert pipeline._split_languages('{"fr": ', ["fr"]) == {}
+
+
+class TestLanguageGroups:
+    def test_groups_by_size(self, monkeypatch):
+        monkeypatch.setattr(config, "languages_per_request", 2)
+
+        groups = pipeline._language_groups(["fr", "es", "de"], SOURCE)
+        assert groups == [["fr", "es"], ["de"]]
+
+    def test_windowed_sources_are_not_grouped(self, monkeypatch):
+        monkeypatch.setattr(config, "languages_per_request", 2)
+        monkeypatch.setattr(config, "translation_window", 5)
+
+        assert pipeline._language_groups(["fr", "es"], SOURCE) == [["fr"], ["es"]]
+
+
+def test_combined_request_retries_only_the_failed_language(translating, monkeypatch):
+    monkeypatch.setattr(config, "languages", ["fr", "es"])
+    monkeypatch.setattr(config, "languages_per_request", 2)
+    requests = []
+
+    async def generate(
+        system_instruction,
+        text=None,
+        with_audio=True,
+        audio_file=None,
+        model=None,
+        watch=None,
+        context=None,
+    ):
+        combined = "JSON object" in system_instruction
+        requests.append("combined" if combined else "single")
+        body = _body(context or text)
+        if combined:
+            short = "\n\n".join(body.strip().split("\n\n")[:5])
+            return json.dumps({"fr": body.replace("Source", "Quelle"), "es": short})
+        return body.replace("Source", "Fuente")
+
+    _use(monkeypatch, generate)
+    pipeline.translate()
+
+    assert requests == ["combined", "single"]
+    for code, word in (("fr", "Quelle"), ("es", "Fuente")):
+        cues, errors = parse_strict((translating / f"{code}.srt").read_text(encoding="utf-8"))
+        assert not errors
+        assert [cue.text for cue in cues] == [f"{word} {t}." for t in range(20)]
+
+
+def test_windows_are_merged_by_cue_index(translating, monkeypatch):
+    monkeypatch.setattr(config, "languages", ["fr"])
+    monkeypatch.setattr(config, "translation_window", 8)
+    monkeypatch.setattr(config, "translation_context", 2)
+    seen = []
+
+    async def generate(
+        system_instruction,
+        text=None,
+        with_audio=True,
+        audio_file=None,
+        model=None,
+        watch=None,
+        context=None,
+    ):
+        body = _body(context).split("\n\nFollowing", 1)[0]
+        seen.append(("Preceding" in context, body.count("-->"), "Following" in context))
+        return body.replace("Source", "Quelle")
+
+    _use(monkeypatch, generate)
+    pipeline.translate()
+
+    assert sorted(seen) == [(False, 7, True), (True, 6, True), (True, 7, False)]
+    cues, errors = parse_strict((translating / "fr.srt").read_text(encoding="utf-8"))
+    assert not errors
+    assert [cue.text for cue in cues] == [f"Quelle {t}." for t in range(20)]
+
+
+def test_streamed_answer_in_the_wrong_language_is_abandoned(translating, monkeypatch):
+    monkeypatch.setattr(config, "languages", ["ja"])
+    monkeypatch.setattr(config, "stream", True)
+    requests = []
+
+    async def generate(
+        system_instruction,
+        text=None,
+        with_audio=True,
+        audio_file=None,
+        model=None,
+        watch=None,
+        context=None,
+    ):
+        requests.append(watch is not None)
+        word = "Source sentence" if len(requests) == 1 else "字幕"
+        reply = _body(context).replace("Source", word)
+        feed = watch()
+        for start in range(0, len(reply), 16):
+            feed(reply[start : start + 16])
+        return reply
+
+    _use(monkeypatch, generate)
+    pipeline.translate()
+
+    assert requests == [True, True]
+    cues, errors = parse_strict((translating / "ja.srt").read_text(encoding="utf-8"))
+    assert not errors
+    assert cues[0].text == "字幕 0."
+
+
+def test_languages_share_everything_but_the_task(translating, monkeypatch):
+    monkeypatch.setattr(config, "languages", ["fr", "es", "de"])
+    requests = []
+
+    async def generate(
+        system_instruction,
+        text=None,
+        with_audio=True,
+        audio_file=None,
+        model=None,
+        watch=None,
+        context=None,
+    ):
+        requests.append((system_instruction, context, text))
+        return _body(context)
+
+    _use(monkeypatch, generate)
+    pipeline.translate()
+
+    assert len(requests) == 3
+    assert len({(system, context) for system, context, _ in requests}) == 1
+    assert sorted(text.split(" into ")[1].split(".")[0] for _, _, text in requests) == [
+        "French",
+        "German",
+        "Spanish",
+    ]
@@ -0,0 +1,87 @@
+"""
+Media lengths read from file headers, checked against files ffmpeg writes.
+"""
+
+import os
+import subprocess
+import wave
+
+import pytest
+
+from sub_tools.media import converter, probe
+
+SECONDS = 7.37
+
+
+def _encode(path, *args: str) -> str:
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={SECONDS}",
+        *args, str(path),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "name, args, tolerance",
+    [
+        # MP3 frames hold 1152 samples, and the encoder adds its delay up front.
+        ("xing.mp3", ["-c:a", "libmp3lame"], 0.1),
+        ("speech.mp3", ["-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "32k"], 0.1),
+        ("frames.mp3", ["-c:a", "libmp3lame", "-q:a", "2", "-write_xing", "0"], 0.1),
+        ("audio.ogg", ["-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k"], 0.02),
+        ("audio.wav", ["-c:a", "pcm_s16le"], 0.001),
+        ("audio.m4a", ["-c:a", "aac"], 0.05),
+    ],
+)
+def test_reads_the_length_of_each_container(tmp_path, name, args, tolerance):
+    path = _encode(tmp_path / name, *args)
+
+    assert probe.duration(path) == pytest.approx(SECONDS, abs=tolerance)
+
+
+def test_wav_written_without_a_size_runs_to_the_end(tmp_path):
+    path = tmp_path / "streamed.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(bytes(2 * 8000 * 3))
+    data = bytearray(path.read_bytes())
+    data[40:44] = b"\xff\xff\xff\xff"
+    path.write_bytes(bytes(data))
+
+    assert probe.duration(str(path)) == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize("contents", [b"", b"not audio at all", os.urandom(4096)])
+def test_unknown_files_have_no_length(tmp_path, contents):
+    path = tmp_path / "unknown.bin"
+    path.write_bytes(contents)
+
+    assert probe.duration(str(path)) is None
+
+
+class TestAudioDuration:
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        monkeypatch.setattr(converter, "_durations", {})
+
+    def test_measures_each_version_of_a_file_once(self, tmp_path, monkeypatch):
+        path = _encode(tmp_path / "audio.wav", "-c:a", "pcm_s16le")
+        probed = []
+        monkeypatch.setattr(probe, "duration", lambda path: probed.append(path) or 1.0)
+
+        converter.audio_duration(path)
+        converter.audio_duration(path)
+        _encode(tmp_path / "audio.wav", "-c:a", "pcm_s16le", "-t", "2")
+        converter.audio_duration(path)
+
+        assert len(probed) == 2
+
+    def test_asks_ffmpeg_about_other_formats(self, tmp_path):
+        path = _encode(tmp_path / "audio.flac", "-c:a", "flac")
+
+        assert probe.duration(path) is None
+        assert converter.audio_duration(path) == pytest.approx(SECONDS, abs=0.01)
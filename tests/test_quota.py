@@ -0,0 +1,139 @@
+"""
+Per-minute request and token quotas, kept to before requests are sent.
+"""
+
+import asyncio
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import quota
+from sub_tools.intelligence.accounting import record
+from sub_tools.intelligence.quota import TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def fresh_quotas(monkeypatch):
+    monkeypatch.setattr(quota, "_requests", {})
+    monkeypatch.setattr(quota, "_tokens", {})
+    monkeypatch.setattr(quota, "_corrections", {})
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(quota.asyncio, "sleep", sleep)
+    return slept
+
+
+class TestTokenBucket:
+    def test_starts_with_a_minute_of_headroom(self):
+        bucket = TokenBucket(600)
+
+        assert bucket.take(500) == 0
+        assert bucket.take(60) == 0
+
+    def test_debt_is_paid_off_at_the_quota_rate(self):
+        bucket = TokenBucket(60)
+        bucket.take(60 * quota.HEADROOM)
+
+        wait = bucket.take(6)
+
+        assert wait == pytest.approx(6 / quota.HEADROOM, rel=0.01)
+
+    def test_unused_units_come_back(self):
+        bucket = TokenBucket(60)
+        bucket.take(60 * quota.HEADROOM)
+        bucket.give_back(6)
+
+        assert bucket.take(6) == 0
+
+    def test_never_holds_more_than_a_minute(self):
+        bucket = TokenBucket(60)
+        bucket.give_back(1000)
+
+        assert bucket.level == pytest.approx(60 * quota.HEADROOM)
+
+
+class TestEstimates:
+    def test_counts_prompt_and_audio(self):
+        assert quota.estimate_tokens("x" * 400) == 100
+        assert quota.estimate_tokens("", 10) == 10 * quota.AUDIO_TOKENS_PER_SECOND
+
+    def test_correction_follows_reported_usage(self):
+        for _ in range(40):
+            estimated = 100 * quota.correction("gemini", "m")
+            quota.correct("gemini", "m", estimated, 300)
+
+        assert quota.correction("gemini", "m") == pytest.approx(3.0, rel=0.01)
+        assert quota.correction("gemini", "other") == 1.0
+
+    def test_correction_is_bounded(self):
+        for _ in range(100):
+            quota.correct("gemini", "m", 1, 10_000)
+
+        assert quota.correction("gemini", "m") == quota.MAX_CORRECTION
+
+
+class TestReserve:
+    def test_no_quota_changes_nothing(self, monkeypatch, waits):
+        monkeypatch.setattr(config, "requests_per_minute", 0)
+        monkeypatch.setattr(config, "tokens_per_minute", 0)
+
+        async def run():
+            for _ in range(100):
+                async with quota.reserve("m", "x" * 4000):
+                    pass
+
+        asyncio.run(run())
+
+        assert waits == []
+        assert quota._requests == {} and quota._tokens == {}
+
+    def test_requests_are_spaced_at_the_quota(self, monkeypatch, waits):
+        monkeypatch.setattr(config, "requests_per_minute", 60)
+        monkeypatch.setattr(config, "tokens_per_minute", 0)
+
+        async def run():
+            for _ in range(60):
+                async with quota.reserve("m"):
+                    pass
+
+        asyncio.run(run())
+
+        # 57 fit in the first minute's headroom; the rest wait their turn.
+        assert len(waits) == 3
+        assert waits == sorted(waits)
+
+    def test_tokens_are_settled_from_reported_usage(self, monkeypatch, waits):
+        monkeypatch.setattr(config, "requests_per_minute", 0)
+        monkeypatch.setattr(config, "tokens_per_minute", 10_000)
+        bucket = {"requests": 0, "input_tokens": 0, "output_tokens": 0}
+
+        async def run():
+            async with quota.reserve("m", "x" * 4000):
+                record(bucket, requests=1, input_tokens=1500, output_tokens=500)
+
+        asyncio.run(run())
+
+        tokens = quota._tokens[(config.resolved_provider, "m")]
+        assert tokens.level == pytest.approx(10_000 * quota.HEADROOM - 2000, abs=1)
+        assert quota.correction(config.resolved_provider, "m") > 1.0
+
+    def test_failed_request_gives_its_tokens_back(self, monkeypatch, waits):
+        monkeypatch.setattr(config, "requests_per_minute", 0)
+        monkeypatch.setattr(config, "tokens_per_minute", 10_000)
+
+        async def run():
+            async with quota.reserve("m", "x" * 4000):
+                raise RuntimeError("refused")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(run())
+
+        tokens = quota._tokens[(config.resolved_provider, "m")]
+        assert tokens.level == pytest.approx(10_000 * quota.HEADROOM, abs=1)
@@ -0,0 +1,127 @@
+"""
+Request accounting and the run report, in a temporary output directory.
+"""
+
+import asyncio
+import json
+import os
+import stat
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import accounting, openai
+from sub_tools.intelligence.accounting import Call, record
+from sub_tools.mock import MockServer
+from sub_tools.system import manifest, report
+
+
+@pytest.fixture(autouse=True)
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+    monkeypatch.setattr(manifest, "_manifests", {})
+    return tmp_path
+
+
+class TestAccounting:
+    def test_attempts_count_towards_one_call(self):
+        bucket = accounting.usage_bucket({}, "gpt-5.6")
+        with accounting.calls() as made:
+            with accounting.call():
+                for _ in range(3):
+                    with accounting.attempt("openai", "gpt-5.6", audio_seconds=12.0):
+                        record(bucket, requests=1, output_tokens=10)
+
+        [call] = made
+        assert (call.provider, call.model) == ("openai", "gpt-5.6")
+        assert (call.attempts, call.retries) == (3, 2)
+        assert call.audio_seconds == 12.0
+        assert call.counts == {"requests": 3, "output_tokens": 30}
+        assert call.latency is not None and call.latency <= call.seconds
+
+    def test_an_attempt_alone_is_a_call(self):
+        with accounting.calls() as made:
+            with accounting.attempt("gemini", "gemini-2.5-flash"):
+                pass
+
+        assert [(call.model, call.attempts) for call in made] == [("gemini-2.5-flash", 1)]
+
+    def test_failed_calls_are_kept(self):
+        with accounting.calls() as made:
+            with pytest.raises(TimeoutError), accounting.call("gemini", "gemini-2.5-flash"):
+                raise TimeoutError
+
+        assert made[0].error == "TimeoutError"
+
+    def test_every_provider_bucket_has_the_same_keys(self):
+        assert set(accounting.usage_bucket({}, "model")) == set(accounting.USAGE_KEYS)
+
+    def test_shared_client_notes_the_first_byte(self, monkeypatch):
+        monkeypatch.setattr(config, "provider", "openai")
+        monkeypatch.setattr(config, "model", "gpt-5.6")
+        monkeypatch.setattr(config, "retry", 1)
+        with MockServer() as stand_in:
+            monkeypatch.setattr(config, "openai_api_key", "test")
+            monkeypatch.setattr(config, "openai_base_url", stand_in.base_urls()["openai"])
+            with accounting.calls() as made:
+                asyncio.run(openai.generate("Translate.", "Hello.", with_audio=False))
+
+        [call] = made
+        assert call.model == "gpt-5.6"
+        assert 0 < call.first_byte <= call.latency
+        assert call.counts["requests"] == 1
+
+
+class TestSummary:
+    def test_percentiles_take_the_nearest_rank(self):
+        values = [float(n) for n in range(1, 101)]
+
+        assert [report.percentile(values, p) for p in (50, 95, 99)] == [51.0, 96.0, 100.0]
+
+    def test_totals_and_models(self):
+        calls = [
+            Call("gemini", "flash", latency=1.0, first_byte=0.5, attempts=2, counts={"requests": 2}),
+            Call("gemini", "flash", latency=3.0, attempts=1, error="TimeoutError"),
+            Call("openai", "gpt", latency=2.0, audio_seconds=30.0, counts={"tts_characters": 9}),
+        ]
+
+        summary = report.summarize(calls)
+
+        assert (summary["requests"], summary["failed"], summary["retries"]) == (3, 1, 1)
+        assert summary["latency"] == {"p50": 2.0, "p95": 3.0, "p99": 3.0, "max": 3.0, "total": 6.0}
+        assert summary["first_byte"]["max"] == 0.5
+        assert summary["usage"] == {"audio_seconds": 30.0, "requests": 2, "tts_characters": 9}
+        assert summary["models"]["gemini:flash"]["requests"] == 2
+        assert summary["models"]["openai:gpt"]["latency"]["p50"] == 2.0
+
+    def test_no_calls(self):
+        summary = report.summarize([])
+
+        assert summary["requests"] == 0
+        assert summary["latency"] is None
+
+
+def test_run_reports_each_stage(job):
+    bucket = accounting.usage_bucket({}, "flash")
+    with pytest.raises(RuntimeError), report.run():
+        with manifest.stage("transcribe"):
+            with accounting.attempt("gemini", "flash"):
+                record(bucket, requests=1, input_tokens=100)
+        with manifest.stage("translate"):
+            raise RuntimeError("stopped")
+
+    written = json.loads((job / report.REPORT).read_text())
+    assert set(written["stages"]) == {"transcribe", "translate"}
+    assert written["stages"]["transcribe"]["requests"]["usage"]["input_tokens"] == 100
+    assert written["stages"]["translate"]["finished"] is False
+    assert written["total"]["requests"] == 1
+
+
+def test_report_keeps_the_mode_it_had(job):
+    (job / report.REPORT).write_text("{}")
+    os.chmod(job / report.REPORT, 0o640)
+
+    with report.run():
+        pass
+
+    assert stat.S_IMODE(os.stat(job / report.REPORT).st_mode) == 0o640
@@ -0,0 +1,154 @@
+"""
+Stitching windowed subtitles back into one file.
+"""
+
+import pytest
+
+from sub_tools.subtitles.splice import (
+    cue_text,
+    cue_windows,
+    excerpt,
+    failed_spans,
+    format_timestamp,
+    merge_translation,
+    shift,
+    stitch,
+    untranslated_runs,
+)
+from sub_tools.subtitles.validator import parse_strict
+
+FIRST = (
+    "1\n00:00:01,000 --> 00:00:03,000\nHello.\n\n"
+    "2\n00:00:04,000 --> 00:00:06,500\nStill here.\n"
+)
+SECOND = "1\n00:00:00,500 --> 00:00:02,000\nGoodbye.\n"
+
+
+class TestShift:
+    def test_moves_every_cue(self):
+        cues, errors = parse_strict(shift(FIRST, 60.0))
+
+        assert not errors
+        assert [(cue.start, cue.end) for cue in cues] == [(61.0, 63.0), (64.0, 66.5)]
+
+    def test_crosses_the_hour(self):
+        cues, _ = parse_strict(shift(SECOND, 3599.75))
+
+        assert cues[0].start == pytest.approx(3600.25)
+
+
+class TestStitch:
+    def test_joins_windows_in_order_and_renumbers(self):
+        cues, errors = parse_strict(stitch([(0.0, FIRST), (10.0, SECOND)]))
+
+        assert not errors
+        assert [cue.index for cue in cues] == [1, 2, 3]
+        assert cues[2].start == pytest.approx(10.5)
+        assert cues[2].text == "Goodbye."
+
+    def test_refuses_invalid_windows(self):
+        with pytest.raises(ValueError):
+            stitch([(0.0, "not subtitles")])
+
+
+def test_format_timestamp_rounds_to_milliseconds():
+    assert format_timestamp(3723.0004) == "01:02:03,000"
+    assert format_timestamp(-1) == "00:00:00,000"
+
+
+def _srt(*cues):
+    return "\n".join(
+        f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n"
+        for index, (start, end, text) in enumerate(cues, start=1)
+    )
+
+
+class TestFailedSpans:
+    def test_keeps_good_cues_and_marks_the_stretch_around_a_bad_one(self):
+        content = _srt(
+            (0.5, 3.0, "One."),
+            (10.0, 12.0, "Two."),
+            (20.0, 18.0, "Backwards."),
+            (30.0, 32.0, "Four."),
+            (55.0, 59.0, "Five."),
+        )
+        kept, spans = failed_spans(content, 60.0, begin_gap=5.0, end_gap=10.0)
+
+        assert spans == [(10.0, 32.0)]
+        assert [cue.text for cue in kept] == ["One.", "Five."]
+
+    def test_stray_arrow_in_text_fails_only_its_block(self):
+        content = _srt(
+            (0.5, 3.0, "One."),
+            (5.0, 7.0, "Two --> three."),
+            (12.0, 14.0, "Three."),
+            (25.0, 28.0, "Four."),
+        )
+        kept, spans = failed_spans(content, 30.0, begin_gap=5.0, end_gap=10.0)
+
+        # The cues either side are heard again whole rather than cut short.
+        assert spans == [(0.5, 14.0)]
+        assert [cue.text for cue in kept] == ["Four."]
+
+    def test_subtitles_stopping_early_mark_the_tail(self):
+        content = _srt(*[(float(t), t + 2.0, f"Line {t}.") for t in range(0, 80, 4)])
+        kept, spans = failed_spans(content, 100.0, begin_gap=5.0, end_gap=10.0)
+
+        assert spans == [(76.0, 100.0)]
+        assert kept[-1].end <= 76.0
+
+    def test_gives_up_when_most_of_the_file_failed(self):
+        content = _srt((0.5, 3.0, "One."))
+
+        assert failed_spans(content, 100.0, begin_gap=5.0, end_gap=10.0) is None
+
+    def test_needs_a_duration(self):
+        assert failed_spans(_srt((0.5, 3.0, "One.")), None, 5.0, 10.0) is None
+
+
+class TestUntranslatedRuns:
+    SOURCE = _srt(*[(float(t), t + 1.0, f"Source {t}.") for t in range(10)])
+
+    def test_finds_runs_of_lost_cues(self):
+        translation = _srt(
+            *[(float(t), t + 1.0, f"Quelle {t}.") for t in range(10) if t not in (3, 4, 8)]
+        )
+        translated, runs = untranslated_runs(translation, self.SOURCE)
+
+        assert runs == [[3, 4], [8]]
+        assert translated[5] == "Quelle 5."
+
+    def test_excerpt_and_merge_rebuild_the_translation(self):
+        translation = _srt(*[(float(t), t + 1.0, f"Quelle {t}.") for t in range(10) if t != 6])
+        translated, runs = untranslated_runs(translation, self.SOURCE)
+
+        part = excerpt(self.SOURCE, runs[0])
+        assert parse_strict(part)[0][0].text == "Source 6."
+
+        translated[6] = "Quelle 6."
+        cues, errors = parse_strict(merge_translation(self.SOURCE, translated))
+        assert not errors
+        assert [cue.text for cue in cues] == [f"Quelle {t}." for t in range(10)]
+
+    def test_gives_up_when_most_cues_were_lost(self):
+        translation = _srt((0.0, 1.0, "Quelle 0."))
+
+        assert untranslated_runs(translation, self.SOURCE) is None
+
+
+class TestCueWindows:
+    def test_whole_file_when_disabled_or_short(self):
+        assert cue_windows(40, 0) == [range(40)]
+        assert cue_windows(40, 50) == [range(40)]
+
+    def test_windows_are_even_and_cover_every_cue(self):
+        windows = cue_windows(101, 50)
+
+        assert [len(window) for window in windows] == [34, 33, 34]
+        assert [p for window in windows for p in window] == list(range(101))
+
+    def test_context_is_text_without_timings(self):
+        source = _srt((0.0, 1.0, "One."), (1.0, 2.0, "Two\nlines."), (2.0, 3.0, "Three."))
+
+        assert cue_text(source, range(1, 3)) == "Two lines.\nThree."
+        assert "-->" not in cue_text(source, range(3))
@@ -0,0 +1,68 @@
+"""
+Where long recordings are cut for chunked transcription, tested without ffmpeg.
+"""
+
+import pytest
+
+from sub_tools.media.splitter import Window, parse_silences, plan_windows
+
+
+class TestParseSilences:
+    def test_pairs_starts_with_ends(self):
+        output = (
+            "[silencedetect @ 0x1] silence_start: 12.5\n"
+            "[silencedetect @ 0x1] silence_end: 14.25 | silence_duration: 1.75\n"
+            "[silencedetect @ 0x1] silence_start: 30\n"
+            "[silencedetect @ 0x1] silence_end: 31 | silence_duration: 1\n"
+        )
+        assert parse_silences(output) == [(12.5, 14.25), (30.0, 31.0)]
+
+    def test_pause_open_at_the_end_of_the_file_is_ignored(self):
+        output = "silence_start: 1\nsilence_end: 2\nsilence_start: 58.2\n"
+        assert parse_silences(output) == [(1.0, 2.0)]
+
+    def test_negative_start_is_clamped(self):
+        output = "silence_start: -0.01\nsilence_end: 0.8\n"
+        assert parse_silences(output) == [(0.0, 0.8)]
+
+
+class TestPlanWindows:
+    def test_short_recording_is_one_window(self):
+        assert plan_windows(50.0, [], target=60.0) == [Window(0.0, 50.0)]
+
+    def test_disabled_target_is_one_window(self):
+        assert plan_windows(500.0, [], target=0) == [Window(0.0, 500.0)]
+
+    def test_cuts_in_the_middle_of_a_pause(self):
+        windows = plan_windows(100.0, [(50.0, 52.0)], target=60.0)
+
+        assert windows == [
+            Window(0.0, 51.0, lead=0.0, trail=1.0),
+            Window(51.0, 100.0, lead=1.0, trail=0.0),
+        ]
+
+    def test_prefers_the_longest_pause_in_range(self):
+        windows = plan_windows(100.0, [(40.0, 41.0), (55.0, 59.0)], target=60.0)
+
+        assert windows[0].end == pytest.approx(57.0)
+
+    def test_ignores_pauses_too_early_in_the_window(self):
+        windows = plan_windows(100.0, [(10.0, 20.0)], target=60.0)
+
+        assert windows[0].end == pytest.approx(60.0)
+        assert windows[0].trail == 0.0
+
+    def test_cuts_at_the_target_without_a_pause(self):
+        windows = plan_windows(150.0, [], target=60.0)
+
+        assert [(w.start, w.end) for w in windows] == [(0.0, 60.0), (60.0, 120.0), (120.0, 150.0)]
+
+    def test_windows_cover_the_recording_without_gaps(self):
+        silences = [(float(t), t + 1.5) for t in range(20, 3600, 45)]
+        windows = plan_windows(3600.0, silences, target=300.0)
+
+        assert windows[0].start == 0.0
+        assert windows[-1].end == 3600.0
+        for earlier, later in zip(windows, windows[1:]):
+            assert earlier.end == later.start
+        assert all(window.duration <= 300.0 for window in windows)
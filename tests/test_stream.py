@@ -0,0 +1,58 @@
+"""
+Watching streamed answers cue by cue.
+"""
+
+import pytest
+
+from sub_tools.subtitles.splice import render
+from sub_tools.subtitles.stream import LANGUAGE_LETTERS, StreamAborted, StreamCheck
+
+
+def _feed(check: StreamCheck, content: str, size: int = 7) -> None:
+    for start in range(0, len(content), size):
+        check.feed(content[start : start + size])
+
+
+class TestStreamCheck:
+    def test_accepts_a_sound_answer_in_small_pieces(self):
+        content = render([(t * 2.0, t * 2.0 + 1.5, f"Line number {t}.") for t in range(60)])
+
+        _feed(StreamCheck(duration=120.0, language="en"), content)
+
+    def test_small_steps_back_are_left_for_repair(self):
+        content = render([(10.0, 11.0, "Later."), (8.0, 9.0, "Earlier."), (12.0, 13.0, "On.")])
+
+        _feed(StreamCheck(duration=60.0), content)
+
+    def test_stops_when_the_model_starts_over(self):
+        content = render([(t * 5.0, t * 5.0 + 4.0, f"Line {t}.") for t in range(10)])
+        content += "\n" + render([(0.0, 4.0, "Line 0 again."), (5.0, 9.0, "Line 1 again.")])
+
+        with pytest.raises(StreamAborted) as aborted:
+            _feed(StreamCheck(duration=120.0), content)
+
+        assert "backwards" in aborted.value.reason
+        assert aborted.value.kept.count("-->") == 10
+
+    def test_stops_on_a_cue_after_the_audio(self):
+        content = render([(1.0, 2.0, "Fine."), (95.0, 96.0, "Invented."), (3.0, 4.0, "x")])
+
+        with pytest.raises(StreamAborted, match="after the audio ends"):
+            _feed(StreamCheck(duration=60.0), content)
+
+    def test_stops_on_the_wrong_script(self):
+        line = "This is still English, not Japanese."
+        count = LANGUAGE_LETTERS // 20 + 2
+        content = render([(t * 2.0, t * 2.0 + 1.5, line) for t in range(count)])
+
+        with pytest.raises(StreamAborted, match="not in Japanese") as aborted:
+            _feed(StreamCheck(duration=120.0, language="ja"), content)
+
+        assert aborted.value.kept == ""
+
+    def test_unparsed_blocks_are_ignored(self):
+        content = "```srt\n1\n0:00:01.000 --> 0:00:02.000\nLoose.\n\n" + render(
+            [(3.0, 4.0, "Strict.")]
+        )
+
+        _feed(StreamCheck(duration=60.0), content)
@@ -0,0 +1,89 @@
+"""
+Condensed audio and the offset table that puts its subtitles back in place.
+"""
+
+import pytest
+
+from sub_tools.media import converter, trim, vad
+from sub_tools.subtitles.validator import parse_strict
+
+from test_vad import _record
+
+WAV = ("-c:a", "pcm_s16le")
+
+
+class TestPlan:
+    index = vad.SpeechIndex(60.0, [(5.0, 20.0), (30.0, 50.0)])
+
+    def test_long_pauses_are_shortened(self):
+        table = trim.plan(self.index, 0.0, 60.0, 2.0)
+
+        assert len(table.kept) == 2
+        for (start, end), expected in zip(table.kept, [(4.7, 20.3), (29.7, 50.3)]):
+            assert (start, end) == pytest.approx(expected, abs=vad.FRAME_SECONDS)
+        assert table.duration == pytest.approx(36.2, abs=0.1)
+        assert trim.worth_it(table)
+
+    def test_short_pauses_stay(self):
+        table = trim.plan(self.index, 0.0, 60.0, 20.0)
+
+        assert table.kept == [(0.0, 60.0)]
+        assert not trim.worth_it(table)
+
+    def test_stretches_are_measured_from_their_start(self):
+        table = trim.plan(self.index, 25.0, 45.0, 2.0)
+
+        assert table.origin == 25.0
+        assert table.kept[0][0] == pytest.approx(4.7, abs=vad.FRAME_SECONDS)
+        assert table.kept[-1][1] == pytest.approx(20.0, abs=vad.FRAME_SECONDS)
+
+
+class TestOffsetTable:
+    table = trim.OffsetTable(100.0, [(0.0, 10.0), (20.0, 30.0)], 40.0)
+
+    def test_maps_condensed_time_back(self):
+        assert self.table.duration == 20.0
+        assert self.table.removed == 20.0
+        assert self.table.to_source(5.0) == 5.0
+        assert self.table.to_source(15.0) == 25.0
+        assert self.table.to_source(25.0) == 30.0
+
+    def test_a_join_belongs_to_the_cue_on_its_side(self):
+        assert self.table.to_source(10.0) == 20.0
+        assert self.table.to_source(10.0, end=True) == 10.0
+
+    def test_restores_subtitles(self):
+        content = (
+            "1\n00:00:01,000 --> 00:00:04,000\nFirst\n\n"
+            "2\n00:00:09,000 --> 00:00:12,000\nAcross the cut\n"
+        )
+
+        cues, errors = parse_strict(trim.restore(content, self.table))
+
+        assert not errors
+        assert [(cue.start, cue.end, cue.text) for cue in cues] == [
+            (1.0, 4.0, "First"),
+            (9.0, 22.0, "Across the cut"),
+        ]
+
+    def test_invalid_subtitles_are_refused(self):
+        with pytest.raises(ValueError):
+            trim.restore("1\nnot a timestamp\nText\n", self.table)
+
+
+@pytest.mark.parametrize("start", [0.0, 6.0])
+def test_condensed_speech_lands_where_it_was(tmp_path, start):
+    spans = [(1, 3), (10, 12), (20, 22)]
+    source = _record(tmp_path / "audio.wav", spans, 25)
+    table = trim.plan(vad.measure(source), start, 25.0, 2.0)
+    condensed = str(tmp_path / "condensed.wav")
+
+    trim.condense(source, table, condensed, WAV)
+
+    assert converter.audio_duration(condensed) == pytest.approx(table.duration, abs=0.001)
+    found = vad.measure(condensed).speech
+    expected = [(s, e) for s, e in spans if s >= start]
+    assert len(found) == len(expected)
+    for (found_start, found_end), (speech_start, speech_end) in zip(found, expected):
+        assert start + table.to_source(found_start) == pytest.approx(speech_start, abs=0.2)
+        assert start + table.to_source(found_end, end=True) == pytest.approx(speech_end, abs=0.2)
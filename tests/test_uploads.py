@@ -0,0 +1,135 @@
+"""
+Gemini uploads are recorded and reused across runs while Gemini still has them.
+"""
+
+import datetime
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from sub_tools.config import config
+from sub_tools.intelligence import gemini, uploads
+
+
+class FakeFiles:
+    def __init__(self, lifetime=48 * 3600):
+        self.lifetime = lifetime
+        self.stored: dict[str, types.File] = {}
+        self.uploads = 0
+        self.numbers = itertools.count(1)
+
+    def upload(self, file):
+        self.uploads += 1
+        name = f"files/{next(self.numbers)}"
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=self.lifetime
+        )
+        self.stored[name] = types.File(
+            name=name,
+            uri=f"https://example.com/{name}",
+            mime_type="audio/mpeg",
+            expiration_time=expires,
+            state=types.FileState.ACTIVE,
+        )
+        return self.stored[name]
+
+    def get(self, name):
+        if name not in self.stored:
+            raise genai_errors.ClientError(404, {"error": {"message": "not found"}})
+        return self.stored[name]
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "gemini_api_key", "key")
+    monkeypatch.setattr(config, "provider", "gemini")
+    monkeypatch.setattr(gemini, "_uploaded_files", {})
+    files = FakeFiles()
+    monkeypatch.setattr(gemini, "_client", lambda: SimpleNamespace(files=files))
+    return files
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "audio.mp3"
+    path.write_bytes(b"ID3 some audio")
+    return str(path)
+
+
+def _new_run(monkeypatch):
+    monkeypatch.setattr(gemini, "_uploaded_files", {})
+
+
+class TestRegistry:
+    def test_keeps_no_api_key(self, files):
+        key = uploads.upload_key("gemini", "secret-key", "abc")
+        uploads.remember(key, {"name": "files/1", "expires": time.time() + 100})
+
+        with open(uploads.registry_path(), encoding="utf-8") as f:
+            assert "secret-key" not in f.read()
+        assert uploads.lookup(key)["name"] == "files/1"
+
+    def test_expiring_entries_are_not_returned(self, files):
+        key = uploads.upload_key("gemini", "key", "abc")
+        uploads.remember(key, {"name": "files/1", "expires": time.time() + 100})
+
+        assert uploads.lookup(key, margin=200) is None
+        assert uploads.lookup(key, margin=10) is not None
+
+
+class TestPrepareAudio:
+    def test_uploads_once_within_a_run(self, files, audio):
+        gemini.prepare_audio(audio)
+        gemini.prepare_audio(audio)
+
+        assert files.uploads == 1
+
+    def test_later_run_reuses_the_upload(self, files, audio, monkeypatch):
+        first = gemini.prepare_audio(audio)
+        _new_run(monkeypatch)
+
+        second = gemini.prepare_audio(audio)
+
+        assert files.uploads == 1
+        assert second.name == first.name
+
+    def test_same_contents_elsewhere_reuse_the_upload(self, files, audio, tmp_path, monkeypatch):
+        gemini.prepare_audio(audio)
+        _new_run(monkeypatch)
+        copy = tmp_path / "copy.mp3"
+        copy.write_bytes(open(audio, "rb").read())
+
+        gemini.prepare_audio(str(copy))
+
+        assert files.uploads == 1
+
+    def test_file_gone_from_gemini_is_uploaded_again(self, files, audio, monkeypatch):
+        gemini.prepare_audio(audio)
+        files.stored.clear()
+        _new_run(monkeypatch)
+
+        gemini.prepare_audio(audio)
+
+        assert files.uploads == 2
+
+    def test_expiring_file_is_uploaded_again(self, files, audio, monkeypatch):
+        files.lifetime = gemini.UPLOAD_EXPIRY_MARGIN / 2
+        gemini.prepare_audio(audio)
+
+        gemini.prepare_audio(audio)
+
+        assert files.uploads == 2
+
+    def test_other_api_key_uploads_its_own(self, files, audio, monkeypatch):
+        gemini.prepare_audio(audio)
+        _new_run(monkeypatch)
+        monkeypatch.setattr(config, "gemini_api_key", "other")
+
+        gemini.prepare_audio(audio)
+
+        assert files.uploads == 2
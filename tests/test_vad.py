@@ -0,0 +1,109 @@
+"""
+The speech index, measured on synthetic recordings: tones stand in for speech
+and hiss for the noise around it.
+"""
+
+import subprocess
+
+import pytest
+
+from sub_tools.config import config
+from sub_tools.intelligence import pipeline
+from sub_tools.media import vad
+from sub_tools.media.splitter import Window
+
+
+def _record(path, spans, duration, hiss=0.0):
+    """
+    A recording with a tone during ``spans`` and silence, or hiss, elsewhere.
+    """
+    speaking = "+".join(f"between(t,{start},{end})" for start, end in spans)
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={duration}",
+        "-f", "lavfi", "-i", f"anoisesrc=duration={duration}:amplitude={hiss}",
+        "-filter_complex", f"[0]volume='{speaking}':eval=frame[tone];[tone][1]amix=inputs=2",
+        "-ac", "1", "-ar", "16000", str(path),
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "output_directory", str(tmp_path))
+    monkeypatch.setattr(config, "audio_file", "audio.wav")
+    monkeypatch.setattr(vad, "_indexes", {})
+    return tmp_path
+
+
+class TestMeasure:
+    def test_finds_the_speech_in_silence(self, job):
+        path = _record(job / "audio.wav", [(2, 5), (7, 9)], 12)
+
+        index = vad.measure(path)
+
+        assert index.duration == pytest.approx(12, abs=0.05)
+        assert len(index.speech) == 2
+        for (start, end), (found_start, found_end) in zip([(2, 5), (7, 9)], index.speech):
+            assert found_start == pytest.approx(start, abs=0.2)
+            assert found_end == pytest.approx(end, abs=0.2)
+
+    def test_hiss_is_not_speech(self, job):
+        path = _record(job / "audio.wav", [(3, 6)], 10, hiss=0.05)
+
+        index = vad.measure(path)
+
+        assert len(index.speech) == 1
+        assert index.speech[0][0] == pytest.approx(3, abs=0.2)
+
+    def test_short_pauses_stay_inside_the_speech(self, job):
+        path = _record(job / "audio.wav", [(1, 3), (3.15, 5)], 6)
+
+        assert len(vad.measure(path).speech) == 1
+
+
+class TestIndex:
+    index = vad.SpeechIndex(20.0, [(2.0, 5.0), (8.0, 12.0), (15.0, 16.0)])
+
+    def test_silences_fill_the_rest(self):
+        assert self.index.silences() == [(0.0, 2.0), (5.0, 8.0), (12.0, 15.0), (16.0, 20.0)]
+        assert self.index.silences(3.5) == [(16.0, 20.0)]
+
+    def test_speech_between(self):
+        assert self.index.speech_between(4.0, 10.0) == pytest.approx(3.0)
+        assert self.index.speech_between(5.0, 8.0) == 0.0
+
+    def test_first_and_last_speech_within_a_stretch(self):
+        assert self.index.first_speech(6.0, 14.0) == 8.0
+        assert self.index.last_speech(6.0, 14.0) == 12.0
+        assert self.index.first_speech(9.0, 10.0) == 9.0
+        assert self.index.first_speech(12.5, 14.0) is None
+
+
+class TestCache:
+    def test_index_is_kept_with_the_job(self, job, monkeypatch):
+        _record(job / "audio.wav", [(1, 2)], 4)
+        measured = vad.speech_index()
+        monkeypatch.setattr(vad, "_indexes", {})
+        monkeypatch.setattr(vad, "measure", lambda path: pytest.fail("measured again"))
+
+        assert vad.load() == measured
+        assert vad.speech_index() == measured
+
+    def test_changed_audio_has_no_index(self, job):
+        _record(job / "audio.wav", [(1, 2)], 4)
+        vad.speech_index()
+        _record(job / "audio.wav", [(1, 3)], 5)
+
+        assert vad.load() is None
+
+
+def test_windows_grow_by_the_silence_at_their_edges():
+    index = vad.SpeechIndex(60.0, [(4.0, 20.0), (31.0, 50.0)])
+
+    first = pipeline._unspoken_edges(Window(0.0, 30.0, trail=1.0), index)
+    second = pipeline._unspoken_edges(Window(30.0, 60.0, lead=1.0), index)
+
+    assert (first.lead, first.trail) == (4.0, 10.0)
+    assert (second.lead, second.trail) == (1.0, 10.0)